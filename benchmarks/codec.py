@@ -0,0 +1,69 @@
+"""
+Throughput of the batch codec (msight_base.codec) against the JSON path (DetectionResultBase.to_dict/from_dict + json).
+
+    python benchmarks/codec.py [num_messages] [objects_per_message]
+"""
+import json
+import random
+import sys
+import time
+from msight_base import DetectionResultBase, RoadUserPoint, RoadUserCategory
+from msight_base.behavior import BehaviorType
+from msight_base.codec import encode_detections, decode_detections
+from msight_base.map import MapInfo, LaneSide
+
+
+def make_messages(num_messages, objects_per_message):
+    random.seed(0)
+    messages = []
+    for m in range(num_messages):
+        objects = []
+        for k in range(objects_per_message):
+            obj = RoadUserPoint(x=42.3 + random.random() * 1e-3, y=-83.7 + random.random() * 1e-3,
+                                speed=random.random() * 20, heading=random.random() * 360, width=1.8, length=4.5,
+                                category=RoadUserCategory.SEDAN, confidence=0.9, traj_id=k)
+            if k % 10 == 0:
+                obj.map_info = MapInfo(k, 3, 0.5, LaneSide.LEFT, None, None)
+                obj.behaviors = [BehaviorType.LANE_KEEPING]
+            objects.append(obj)
+        messages.append(DetectionResultBase(objects, 1700000000000 + m * 100, sensor_type='fusion'))
+    return messages
+
+
+def measure(name, encode, decode, messages, repeat=3):
+    best_encode = best_decode = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payloads = encode(messages)
+        best_encode = min(best_encode, time.perf_counter() - start)
+        start = time.perf_counter()
+        decoded = decode(payloads)
+        best_decode = min(best_decode, time.perf_counter() - start)
+    size = sum(len(p) for p in payloads) if isinstance(payloads, list) else len(payloads)
+    print(f"{name:<28} encode {len(messages) / best_encode:10.0f} msg/s   decode {len(messages) / best_decode:10.0f} msg/s   "
+          f"{size / len(messages):8.0f} bytes/msg")
+    return decoded
+
+
+def main():
+    num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    objects_per_message = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    messages = make_messages(num_messages, objects_per_message)
+    print(f"{num_messages} messages with {objects_per_message} objects")
+
+    measure('json, one per message',
+            lambda ms: [json.dumps(m.to_dict()).encode() for m in ms],
+            lambda ps: [DetectionResultBase.from_dict(json.loads(p)) for p in ps], messages)
+    measure('codec, one per message',
+            lambda ms: [encode_detections([m]) for m in ms],
+            lambda ps: [r for p in ps for r in decode_detections(p)], messages)
+    decoded = measure('codec, one batch', encode_detections, decode_detections, messages)
+
+    assert len(decoded) == len(messages)
+    for original, copy in zip(messages, decoded):
+        assert copy.timestamp == original.timestamp and copy.sensor_type == original.sensor_type
+        assert [o.to_dict() for o in copy.object_list] == [o.to_dict() for o in original.object_list]
+
+
+if __name__ == '__main__':
+    main()
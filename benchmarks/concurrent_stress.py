@@ -0,0 +1,100 @@
+"""
+Stress test of ConcurrentTrajectoryManager: one writer ingests frames with a sliding window and id churn while several
+reader threads keep checking the snapshots they take. Some readers hold on to a snapshot while the window moves past it
+and check it again, the frozen traj_ids and the objects must not change. Exits with status 1 if any check failed.
+
+    python benchmarks/concurrent_stress.py
+"""
+import sys
+import threading
+import time
+from msight_base import RoadUserPoint
+from msight_base.concurrency import ConcurrentTrajectoryManager
+
+NUM_READERS = 6
+NUM_FRAMES = 1000
+NUM_TRACKS = 300
+NUM_SINGLE = 5
+MAX_FRAMES = 50
+
+
+def writer(tm, done, errors):
+    try:
+        for step in range(NUM_FRAMES):
+            objects = [RoadUserPoint(x=float(step), y=float(i)) for i in range(NUM_TRACKS)]
+            # ids churn every 100 frames, a few objects are pushed one by one
+            traj_ids = [(i, step // 100) for i in range(NUM_TRACKS)]
+            tm.add_frame(objects[:-NUM_SINGLE], traj_ids=traj_ids[:-NUM_SINGLE], timestamp=step * 0.1)
+            for obj, traj_id in zip(objects[-NUM_SINGLE:], traj_ids[-NUM_SINGLE:]):
+                tm.add_object(obj, traj_id, step, timestamp=step * 0.1)
+            # objects added to the open frame are published with the frame, not one by one
+            assert len(tm.snapshot().last_frame) == NUM_TRACKS - NUM_SINGLE, "add_object published a snapshot"
+            tm.publish()
+            assert len(tm.snapshot().last_frame) == NUM_TRACKS, "publish() left objects out"
+    except Exception as e:
+        errors.append('writer: ' + repr(e))
+    finally:
+        done.set()
+
+
+def check(snapshot):
+    steps = snapshot.steps
+    assert len(snapshot.frames) <= MAX_FRAMES, "window too long"
+    assert all(a < b for a, b in zip(steps, steps[1:])), "steps out of order"
+    for frame in snapshot.frames:
+        assert len(frame) == len(frame.traj_id_to_obj_map) == len(frame.traj_ids), "duplicate ids in a frame"
+        for traj_id, obj in frame.items():
+            assert obj.x == frame.step, "object in the wrong frame"
+            assert traj_id == (int(obj.y), frame.step // 100), f"wrong traj_id {traj_id} at step {frame.step}"
+            assert frame.traj_id_to_obj_map[traj_id] is obj, "traj_id map out of sync"
+    for traj_id in snapshot.traj_ids:
+        objects = snapshot.get_trajectory(traj_id)
+        xs = [obj.x for obj in objects]
+        assert xs == list(range(int(xs[0]), int(xs[0]) + len(xs))), "trajectory out of order or with gaps"
+        assert all(obj.y == traj_id[0] for obj in objects), "object in the wrong trajectory"
+
+
+def reader(tm, done, stats, errors, hold):
+    while not done.is_set():
+        try:
+            snapshot = tm.snapshot()
+            check(snapshot)
+            stats['checked'] += 1
+            if hold and snapshot.frames:
+                # check again once the window moved past the snapshot, its points are evicted by then
+                while not done.is_set() and tm.snapshot().earliest_step <= snapshot.last_step:
+                    time.sleep(0.001)
+                if not done.is_set():
+                    check(snapshot)
+                    stats['held'] += 1
+        except Exception as e:
+            errors.append(repr(e))
+
+
+if __name__ == "__main__":
+    tm = ConcurrentTrajectoryManager(max_frames=MAX_FRAMES)
+    done = threading.Event()
+    stats, errors = {'checked': 0, 'held': 0}, []
+    threads = [threading.Thread(target=reader, args=(tm, done, stats, errors, i % 2 == 1)) for i in range(NUM_READERS)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    writer(tm, done, errors)
+    elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+
+    final = tm.snapshot()
+    try:
+        check(final)
+        assert final.last_step == NUM_FRAMES - 1, "last frame not published"
+        assert len(final.frames) == MAX_FRAMES, "window not full"
+        assert all(len(frame) == NUM_TRACKS for frame in final.frames), "frames not complete"
+        assert stats['checked'] > 0 and stats['held'] > 0, "readers did not check any snapshot"
+    except AssertionError as e:
+        errors.append('final: ' + repr(e))
+    print(f"writer: {NUM_FRAMES} frames in {elapsed:.2f} s, readers: {stats['checked']} snapshots checked, "
+          f"{stats['held']} checked again after eviction, {len(errors)} errors")
+    for error in errors[:10]:
+        print("  ", error)
+    sys.exit(1 if errors else 0)
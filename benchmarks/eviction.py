@@ -0,0 +1,34 @@
+# Benchmark of the sliding window eviction of TrajectoryManager(max_frames=...).
+# The cost of evicting a frame should only depend on the number of objects in that frame,
+# not on the window length or on the number of live trajectories.
+import time
+from msight_base import TrajectoryManager, RoadUserPoint
+
+
+def build(num_tracks, num_frames, objects_per_frame):
+    # every frame holds objects_per_frame objects, picked round robin out of num_tracks trajectories
+    tm = TrajectoryManager()
+    traj_id = 0
+    for step in range(num_frames):
+        for _ in range(objects_per_frame):
+            tm.add_object(RoadUserPoint(x=step, y=traj_id), traj_id % num_tracks, step, timestamp=step * 0.1)
+            traj_id += 1
+    return tm
+
+
+def time_eviction(tm, num_evictions):
+    start = time.perf_counter()
+    for _ in range(num_evictions):
+        tm.delete_earliest_frame()
+    return (time.perf_counter() - start) / num_evictions
+
+
+if __name__ == "__main__":
+    objects_per_frame = 30
+    num_evictions = 200
+    for num_tracks in (300, 3000, 30000):
+        for num_frames in (1000, 4000):
+            tm = build(num_tracks, num_frames, objects_per_frame)
+            per_frame = time_eviction(tm, num_evictions)
+            print(f"tracks={num_tracks:6d} frames={num_frames:5d}: {per_frame * 1e6:8.1f} us/eviction "
+                  f"({per_frame / objects_per_frame * 1e6:6.2f} us/object)")
@@ -0,0 +1,47 @@
+"""
+Cost of branching a TrajectoryManager with fork() against copy.deepcopy, with a rollout of hypothetical frames per branch.
+
+    python benchmarks/fork.py [num_frames] [num_objects] [rollout_frames]
+"""
+import copy
+import sys
+import time
+from msight_base import TrajectoryManager, RoadUserPoint
+
+
+def build(num_frames, num_objects):
+    tm = TrajectoryManager(max_frames=num_frames)
+    for step in range(num_frames):
+        tm.add_frame([RoadUserPoint(step * 0.1, k, traj_id=k) for k in range(num_objects)], timestamp=step * 0.1)
+    return tm
+
+
+def rollout(branch, num_objects, rollout_frames):
+    for _ in range(rollout_frames):
+        last = branch.last_frame
+        branch.add_frame([RoadUserPoint(obj.x + 0.1, obj.y, traj_id=obj.traj_id) for obj in last.objects[:num_objects]],
+                         timestamp=last.timestamp + 0.1)
+
+
+def measure(name, make_branch, tm, num_objects, rollout_frames, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rollout(make_branch(tm), num_objects, rollout_frames)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{name:<10} {elapsed * 1e3:8.2f} ms per branch, {1 / elapsed:8.0f} rollouts/s")
+
+
+def main():
+    num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    num_objects = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rollout_frames = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    tm = build(num_frames, num_objects)
+    print(f"window of {num_frames} frames with {num_objects} objects, {rollout_frames} frames per rollout")
+    measure('fork', lambda parent: parent.fork(), tm, num_objects, rollout_frames, repeat=200)
+    # the prev/next chains make deepcopy recurse once per point
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * num_frames * num_objects))
+    measure('deepcopy', copy.deepcopy, tm, num_objects, rollout_frames, repeat=5)
+
+
+if __name__ == '__main__':
+    main()
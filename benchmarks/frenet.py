@@ -0,0 +1,68 @@
+"""
+Frenet conversion of whole frames with MapObject.to_frenet/from_frenet against a per-object loop over the segments of
+the lane in Python. The target is every object of every frame, 300 objects at 10 Hz.
+
+    python benchmarks/frenet.py [num_objects] [num_lanes]
+"""
+import math
+import sys
+import time
+import numpy as np
+from map_lookup import make_grid_map, LANE_WIDTH, LANES_PER_ROW, LANE_LENGTH
+
+
+def naive_to_frenet(map_object, lane_id, x, y):
+    # what consumers did before: project onto every segment of the lane, keeping the arc length at the nearest one
+    lane = map_object.map_lanes(lane_id)
+    best = (math.inf, None, None)
+    station = 0.0
+    for (x0, y0), (x1, y1) in zip(lane[:-1], lane[1:]):
+        vx, vy = x1 - x0, y1 - y0
+        length = math.hypot(vx, vy)
+        t = min(max(((x - x0) * vx + (y - y0) * vy) / (length * length), 0.0), 1.0) if length > 0 else 0.0
+        distance = math.hypot(x - x0 - t * vx, y - y0 - t * vy)
+        if distance < best[0]:
+            side = math.copysign(1.0, vx * (y - y0) - vy * (x - x0))
+            best = (distance, station + t * length, side * distance)
+        station += length
+    return best[1], best[2]
+
+
+def main():
+    num_objects = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    num_lanes = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    map_object = make_grid_map(num_lanes)
+    start = time.perf_counter()
+    map_object.frenet(latlon=False)
+    print(f"{num_lanes} lanelets, arc lengths computed in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    lanes = rng.integers(0, num_lanes, num_objects)
+    ids = np.asarray(map_object.map_polylines_ids)[lanes]
+    row, col = np.divmod(lanes, LANES_PER_ROW)
+    x = (col + rng.uniform(0, 1, num_objects)) * LANE_LENGTH
+    y = (row + 0.5) * LANE_WIDTH + rng.uniform(-1.5, 1.5, num_objects)
+
+    repeat = 200
+    start = time.perf_counter()
+    for _ in range(repeat):
+        s, d = map_object.to_frenet(ids, x, y, latlon=False)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"to_frenet    {elapsed * 1e3:8.3f} ms per frame of {num_objects} objects")
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        map_object.from_frenet(ids, s, d, latlon=False)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"from_frenet  {elapsed * 1e3:8.3f} ms per frame of {num_objects} objects")
+
+    start = time.perf_counter()
+    naive = [naive_to_frenet(map_object, lane_id, a, b) for lane_id, a, b in zip(ids.tolist(), x.tolist(), y.tolist())]
+    elapsed = time.perf_counter() - start
+    print(f"naive loop   {elapsed * 1e3:8.3f} ms per frame of {num_objects} objects")
+    error = np.abs(np.array(naive) - np.column_stack([s, d])).max()
+    print(f"largest difference to the loop {error:.2e}")
+
+
+if __name__ == '__main__':
+    main()
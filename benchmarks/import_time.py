@@ -0,0 +1,59 @@
+"""
+Import time of msight_base, measured with `python -X importtime` in fresh interpreters, and the heavy dependencies it
+pulls in. Exits with status 1 when the median import time exceeds the budget or when `import msight_base` (or the
+visualizer package) loads commonroad, matplotlib, cv2 or NumPy, so it can run as a check in CI.
+
+    python benchmarks/import_time.py [budget_ms] [repeat]
+"""
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ('commonroad', 'matplotlib', 'cv2', 'numpy')
+# modules which must stay light, with the heavy ones they are allowed to load
+CHECKS = {
+    'msight_base': (),
+    'msight_base.visualizer': ('numpy',),
+    'msight_base.visualizer.utils': ('numpy',),
+}
+
+
+def import_time(module):
+    # cumulative microseconds of importing module, from the -X importtime report of a fresh interpreter
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise ValueError(f"{module} not found in the -X importtime report")
+
+
+def loaded_modules(module):
+    # top level packages of HEAVY_MODULES in sys.modules after importing module
+    code = (f'import sys, {module}\n'
+            f'print(" ".join(name for name in {HEAVY_MODULES!r} if name in sys.modules))')
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 50.0
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    failed = False
+
+    median_ms = statistics.median(import_time('msight_base') for _ in range(repeat)) / 1e3
+    ok = median_ms <= budget_ms
+    failed |= not ok
+    print(f"import msight_base {median_ms:8.2f} ms (median of {repeat}, budget {budget_ms:.0f} ms) "
+          f"{'ok' if ok else 'OVER BUDGET'}")
+
+    for module, allowed in CHECKS.items():
+        heavy = [name for name in loaded_modules(module) if name not in allowed]
+        failed |= bool(heavy)
+        print(f"import {module:<30} {'loads ' + ', '.join(heavy) if heavy else 'no heavy dependencies'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Speed of loading an MSight JSON frame directory with read_msight_json_data: serially (workers=0), with a thread pool and
+with a process pool. A synthetic directory is written to a temporary location first. json.load holds the GIL, so only
+the process pool can speed parsing up, by up to the number of cores.
+
+    python benchmarks/json_loader.py [num_frames] [objects_per_frame] [workers]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from msight_base.utils.data import list_msight_json_files, parse_msight_json_file, read_msight_json_data
+
+
+def write_frames(path, num_frames, objects_per_frame):
+    start = datetime(2023, 9, 5, 10)
+    for step in range(num_frames):
+        timestamp = start + timedelta(seconds=0.1 * step)
+        fusion = [{'id': i, 'lat': 42.3 + 1e-6 * (step + i), 'lon': -83.7 + 1e-6 * i, 'heading': 90.0,
+                   'width': 1.8, 'length': 4.5, 'speed': 10.0, 'category': 'car'} for i in range(objects_per_frame)]
+        with open(Path(path) / f"{timestamp.strftime('%Y-%m-%d %H-%M-%S-%f')}.json", 'w') as f:
+            json.dump({'fusion': fusion}, f)
+
+
+def time_load(path, **kwargs):
+    start = time.perf_counter()
+    tm = read_msight_json_data(path, progress=False, **kwargs)
+    return time.perf_counter() - start, len(tm.frames)
+
+
+def main():
+    num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    objects_per_frame = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else min(8, os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as path:
+        write_frames(path, num_frames, objects_per_frame)
+        print(f"{num_frames} frames of {objects_per_frame} objects, {workers} workers, {os.cpu_count()} cores")
+        serial, frames = time_load(path, workers=0)
+        print(f"  serial    {serial:7.2f} s  ({frames} frames)")
+        start = time.perf_counter()
+        for _, frame_file in list_msight_json_files(path):
+            parse_msight_json_file(frame_file)
+        # building the points and the manager stays in the calling process
+        print(f"  parsing   {time.perf_counter() - start:7.2f} s of it, the part a pool can spread over the cores")
+        for name, processes in (('threads', False), ('processes', True)):
+            elapsed, frames = time_load(path, workers=workers, processes=processes)
+            print(f"  {name:<9} {elapsed:7.2f} s  ({frames} frames)  speedup {serial / elapsed:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Route queries of the compiled LaneGraph: shortest routes with a cold and a warm LRU cache, k-hop reachability and the
+routes through intersection lanelets, on the synthetic grid map of benchmarks/map_lookup.py.
+
+    python benchmarks/lane_graph.py [num_lanes] [num_queries]
+"""
+import random
+import sys
+import time
+from map_lookup import make_grid_map
+
+
+def measure(name, func, queries):
+    start = time.perf_counter()
+    for args in queries:
+        func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {elapsed / len(queries) * 1e6:10.2f} us per query, {len(queries) / elapsed:10.0f} queries/s")
+
+
+def main():
+    num_lanes = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    map_object = make_grid_map(num_lanes)
+    start = time.perf_counter()
+    graph = map_object.lane_graph(lane_change_cost=10.0)
+    print(f"{num_lanes} lanelets, graph compiled in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    random.seed(0)
+    ids = map_object.map_polylines_ids
+    # intent prediction asks for the routes of the same few origin and destination pairs over and over
+    pairs = [(random.choice(ids), random.choice(ids)) for _ in range(num_queries // 10)]
+    measure('shortest_route cold', graph.shortest_route, pairs)
+    measure('shortest_route warm', graph.shortest_route, [random.choice(pairs) for _ in range(num_queries)])
+    graph.cache_clear()
+    measure('reachable k=5', graph.reachable, [(random.choice(ids), 5) for _ in range(num_queries)])
+    intersections = map_object.intersection_lane_id_list
+    measure('routes_through', graph.routes_through, [(random.choice(intersections),) for _ in range(num_queries)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Startup cost of a MapObject: building it from a commonroad LaneletNetwork in a fresh interpreter against loading the
+compiled cache (MapObject.save/load), which imports neither commonroad nor matplotlib.
+
+    python benchmarks/map_cache.py [num_lanes]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from map_lookup import make_grid_map
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+
+def run(code):
+    # wall time of a fresh interpreter running code, so the imports are part of the cost
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=BENCHMARKS)
+    return time.perf_counter() - start
+
+
+def main():
+    num_lanes = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    with tempfile.TemporaryDirectory() as path:
+        make_grid_map(num_lanes).save(path, source_hash='benchmark')
+        baseline = run("pass")
+        build = run(f"from map_lookup import make_grid_map; make_grid_map({num_lanes})")
+        load = run(f"from msight_base.map import MapObject; MapObject.load({path!r}, source_hash='benchmark')")
+    print(f"{num_lanes} lanelets, interpreter startup {baseline * 1e3:.0f} ms")
+    print(f"build from commonroad {(build - baseline) * 1e3:8.0f} ms")
+    print(f"load compiled cache   {(load - baseline) * 1e3:8.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Lanelet lookups of MapObject: single id accessors and the batch accessors over the contiguous lane arrays. The synthetic
+grid map built here (rows of straight lanelets chained by successors, neighbors to the left and right) is shared by the
+other map benchmarks.
+
+    python benchmarks/map_lookup.py [num_lanes] [points_per_lane]
+"""
+import sys
+import time
+import numpy as np
+from commonroad.scenario.lanelet import Lanelet, LaneletNetwork, LaneletType
+from msight_base.map import MapObject, LaneShape
+
+LANE_WIDTH = 3.5
+LANES_PER_ROW = 20
+LANE_LENGTH = 50.0
+
+
+def make_grid_map(num_lanes=400, points_per_lane=30):
+    # lanelet 1000 + i is in row i // LANES_PER_ROW, rows are LANE_WIDTH apart and every fifth column is an intersection
+    lanelets = []
+    lanes, headings, seg_lengths = [], [], []
+    num_rows = -(-num_lanes // LANES_PER_ROW)
+    for i in range(num_lanes):
+        row, col = divmod(i, LANES_PER_ROW)
+        lane_id = 1000 + i
+        x = np.linspace(col * LANE_LENGTH, (col + 1) * LANE_LENGTH, points_per_lane)
+        center = np.stack([x, np.full(points_per_lane, (row + 0.5) * LANE_WIDTH)], axis=1)
+        offset = np.array([0.0, LANE_WIDTH / 2])
+        adj_left = lane_id + LANES_PER_ROW if row < num_rows - 1 and i + LANES_PER_ROW < num_lanes else None
+        adj_right = lane_id - LANES_PER_ROW if row > 0 else None
+        lanelets.append(Lanelet(center + offset, center, center - offset, lane_id,
+                                predecessor=[lane_id - 1] if col > 0 else [],
+                                successor=[lane_id + 1] if col < LANES_PER_ROW - 1 and i + 1 < num_lanes else [],
+                                adjacent_left=adj_left, adjacent_left_same_direction=True if adj_left else None,
+                                adjacent_right=adj_right, adjacent_right_same_direction=True if adj_right else None,
+                                lanelet_type={LaneletType.INTERSECTION} if col % 5 == 4 else {LaneletType.URBAN}))
+        lanes.append(center.tolist())
+        # the heading of a polyline point is the direction of its segment, in degrees
+        headings.append([0.0] * points_per_lane)
+        seg_lengths.append(np.append(np.diff(x), 0.0).tolist())
+    network = LaneletNetwork.create_from_lanelet_list(lanelets)
+    return MapObject(network, (0.0, 0.0), lanes, headings, [LaneShape.STRAIGHT] * num_lanes, seg_lengths, None, None)
+
+
+def main():
+    num_lanes = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    points_per_lane = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    map_object = make_grid_map(num_lanes, points_per_lane)
+    rng = np.random.default_rng(0)
+    ids = rng.choice(map_object.map_polylines_ids, 10000)
+    idx = rng.integers(0, points_per_lane, 10000)
+    print(f"{num_lanes} lanelets with {points_per_lane} points")
+
+    start = time.perf_counter()
+    for lane_id, i in zip(ids.tolist(), idx.tolist()):
+        map_object.lane_heading(lane_id, i)
+        map_object.suc_edges(lane_id)
+    elapsed = time.perf_counter() - start
+    print(f"single accessors {elapsed / len(ids) * 1e6:8.2f} us per id")
+
+    repeat = 20
+    start = time.perf_counter()
+    for _ in range(repeat):
+        map_object.lane_points_at(ids, idx)
+        map_object.lane_headings_at(ids, idx)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"batch accessors  {elapsed / len(ids) * 1e6:8.2f} us per id")
+
+
+if __name__ == '__main__':
+    main()
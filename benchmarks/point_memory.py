@@ -0,0 +1,33 @@
+# Memory benchmark of RoadUserPoint (per-instance __dict__) against CompactRoadUserPoint (__slots__).
+# Points are created the way read_msight_json_data creates them, alone and linked into a TrajectoryManager.
+import gc
+import tracemalloc
+from msight_base import TrajectoryManager, RoadUserPoint, CompactRoadUserPoint
+
+
+def make_points(point_cls, num_tracks, step):
+    return [point_cls(42.27 + step * 1e-6, -83.69 + traj_id * 1e-6, heading=170.0 + traj_id, width=1.8, length=4.5)
+            for traj_id in range(num_tracks)]
+
+
+def measure(point_cls, num_tracks, num_frames, with_manager):
+    gc.collect()
+    tracemalloc.start()
+    if with_manager:
+        tm = TrajectoryManager()
+        for step in range(num_frames):
+            tm.add_frame(make_points(point_cls, num_tracks, step), traj_ids=list(range(num_tracks)), timestamp=step * 0.1)
+    else:
+        points = [make_points(point_cls, num_tracks, step) for step in range(num_frames)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, num_tracks * num_frames
+
+
+if __name__ == "__main__":
+    for with_manager in (False, True):
+        print("points in a TrajectoryManager" if with_manager else "points only")
+        for point_cls in (RoadUserPoint, CompactRoadUserPoint):
+            total, num_points = measure(point_cls, 300, 500, with_manager)
+            print(f"  {point_cls.__name__:22s}: {total / 2 ** 20:7.1f} MiB for {num_points} points, "
+                  f"{total / num_points:6.1f} bytes/point")
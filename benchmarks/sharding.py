@@ -0,0 +1,67 @@
+"""
+Check and timing of map_shards: kinematics_by_step over a recording split into shards, in worker processes, against the
+same function run in one process over the whole recording. The recording has timezone-aware timestamps and numpy
+traj_ids, which must survive the round trip through the recording format. Exits with status 1 when the sharded result
+differs from the single process one. The sharded run is only faster with at least as many cores as shards, on one core
+it measures the overhead of starting the workers and loading every shard.
+
+    python benchmarks/sharding.py [num_frames] [num_objects] [num_shards]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+import numpy as np
+from msight_base import TrajectoryManager, RoadUserPoint
+from msight_base.sharding import kinematics_by_step, map_shards, recording_origin
+
+
+def build(num_frames, num_objects):
+    # objects driving east at different speeds, entering and leaving so that trajectories cross shard boundaries
+    rng = np.random.default_rng(0)
+    start = datetime(2024, 5, 1, 8, tzinfo=timezone(timedelta(hours=-4)))
+    speeds = rng.uniform(5, 20, num_objects)
+    tm = TrajectoryManager()
+    for step in range(num_frames):
+        timestamp = start + timedelta(seconds=0.1 * step)
+        ids = [k for k in range(num_objects) if (step + 37 * k) % 400 < 300]
+        # every appearance of an object is a new trajectory, a gap of 100 frames is more than the overlap
+        tm.add_frame([RoadUserPoint(42.3 + 1e-4 * k, -83.7 + 1.2e-5 * speeds[k] * step * 0.1,
+                                    heading=90.0 + rng.normal(0, 1)) for k in ids],
+                     traj_ids=[np.int64(k + num_objects * ((step + 37 * k) // 400)) for k in ids], timestamp=timestamp)
+    return tm
+
+
+def main():
+    num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    num_objects = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    num_shards = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    tm = build(num_frames, num_objects)
+    failed = False
+    print(f"{os.cpu_count()} cores")
+    with tempfile.TemporaryDirectory() as path:
+        tm.save(path)
+        origin = recording_origin(path)
+        for method in ('gradient', 'savgol'):
+            start = time.perf_counter()
+            expected = kinematics_by_step(tm, method=method, origin=origin)
+            single = time.perf_counter() - start
+            start = time.perf_counter()
+            sharded = map_shards(tm, partial(kinematics_by_step, method=method), num_shards=num_shards, overlap=10,
+                                 workers=num_shards, pass_origin=True)
+            elapsed = time.perf_counter() - start
+            same = expected.keys() == sharded.keys() and all(
+                expected[traj_id].keys() == sharded[traj_id].keys() and
+                np.allclose(np.array(list(expected[traj_id].values()), dtype=float),
+                            np.array(list(sharded[traj_id].values()), dtype=float), equal_nan=True, rtol=1e-9)
+                for traj_id in expected)
+            failed |= not same
+            print(f"{method:<9} single process {single:6.2f} s, {num_shards} shards {elapsed:6.2f} s "
+                  f"{'identical' if same else 'DIFFERENT'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
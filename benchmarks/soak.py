@@ -0,0 +1,88 @@
+"""
+Memory of a long running TrajectoryManager with ID churn: every frame some tracks end and new IDs appear. The traced
+memory is sampled over the run together with the number of live points and frames, which go up and down with the age
+of the live tracks. After a warm up the memory must be explained by them: the exit status is 1 when a least squares fit
+of the memory on the live points, the live frames and the time shows growth over time. Evicted frames and points are
+unlinked, so they are freed by reference counting: the cyclic garbage collector is disabled during the run and the
+check also fails when a gc.collect() at a sample finds evicted objects left in reference cycles, or when the peak
+rises far above the largest sample.
+
+    python benchmarks/soak.py [num_frames] [num_objects] [churn]
+"""
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+import numpy as np
+from msight_base import TrajectoryManager, RoadUserPoint
+
+
+def run(tm, num_frames, num_objects, churn, samples=40):
+    # churn is the probability that a track ends at a frame, it is replaced by a new ID
+    rng = random.Random(0)
+    next_id = num_objects
+    tracks = {traj_id: (rng.random(), rng.random()) for traj_id in range(num_objects)}
+    # eviction reasons are counted, a list of them would grow with the run
+    finished = Counter()
+    tm.on_evict = lambda traj, reason: finished.update((reason,))
+    # (memory, live points, live frames) at every sample
+    usage = []
+    garbage = 0
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for step in range(num_frames):
+        for traj_id in [traj_id for traj_id in tracks if rng.random() < churn]:
+            del tracks[traj_id]
+            tracks[next_id] = (rng.random(), rng.random())
+            next_id += 1
+        # a track is missed by the detector now and then
+        objects = [RoadUserPoint(x + step * 1e-5, y, traj_id=traj_id) for traj_id, (x, y) in tracks.items() if rng.random() > 0.05]
+        tm.add_frame(objects, timestamp=step * 0.1)
+        if (step + 1) % (num_frames // samples) == 0:
+            usage.append((tracemalloc.get_traced_memory()[0], tm.num_points, len(tm.frames)))
+            garbage += gc.collect()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    gc.enable()
+    return usage, peak, elapsed, next_id, finished, garbage
+
+
+def main():
+    num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_objects = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    churn = float(sys.argv[3]) if len(sys.argv) > 3 else 0.01
+    configurations = {
+        'max_frames': dict(max_frames=100),
+        'idle': dict(max_frames=1000, max_idle_frames=20),
+        'points': dict(max_points=2000, max_idle_seconds=2.0),
+        'bytes': dict(max_bytes=1 << 20, max_traj_length=50),
+    }
+    grows = False
+    for name, kwargs in configurations.items():
+        tm = TrajectoryManager(**kwargs)
+        usage, peak, elapsed, num_ids, finished, garbage = run(tm, num_frames, num_objects, churn)
+        # the first half of the samples is the warm up, the window is full after it
+        memory = np.array([b for b, _, _ in usage], dtype=float)
+        steady = np.array(usage[len(usage) // 2:], dtype=float)
+        t = np.linspace(0.0, 1.0, len(steady))
+        design = np.column_stack([np.ones(len(steady)), steady[:, 1], steady[:, 2], t])
+        coefficients = np.linalg.lstsq(design, steady[:, 0], rcond=None)[0]
+        # memory added over the steady part of the run that the live points and frames do not explain
+        growth = coefficients[3] / steady[:, 0].mean()
+        spike = peak / memory.max()
+        grows |= growth > 0.1 or spike > 1.5 or garbage > 0
+        evicted = ', '.join(f"{count} {reason}" for reason, count in sorted(finished.items())) or 'none'
+        print(f"{name:<11} {num_frames / elapsed:8.0f} frames/s, {num_ids} IDs, {len(tm.trajectories)} live trajectories, "
+              f"{tm.num_points} points, evicted {evicted}, memory {memory.min() / 1e6:.2f} to {memory.max() / 1e6:.2f} MB, "
+              f"peak {peak / 1e6:.2f} MB ({spike:.2f}x), {coefficients[1]:.0f} bytes/point, "
+              f"{coefficients[2]:.0f} bytes/frame, cyclic garbage {garbage}, steady growth {growth:+.1%}")
+    sys.exit(1 if grows else 0)
+
+
+if __name__ == '__main__':
+    main()
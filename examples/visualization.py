@@ -1,16 +1,17 @@
 from pathlib import Path
-from msight_base.utils.data import read_msight_json_data
+from msight_base.replay import replay_msight_json
 from msight_base.visualizer import Visualizer
 import cv2
 
 data_path = Path("./example_data/traj_geddes_huron")
 
-tm = read_msight_json_data(data_path)
 visualizer = Visualizer("./basemap_configs/huron_geddes.jpg")
 
-for frame in tm.frames:
+# frames are streamed from disk, only the last 100 frames are kept in memory
+for tm in replay_msight_json(data_path, max_frames=100, prefetch=8):
+    frame = tm.last_frame
     # print(f"Frame {frame.step} at {frame.timestamp}")
     vis_img = visualizer.render(frame, with_traj=True)
     cv2.imshow("Frame", vis_img)
     cv2.waitKey(100)
-cv2.destroyAllWindows()
\ No newline at end of file
+cv2.destroyAllWindows()
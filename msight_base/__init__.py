@@ -1,3 +1,11 @@
 from .detection import *
 from .road_user import *
-from .trajectory import *
\ No newline at end of file
+from .trajectory import *
+
+
+def __getattr__(name):
+    # MapInfo came with road_user before map was lazy, importing map here keeps NumPy out of `import msight_base`
+    if name == 'MapInfo':
+        from .map import MapInfo
+        return MapInfo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
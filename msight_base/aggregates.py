@@ -0,0 +1,260 @@
+import math
+from collections import deque
+from itertools import islice
+import numpy as np
+from .utils.geo import latlon_distance
+from .utils.timestamp import timestamp_to_seconds
+
+AGGREGATE_FIELDS = ('count', 'first_step', 'last_step', 'first_seen', 'last_seen', 'dwell_time', 'path_length',
+                    'mean_speed', 'max_speed', 'min_x', 'max_x', 'min_y', 'max_y')
+
+
+class _SlidingExtreme:
+    # maximum (sign=1) or minimum (sign=-1) of the values of a sliding window with a monotonic deque of (step, value),
+    # O(1) amortized as long as values are appended at the end and removed from the front
+    __slots__ = ('sign', 'items')
+
+    def __init__(self, sign):
+        self.sign = sign
+        self.items = deque()
+
+    def push(self, step, value):
+        items = self.items
+        key = value * self.sign
+        while items and items[-1][1] <= key:
+            items.pop()
+        items.append((step, key))
+
+    def evict(self, step):
+        if self.items and self.items[0][0] == step:
+            self.items.popleft()
+
+    @property
+    def value(self):
+        return self.items[0][1] * self.sign if self.items else None
+
+    def copy(self):
+        other = _SlidingExtreme(self.sign)
+        other.items = deque(self.items)
+        return other
+
+
+def _distance(a, b, latlon):
+    if a.x is None or a.y is None or b.x is None or b.y is None:
+        return 0.0
+    if latlon:
+        return latlon_distance(a.x, a.y, b.x, b.y)
+    return math.hypot(b.x - a.x, b.y - a.y)
+
+
+def _segment_speed(a, b, latlon):
+    dt = timestamp_to_seconds(b.timestamp) - timestamp_to_seconds(a.timestamp)
+    return _distance(a, b, latlon) / dt if dt > 0 else None
+
+
+class TrajectoryAggregates:
+    """
+    Summary of the points currently in a Trajectory, kept up to date by Trajectory.add_object and remove_object.
+
+    The path length is updated in O(1). Maxima and minima are kept with monotonic deques, which is O(1) amortized when
+    points are appended at the end and evicted from the front, the way a TrajectoryManager window slides. Inserting or
+    removing a point anywhere else only marks the extremes stale, they are rebuilt on the next read. Speeds are derived from
+    the positions and timestamps of consecutive points, which are known when a point is added, unlike its speed attribute
+    that is often written later. With latlon=True x/y are latitude/longitude, distances are in meters.
+    """
+    def __init__(self, traj, latlon=True):
+        self.traj = traj
+        self.latlon = latlon
+        self.path_length = 0.0
+        self._extremes = None
+        self._stale = False
+        self._reset_extremes()
+
+    def _reset_extremes(self):
+        self._extremes = {
+            'max_speed': _SlidingExtreme(1),
+            'min_x': _SlidingExtreme(-1),
+            'max_x': _SlidingExtreme(1),
+            'min_y': _SlidingExtreme(-1),
+            'max_y': _SlidingExtreme(1),
+        }
+
+    def _push_extremes(self, obj, step, prev_obj, prev_step):
+        # the speed of a segment is keyed by the step of its first point, so it leaves the window with that point
+        extremes = self._extremes
+        if prev_obj is not None:
+            speed = _segment_speed(prev_obj, obj, self.latlon)
+            if speed is not None:
+                extremes['max_speed'].push(prev_step, speed)
+        if obj.x is not None:
+            extremes['min_x'].push(step, obj.x)
+            extremes['max_x'].push(step, obj.x)
+        if obj.y is not None:
+            extremes['min_y'].push(step, obj.y)
+            extremes['max_y'].push(step, obj.y)
+
+    def on_add(self, obj, step, prev_obj, next_obj, at_end):
+        # prev_obj and next_obj are the neighbors of obj in the trajectory after it was added
+        if prev_obj is not None:
+            self.path_length += _distance(prev_obj, obj, self.latlon)
+        if next_obj is not None:
+            self.path_length += _distance(obj, next_obj, self.latlon)
+            if prev_obj is not None:
+                self.path_length -= _distance(prev_obj, next_obj, self.latlon)
+        if at_end and not self._stale:
+            self._push_extremes(obj, step, prev_obj, self.traj.steps[-2] if prev_obj is not None else None)
+        else:
+            self._stale = True
+
+    def on_remove(self, obj, step, prev_obj, next_obj, at_front):
+        # prev_obj and next_obj are the neighbors of obj in the trajectory before it was removed
+        if prev_obj is not None:
+            self.path_length -= _distance(prev_obj, obj, self.latlon)
+        if next_obj is not None:
+            self.path_length -= _distance(obj, next_obj, self.latlon)
+            if prev_obj is not None:
+                self.path_length += _distance(prev_obj, next_obj, self.latlon)
+        if at_front and not self._stale:
+            for extreme in self._extremes.values():
+                extreme.evict(step)
+        else:
+            self._stale = True
+        if len(self.traj.objects) == 0:
+            # start again from exact zeros, so rounding errors do not outlive the points
+            self.path_length = 0.0
+            self._reset_extremes()
+            self._stale = False
+
+    def refresh(self):
+        # recompute everything from the points, e.g. after their positions were modified in place
+        objects = self.traj.objects
+        self.path_length = sum(_distance(a, b, self.latlon) for a, b in zip(objects, islice(objects, 1, None)))
+        self._stale = True
+
+    def _extreme(self, name):
+        if self._stale:
+            self._reset_extremes()
+            prev_obj = prev_step = None
+            for obj, step in zip(self.traj.objects, self.traj.steps):
+                self._push_extremes(obj, step, prev_obj, prev_step)
+                prev_obj, prev_step = obj, step
+            self._stale = False
+        return self._extremes[name].value
+
+    def copy(self, traj):
+        other = TrajectoryAggregates.__new__(TrajectoryAggregates)
+        other.traj = traj
+        other.latlon = self.latlon
+        other.path_length = self.path_length
+        other._extremes = {name: extreme.copy() for name, extreme in self._extremes.items()}
+        other._stale = self._stale
+        return other
+
+    @property
+    def count(self):
+        return len(self.traj.objects)
+
+    @property
+    def first_step(self):
+        return self.traj.steps[0] if self.traj.steps else None
+
+    @property
+    def last_step(self):
+        return self.traj.steps[-1] if self.traj.steps else None
+
+    @property
+    def first_seen(self):
+        return self.traj.objects[0].timestamp if self.traj.objects else None
+
+    @property
+    def last_seen(self):
+        return self.traj.objects[-1].timestamp if self.traj.objects else None
+
+    @property
+    def dwell_time(self):
+        # seconds between the first and the last point
+        if not self.traj.objects:
+            return None
+        return timestamp_to_seconds(self.last_seen) - timestamp_to_seconds(self.first_seen)
+
+    @property
+    def mean_speed(self):
+        # path length over dwell time
+        dwell_time = self.dwell_time
+        return self.path_length / dwell_time if dwell_time else None
+
+    @property
+    def max_speed(self):
+        return self._extreme('max_speed')
+
+    @property
+    def min_x(self):
+        return self._extreme('min_x')
+
+    @property
+    def max_x(self):
+        return self._extreme('max_x')
+
+    @property
+    def min_y(self):
+        return self._extreme('min_y')
+
+    @property
+    def max_y(self):
+        return self._extreme('max_y')
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in AGGREGATE_FIELDS}
+
+
+def aggregate_table(tm, fields=AGGREGATE_FIELDS):
+    """
+    Aggregates of every trajectory of a TrajectoryManager created with track_aggregates=True as columns: traj_id is a list,
+    the fields are float64 arrays with NaN for missing values, first_seen and last_seen are in seconds.
+    """
+    trajectories = tm.trajectories
+    if any(traj.aggregates is None for traj in trajectories):
+        raise ValueError("Aggregates are not tracked, create the TrajectoryManager with track_aggregates=True")
+    table = {'traj_id': [traj.id for traj in trajectories]}
+    for field in fields:
+        if field in ('first_seen', 'last_seen'):
+            values = [timestamp_to_seconds(getattr(traj.aggregates, field)) for traj in trajectories]
+        else:
+            values = [getattr(traj.aggregates, field) for traj in trajectories]
+        table[field] = np.array(values, dtype=np.float64).reshape(len(trajectories))
+    return table
+
+
+def select_trajectories(tm, where=None, sort_by=None, descending=False, limit=None, **ranges):
+    """
+    traj_ids of the trajectories whose aggregates pass the filters, sorted by the aggregate sort_by.
+
+    ranges are field=(low, high) bounds, inclusive, None for an open side, e.g. select_trajectories(tm, max_speed=(10, None)).
+    where is a callable taking the aggregate table and returning a boolean mask. Trajectories with a NaN sort key come last.
+    """
+    fields = set(ranges)
+    if sort_by is not None:
+        fields.add(sort_by)
+    unknown = fields - set(AGGREGATE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown aggregate fields {sorted(unknown)}, valid fields are {AGGREGATE_FIELDS}")
+    table = aggregate_table(tm, fields=AGGREGATE_FIELDS if where is not None else [f for f in AGGREGATE_FIELDS if f in fields])
+    mask = np.ones(len(table['traj_id']), dtype=bool)
+    for field, (low, high) in ranges.items():
+        column = table[field]
+        if low is not None:
+            mask &= column >= low
+        if high is not None:
+            mask &= column <= high
+    if where is not None:
+        mask &= np.asarray(where(table), dtype=bool)
+    indices = np.flatnonzero(mask)
+    if sort_by is not None:
+        keys = table[sort_by][indices]
+        keys = -keys if descending else keys
+        # NaN sorts last either way
+        indices = indices[np.argsort(keys, kind='stable')]
+    if limit is not None:
+        indices = indices[:limit]
+    traj_ids = table['traj_id']
+    return [traj_ids[i] for i in indices.tolist()]
@@ -0,0 +1,177 @@
+import json
+import struct
+from itertools import islice, starmap
+from operator import attrgetter
+import numpy as np
+from .detection import DetectionResultBase
+from .point_columns import FLOAT_COLUMNS, SIDE_COLUMNS, MISSING_CATEGORY, encode_side, decode_side, encode_traj_id, \
+    decode_traj_id
+from .road_user import RoadUserPointBase, RoadUserPoint, RoadUserCategory, CompactRoadUserPoint
+from .utils.cls import get_class_path, import_class_from_path
+
+MAGIC = b'MSDB'
+CODEC_VERSION = 2
+# magic, version, length of the JSON metadata
+_HEADER = struct.Struct('<4sHI')
+_ALIGNMENT = 8
+
+# arguments of RoadUserPointBase.__init__ in order, classes that keep this signature are built with positional arguments
+_POINT_ARGUMENTS = ('x', 'y', 'speed', 'acceleration', 'heading', 'width', 'length', 'height', 'poly_box', 'category',
+                    'confidence', 'turning_signal', 'map_info', 'timestamp', 'frame_step', 'traj_id', 'sensor_data',
+                    'behaviors', 'conf_int_2sigma', 'conf_int_vel_2sigma', 'heading_confidence', 'yaw_rate')
+_get_floats = attrgetter(*FLOAT_COLUMNS)
+_get_side = attrgetter(*('_' + name if name in ('behaviors', 'sensor_data') else name for name in SIDE_COLUMNS))
+_CATEGORIES = {int(category): category for category in RoadUserCategory}
+_CATEGORIES[MISSING_CATEGORY] = None
+# classes whose attributes are exactly the columns, lists of other classes (subclasses included) go through to_dict
+_COLUMNAR_CLASSES = (RoadUserPointBase, RoadUserPoint, CompactRoadUserPoint)
+
+
+def _is_set(name, value):
+    # empty behaviors and sensor_data are what from_dict gives for missing ones
+    return value is not None and not (name in ('behaviors', 'sensor_data') and len(value) == 0)
+
+
+def encode_detections(results, binary=True):
+    """
+    Encode a list of DetectionResultBase messages into one bytes object.
+
+    The object list of a message that holds only RoadUserPoint (or only CompactRoadUserPoint) objects, not subclasses, is
+    stored column by column: the numeric attributes as float64 blocks, the category as int16 and the rarely set
+    attributes (map_info, behaviors, ...) in a sparse table of the JSON metadata. Any other object list falls back to
+    the to_dict of every object, with its own class. With binary=False the messages are encoded as a JSON list of
+    DetectionResultBase.to_dict, which decode_detections reads as well.
+    """
+    if not binary:
+        return json.dumps([result.to_dict() for result in results]).encode()
+
+    classes = []
+    class_to_index = {}
+    messages = []
+    objects = []
+    dict_objects = []
+    dict_classes = []
+
+    def class_index(obj_cls):
+        path = get_class_path(obj_cls)
+        index = class_to_index.get(path)
+        if index is None:
+            index = class_to_index[path] = len(classes)
+            classes.append(path)
+        return index
+
+    for result in results:
+        object_list = result.object_list
+        obj_cls = type(object_list[0]) if len(object_list) > 0 else RoadUserPointBase
+        columnar = obj_cls in _COLUMNAR_CLASSES and all(type(obj) is obj_cls for obj in object_list)
+        messages.append([result.timestamp, result.sensor_type, class_index(obj_cls), len(object_list), columnar])
+        if columnar:
+            objects.extend(object_list)
+        else:
+            for obj in object_list:
+                obj_dict = obj.to_dict()
+                # numpy traj_ids as in the columnar path, decode_detections turns the lists of tuple ids back
+                if 'traj_id' in obj_dict:
+                    obj_dict['traj_id'] = encode_traj_id(obj_dict['traj_id'])
+                dict_objects.append(obj_dict)
+                dict_classes.append(class_index(type(obj)))
+
+    n = len(objects)
+    side = {}
+    empty = (None,) * len(SIDE_COLUMNS)
+    for i, values in enumerate(map(_get_side, objects)):
+        if values == empty:
+            continue
+        for name, value in zip(SIDE_COLUMNS, values):
+            if _is_set(name, value):
+                side.setdefault(name, {})[str(i)] = encode_side(name, value)
+    timestamps = [obj.timestamp for obj in objects]
+    frame_steps = [obj.frame_step for obj in objects]
+    meta = {
+        'messages': messages,
+        'classes': classes,
+        'num_objects': n,
+        'traj_ids': [encode_traj_id(obj.traj_id) for obj in objects],
+        # both are usually None for detections, they are only stored when one of them is set
+        'timestamps': timestamps if any(t is not None for t in timestamps) else None,
+        'frame_steps': frame_steps if any(s is not None for s in frame_steps) else None,
+        'side': side,
+        'dict_objects': dict_objects,
+        'dict_classes': dict_classes,
+    }
+    meta_bytes = json.dumps(meta).encode()
+    header = _HEADER.pack(MAGIC, CODEC_VERSION, len(meta_bytes))
+    padding = -(len(header) + len(meta_bytes)) % _ALIGNMENT
+
+    floats = np.array(list(map(_get_floats, objects)), dtype=np.float64).reshape(n, len(FLOAT_COLUMNS))
+    categories = np.array([MISSING_CATEGORY if obj.category is None else int(obj.category) for obj in objects], dtype=np.int16)
+    return b''.join((header, meta_bytes, b'\0' * padding, np.ascontiguousarray(floats.T).tobytes(), categories.tobytes()))
+
+
+def _decode_json(data):
+    # a list of DetectionResultBase.to_dict, or a single one as sent by the JSON message path
+    messages = json.loads(data)
+    if isinstance(messages, dict):
+        messages = [messages]
+    return [DetectionResultBase.from_dict(message) for message in messages]
+
+
+def decode_detections(data):
+    # inverse of encode_detections, both the binary and the JSON encoding are accepted
+    data = bytes(data) if not isinstance(data, bytes) else data
+    if data[:len(MAGIC)] != MAGIC:
+        return _decode_json(data)
+    _, version, meta_length = _HEADER.unpack_from(data)
+    if version > CODEC_VERSION:
+        raise ValueError(f"Unsupported codec version {version}, the latest supported version is {CODEC_VERSION}")
+    offset = _HEADER.size
+    meta = json.loads(data[offset:offset + meta_length])
+    offset += meta_length
+    offset += -offset % _ALIGNMENT
+
+    n = meta['num_objects']
+    floats = np.frombuffer(data, dtype=np.float64, count=n * len(FLOAT_COLUMNS), offset=offset).reshape(len(FLOAT_COLUMNS), n)
+    categories = np.frombuffer(data, dtype=np.int16, count=n, offset=offset + floats.nbytes).tolist()
+    # every argument of the point constructor as a full column, the sparse ones are filled from the side table
+    columns = dict(zip(FLOAT_COLUMNS, ([None if value != value else value for value in column] for column in floats.tolist())))
+    columns['category'] = [_CATEGORIES[category] if category in _CATEGORIES else RoadUserCategory(category) for category in categories]
+    columns['traj_id'] = [decode_traj_id(traj_id) if isinstance(traj_id, list) else traj_id for traj_id in meta['traj_ids']]
+    columns['timestamp'] = meta['timestamps']
+    columns['frame_step'] = meta['frame_steps']
+    for name, values in meta['side'].items():
+        column = columns[name] = [None] * n
+        for row, value in values.items():
+            column[int(row)] = decode_side(name, value)
+    none = [None] * n
+    rows = zip(*(none if columns.get(name) is None else columns[name] for name in _POINT_ARGUMENTS))
+
+    classes = [import_class_from_path(path) for path in meta['classes']]
+    results = []
+    dict_objects = iter(meta['dict_objects'])
+    # version 1 has no dict_classes, the objects of a message all have the class of the message
+    dict_classes = iter(meta['dict_classes']) if 'dict_classes' in meta else None
+    for timestamp, sensor_type, class_index, count, columnar in meta['messages']:
+        obj_cls = classes[class_index]
+        if not columnar:
+            object_list = [(obj_cls if dict_classes is None else classes[next(dict_classes)]).from_dict(next(dict_objects))
+                           for _ in range(count)]
+            for obj in object_list:
+                if isinstance(getattr(obj, 'traj_id', None), list):
+                    obj.traj_id = decode_traj_id(obj.traj_id)
+        elif obj_cls.__init__ in (RoadUserPointBase.__init__, CompactRoadUserPoint.__init__):
+            object_list = list(starmap(obj_cls, islice(rows, count)))
+        else:
+            object_list = [obj_cls(**dict(zip(_POINT_ARGUMENTS, row))) for row in islice(rows, count)]
+        results.append(DetectionResultBase(object_list, timestamp, sensor_type=sensor_type))
+    return results
+
+
+def encode_detection(result, binary=True):
+    return encode_detections([result], binary=binary)
+
+
+def decode_detection(data):
+    results = decode_detections(data)
+    if len(results) != 1:
+        raise ValueError(f"Expected one detection message, got {len(results)}")
+    return results[0]
@@ -0,0 +1,297 @@
+import numpy as np
+from .road_user import RoadUserPoint
+from .utils.timestamp import timestamp_to_seconds
+
+# numeric attributes of RoadUserPoint that are stored as float64 columns, missing values are stored as NaN
+COLUMN_FIELDS = ('x', 'y', 'speed', 'acceleration', 'heading', 'width', 'length', 'yaw_rate')
+
+
+def points_to_arrays(objects, fields=COLUMN_FIELDS):
+    # copy the numeric attributes of a sequence of RoadUserPoint into float64 arrays
+    objects = list(objects)
+    arrays = {}
+    for field in fields:
+        arrays[field] = np.array([getattr(obj, field) for obj in objects], dtype=np.float64)
+    arrays['step'] = np.array([-1 if obj.frame_step is None else obj.frame_step for obj in objects], dtype=np.int64)
+    arrays['timestamp'] = np.array([timestamp_to_seconds(obj.timestamp) for obj in objects], dtype=np.float64)
+    return arrays
+
+
+class ColumnBuffer:
+    """
+    Growable struct-of-arrays storage. Arrays returned by as_arrays are views on the buffer, they stay valid
+    until an append grows the buffer past its capacity.
+    """
+    def __init__(self, fields=COLUMN_FIELDS, int_fields=('step',), capacity=64):
+        self.fields = tuple(fields)
+        self.int_fields = tuple(int_fields)
+        self._size = 0
+        self._columns = {}
+        for field in self.fields:
+            self._columns[field] = np.full(capacity, np.nan, dtype=np.float64)
+        for field in self.int_fields:
+            self._columns[field] = np.zeros(capacity, dtype=np.int64)
+        self._columns['timestamp'] = np.full(capacity, np.nan, dtype=np.float64)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._columns['timestamp'])
+
+    def reserve(self, size):
+        if size <= self.capacity:
+            return
+        capacity = max(size, 2 * self.capacity)
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def append(self, values):
+        # values maps column name to value, missing float columns are stored as NaN
+        self.reserve(self._size + 1)
+        i = self._size
+        for name, column in self._columns.items():
+            value = values.get(name)
+            if value is None:
+                column[i] = np.nan if column.dtype.kind == 'f' else -1
+            else:
+                column[i] = value
+        self._size += 1
+
+    def extend(self, values, count):
+        # values maps column name to an array like of length count
+        self.reserve(self._size + count)
+        start, end = self._size, self._size + count
+        for name, column in self._columns.items():
+            value = values.get(name)
+            if value is None:
+                column[start:end] = np.nan if column.dtype.kind == 'f' else -1
+            else:
+                column[start:end] = _as_column(value, column.dtype)
+        self._size = end
+
+    def truncate(self, size):
+        # drop the rows from size on, the capacity is kept
+        self._size = min(self._size, size)
+
+    def column(self, name, start=0, end=None):
+        end = self._size if end is None else end
+        return self._columns[name][start:end]
+
+    def as_arrays(self, start=0, end=None):
+        end = self._size if end is None else end
+        return {name: column[start:end] for name, column in self._columns.items()}
+
+
+def _as_column(values, dtype):
+    if not isinstance(values, np.ndarray) and dtype.kind == 'f':
+        values = [np.nan if value is None else value for value in values]
+    return np.asarray(values, dtype=dtype)
+
+
+class ManagedColumnarTrajectory:
+    """
+    Trajectory of a ColumnarTrajectoryManager: its points are rows of the frame-major store of the manager, scattered
+    over the frames, so as_arrays, steps and timestamps gather them in step order into new arrays (copies, writing to
+    them does not change the store) and write_columns writes values back into the store.
+    """
+    def __init__(self, manager, index, id=None):
+        self.manager = manager
+        self.index = index
+        self.id = id
+
+    @property
+    def rows(self):
+        order, offsets = self.manager.trajectory_rows()
+        return order[offsets[self.index]:offsets[self.index + 1]]
+
+    def __len__(self):
+        _, offsets = self.manager.trajectory_rows()
+        return int(offsets[self.index + 1] - offsets[self.index])
+
+    @property
+    def steps(self):
+        return self.manager._buffer.column('step').take(self.rows)
+
+    @property
+    def timestamps(self):
+        return self.manager._buffer.column('timestamp').take(self.rows)
+
+    def as_arrays(self):
+        rows = self.rows
+        return {name: column.take(rows) for name, column in self.manager.as_arrays().items()}
+
+    def write_columns(self, values):
+        rows = self.rows
+        arrays = self.manager.as_arrays()
+        for name, column in values.items():
+            arrays[name][rows] = column
+
+
+class ColumnarTrajectoryManager:
+    """
+    Struct-of-arrays counterpart of TrajectoryManager for offline analytics.
+
+    Points are stored once, frame-major, so frame_arrays and as_arrays of the manager return views without copying. The
+    rows of every trajectory come from a stable sort of the traj_index column, done on first use after the store changed
+    (see trajectory_rows), the arrays of a single trajectory are gathered copies. Frames have to be added in step order. A frame is validated and its columns converted before
+    anything is written, a failure leaves the store unchanged.
+    """
+    def __init__(self, fields=COLUMN_FIELDS):
+        self.fields = tuple(fields)
+        self._buffer = ColumnBuffer(self.fields, int_fields=('step', 'traj_index'))
+        self.traj_ids = []
+        self.traj_id_to_index_map = {}
+        self.trajectories = []
+        self.steps = []
+        self.timestamps = []
+        # frame step to (start, end) rows of the frame-major buffer
+        self.step_to_rows_map = {}
+        # trajectory indices of the last frame, which add_object can still add to
+        self._last_frame_indices = set()
+        self._rows = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def last_step(self):
+        return self.steps[-1] if len(self.steps) > 0 else -1
+
+    @property
+    def earliest_step(self):
+        return self.steps[0] if len(self.steps) > 0 else -1
+
+    @property
+    def traj_id_to_traj_map(self):
+        return dict(zip(self.traj_ids, self.trajectories))
+
+    def get_trajectory(self, traj_id):
+        index = self.traj_id_to_index_map.get(traj_id)
+        return None if index is None else self.trajectories[index]
+
+    def trajectory_rows(self):
+        # (order, offsets): the rows of trajectory i in step order are order[offsets[i]:offsets[i + 1]]
+        if self._rows is None:
+            traj_index = self._buffer.column('traj_index')
+            offsets = np.zeros(len(self.traj_ids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(traj_index, minlength=len(self.traj_ids)), out=offsets[1:])
+            self._rows = (np.argsort(traj_index, kind='stable'), offsets)
+        return self._rows
+
+    def _check_step(self, step):
+        if step < self.last_step:
+            raise ValueError(f"Step {step} is not a valid step, only the last step {self.last_step} or a later one can be added to")
+
+    def _write(self, traj_ids, step, timestamp, values, count):
+        # rows of validated traj_ids and converted columns, everything written here is undone if a step fails
+        state = (len(self.traj_ids), len(self.steps), len(self._buffer), self.step_to_rows_map.get(step),
+                 self._last_frame_indices)
+        try:
+            if step > self.last_step:
+                self.steps.append(step)
+                self.timestamps.append(timestamp)
+                self.step_to_rows_map[step] = (len(self._buffer), len(self._buffer))
+                self._last_frame_indices = set()
+            indices = np.empty(count, dtype=np.int64)
+            for i, traj_id in enumerate(traj_ids):
+                index = self.traj_id_to_index_map.get(traj_id)
+                if index is None:
+                    index = len(self.traj_ids)
+                    self.traj_ids.append(traj_id)
+                    self.traj_id_to_index_map[traj_id] = index
+                    self.trajectories.append(ManagedColumnarTrajectory(self, index, traj_id))
+                indices[i] = index
+            values['step'] = np.full(count, step, dtype=np.int64)
+            values['timestamp'] = np.full(count, timestamp_to_seconds(timestamp))
+            values['traj_index'] = indices
+            start = len(self._buffer)
+            self._buffer.extend(values, count)
+            # the last step that can fail, the indices are only recorded once the rows are written
+            self._last_frame_indices.update(indices.tolist())
+            first, _ = self.step_to_rows_map[step]
+            self.step_to_rows_map[step] = (first, start + count)
+            self._rows = None
+        except BaseException:
+            self._rollback(step, *state)
+            raise
+
+    def _rollback(self, step, num_trajectories, num_steps, size, rows, last_frame_indices):
+        for traj_id in self.traj_ids[num_trajectories:]:
+            del self.traj_id_to_index_map[traj_id]
+        del self.traj_ids[num_trajectories:]
+        del self.trajectories[num_trajectories:]
+        del self.steps[num_steps:]
+        del self.timestamps[num_steps:]
+        if rows is None:
+            self.step_to_rows_map.pop(step, None)
+        else:
+            self.step_to_rows_map[step] = rows
+        self._buffer.truncate(size)
+        self._last_frame_indices = last_frame_indices
+        self._rows = None
+
+    def add_object(self, obj, traj_id, step, timestamp=None):
+        timestamp = obj.timestamp if timestamp is None else timestamp
+        self._check_step(step)
+        index = self.traj_id_to_index_map.get(traj_id)
+        if step == self.last_step and index is not None and index in self._last_frame_indices:
+            raise ValueError(f"Object with id {traj_id} already exists in the frame")
+        values = {field: _as_column([getattr(obj, field)], np.dtype(np.float64)) for field in self.fields}
+        self._write([traj_id], step, timestamp, values, 1)
+
+    def add_frame(self, traj_ids, step=None, timestamp=None, **columns):
+        # columns are parallel arrays keyed by field name, e.g. add_frame(ids, x=xs, y=ys, heading=headings)
+        step = self.last_step + 1 if step is None else step
+        traj_ids = traj_ids.tolist() if hasattr(traj_ids, 'tolist') else list(traj_ids)
+        count = len(traj_ids)
+        unknown = set(columns) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown columns {sorted(unknown)}, valid columns are {self.fields}")
+        for name, column in columns.items():
+            if len(column) != count:
+                raise ValueError(f"Column {name} has {len(column)} values, expected {count}")
+        self._check_step(step)
+        if len(set(traj_ids)) != count:
+            raise ValueError("Objects in a frame must have unique traj_ids")
+        if step == self.last_step:
+            existing = [traj_id for traj_id in traj_ids
+                        if self.traj_id_to_index_map.get(traj_id, -1) in self._last_frame_indices]
+            if existing:
+                raise ValueError(f"Object with id {existing[0]} already exists in the frame")
+        values = {name: _as_column(column, np.dtype(np.float64)) for name, column in columns.items()}
+        self._write(traj_ids, step, timestamp, values, count)
+
+    def frame_arrays(self, step):
+        if step not in self.step_to_rows_map:
+            raise ValueError(f"Step {step} does not exist")
+        start, end = self.step_to_rows_map[step]
+        return self._buffer.as_arrays(start, end)
+
+    def as_arrays(self):
+        # all points, frame-major
+        return self._buffer.as_arrays()
+
+    @staticmethod
+    def from_trajectory_manager(tm, fields=COLUMN_FIELDS):
+        ctm = ColumnarTrajectoryManager(fields)
+        for frame in tm.frames:
+            arrays = points_to_arrays(frame.objects, fields=fields)
+            ctm.add_frame([obj.traj_id for obj in frame.objects], step=frame.step, timestamp=frame.timestamp,
+                          **{field: arrays[field] for field in fields})
+        return ctm
+
+    def to_trajectory_manager(self, max_frames=None):
+        from .trajectory import TrajectoryManager
+        tm = TrajectoryManager(max_frames=max_frames)
+        for step, timestamp in zip(self.steps, self.timestamps):
+            rows = self.frame_arrays(step)
+            columns = {field: rows[field].tolist() for field in self.fields}
+            for i, index in enumerate(rows['traj_index'].tolist()):
+                # NaN marks a missing value
+                values = {field: None if column[i] != column[i] else column[i] for field, column in columns.items()}
+                tm.add_object(RoadUserPoint(**values), self.traj_ids[index], step, timestamp=timestamp)
+        return tm
@@ -0,0 +1,189 @@
+import bisect
+import threading
+from contextlib import contextmanager
+from .trajectory import TrajectoryManager, _bisect_by
+from .utils.sliding import SlidingList
+
+
+class FrameSnapshot:
+    """
+    Immutable copy of the object list of a Frame, taken when the frame is published. traj_ids holds the traj_id of every
+    object at that time: the traj_id of a live point follows its trajectory and is lost once the point is evicted.
+    """
+    __slots__ = ('step', 'timestamp', 'objects', 'traj_ids', 'traj_id_to_obj_map')
+
+    def __init__(self, frame):
+        self.step = frame.step
+        self.timestamp = frame.timestamp
+        self.objects = tuple(frame.objects)
+        self.traj_id_to_obj_map = dict(frame.traj_id_to_obj_map)
+        obj_to_traj_id = {id(obj): traj_id for traj_id, obj in self.traj_id_to_obj_map.items()}
+        self.traj_ids = tuple(obj_to_traj_id.get(id(obj)) for obj in self.objects)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __getitem__(self, item):
+        return self.objects[item]
+
+    def items(self):
+        # (traj_id, object) pairs in frame order
+        return zip(self.traj_ids, self.objects)
+
+
+class WindowSnapshot:
+    """
+    Consistent, immutable view of the window of a ConcurrentTrajectoryManager. Trajectories are rebuilt from the frames of
+    the snapshot on first access, so reading them never races with the writer. The RoadUserPoint objects themselves are
+    shared with the manager, their prev/next links and traj_id keep following the live window, so the traj_ids of the
+    snapshot are the ones to rely on.
+    """
+    def __init__(self, frames=()):
+        self.frames = frames
+        self.steps = tuple(frame.step for frame in frames)
+        self._trajectories = None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    @property
+    def timestamps(self):
+        return tuple(frame.timestamp for frame in self.frames if frame.timestamp is not None)
+
+    @property
+    def last_step(self):
+        return self.steps[-1] if self.steps else -1
+
+    @property
+    def earliest_step(self):
+        return self.steps[0] if self.steps else -1
+
+    @property
+    def last_frame(self):
+        return self.frames[-1]
+
+    def get_frame_at_step(self, step):
+        index = bisect.bisect_left(self.steps, step)
+        if index < len(self.steps) and self.steps[index] == step:
+            return self.frames[index]
+        return None
+
+    @property
+    def traj_id_to_objects_map(self):
+        # traj_id to the objects of the trajectory in step order
+        if self._trajectories is None:
+            trajectories = {}
+            for frame in self.frames:
+                for traj_id, obj in frame.traj_id_to_obj_map.items():
+                    trajectories.setdefault(traj_id, []).append(obj)
+            self._trajectories = {traj_id: tuple(objects) for traj_id, objects in trajectories.items()}
+        return self._trajectories
+
+    @property
+    def traj_ids(self):
+        return self.traj_id_to_objects_map.keys()
+
+    def get_trajectory(self, traj_id):
+        return self.traj_id_to_objects_map.get(traj_id, ())
+
+
+class ConcurrentTrajectoryManager(TrajectoryManager):
+    """
+    TrajectoryManager for one writer thread and many reader threads.
+
+    The writer uses the usual methods, which are serialized by a lock. Readers call snapshot() and never touch frames or
+    trajectories directly. Snapshots are published atomically per frame rather than per write: add_frame (and
+    add_list_as_new_frame) publishes the new frame, add_object publishes once it opens a new step, publish() forces the
+    frame that is still being filled to be published. Objects added to frames that are already published show up with
+    the next of these, evictions and remove_traj publish right away. Publishing costs O(number of frames + size of the
+    changed frames), frames are frozen once and shared between snapshots.
+    """
+    def __init__(self, max_frames=None, **kwargs):
+        super().__init__(max_frames=max_frames, **kwargs)
+        self._write_lock = threading.RLock()
+        self._depth = 0
+        # FrameSnapshot of the published frames, a prefix of self.frames
+        self._frozen = SlidingList()
+        self._dirty_steps = set()
+        self._snapshot = WindowSnapshot()
+
+    def snapshot(self):
+        return self._snapshot
+
+    @contextmanager
+    def _writing(self, include_last=False):
+        with self._write_lock:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._publish(include_last)
+
+    def publish(self):
+        with self._write_lock:
+            self._publish(include_last=True)
+
+    def _publish(self, include_last):
+        frames = self.frames
+        frozen = self._frozen
+        first_step = frames[0].step if frames else None
+        while frozen and (first_step is None or frozen[0].step < first_step):
+            frozen.popleft()
+        for step in self._dirty_steps:
+            index = _bisect_by(frozen, step, key=lambda frame: frame.step)
+            if index < len(frozen) and frozen[index].step == step:
+                frozen[index] = FrameSnapshot(self.step_to_frame_map[step])
+        self._dirty_steps.clear()
+        # a frame already published as the open last frame stays published
+        committed = len(frames) if include_last else max(len(frames) - 1, len(frozen))
+        for frame in frames[len(frozen):committed]:
+            frozen.append(FrameSnapshot(frame))
+        self._snapshot = WindowSnapshot(tuple(frozen))
+
+    def add_object(self, obj, traj_id, step, timestamp=None, insort=False):
+        with self._write_lock:
+            new_step = step not in self.step_to_frame_map
+            super().add_object(obj, traj_id, step, timestamp=timestamp, insort=insort)
+            self._dirty_steps.add(step)
+            # one publish per frame: the frame before a new step is complete
+            if new_step and self._depth == 0:
+                self._publish(include_last=False)
+
+    def add_frame(self, object_list, traj_ids=None, timestamp=None, step=None):
+        with self._writing(include_last=True):
+            return super().add_frame(object_list, traj_ids=traj_ids, timestamp=timestamp, step=step)
+
+    def add_frame_arrays(self, traj_ids, timestamp=None, step=None, **kwargs):
+        with self._writing(include_last=True):
+            return super().add_frame_arrays(traj_ids, timestamp=timestamp, step=step, **kwargs)
+
+    def add_list_as_new_frame(self, object_list, timestamp=None):
+        with self._writing(include_last=True):
+            return super().add_list_as_new_frame(object_list, timestamp=timestamp)
+
+    def delete_earliest_frame(self, reason='window'):
+        with self._writing():
+            super().delete_earliest_frame(reason=reason)
+
+    def _remove_from_frame(self, frame, objects):
+        # points dropped by max_traj_length change a frame that may be published already
+        super()._remove_from_frame(frame, objects)
+        self._dirty_steps.add(frame.step)
+
+    def fork(self, max_frames=None):
+        # the fork copies the indexes of the window, so it is taken under the write lock
+        with self._write_lock:
+            return super().fork(max_frames=max_frames)
+
+    def remove_traj(self, traj):
+        with self._writing():
+            self._dirty_steps.update(obj.frame.step for obj in traj if obj.frame is not None)
+            super().remove_traj(traj)
@@ -0,0 +1,213 @@
+import numpy as np
+from .utils.geo import latlon_to_local, local_to_latlon
+from .utils.ragged import expand_ranges
+
+
+class FrenetConverter:
+    """
+    Frenet coordinates along the lanes of a MapObject: the station s, the arc length along the lane polyline from its first
+    point, and the lateral offset d, the signed distance to the polyline (positive to the left of the driving direction).
+
+    The segments of every lane and the cumulative arc length at their start are computed once. Conversions are batched: an
+    array of points against an array of lanelet ids, one per point. Stations continue across suc_edges, a point past the
+    end of its lane is projected onto the successors with s beyond the lane length, a point before its start onto the
+    predecessors with a negative s, and from_frenet follows the first successor (or predecessor) the same way. Beyond
+    the ends of the lane chain the first and last segments are extended. With latlon=True the points and the map
+    polylines are latitude/longitude and s and d are in meters, as in MapMatcher.
+    """
+    def __init__(self, map_object, latlon=True):
+        self.map_object = map_object
+        self.latlon = latlon
+        points = map_object.lane_points
+        if latlon and len(points) > 0:
+            self.origin = (float(points[:, 0].mean()), float(points[:, 1].mean()))
+        else:
+            self.origin = (0.0, 0.0)
+        local = self.to_local(points[:, 0], points[:, 1])
+
+        # every segment goes from a lane point to the next one of the same lane, a lane with a single point is a segment
+        # of length zero, the segments of lane i are lane_segments[i]:lane_segments[i + 1]
+        offsets = map_object.lane_point_offsets
+        sizes = np.diff(offsets)
+        num_segments = np.maximum(sizes - 1, np.minimum(sizes, 1))
+        self.lane_segments = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(num_segments, out=self.lane_segments[1:])
+        seg_lane = np.repeat(np.arange(len(sizes)), num_segments)
+        start = offsets[seg_lane] + np.arange(len(seg_lane)) - self.lane_segments[seg_lane]
+        end = np.minimum(start + 1, offsets[seg_lane + 1] - 1)
+        self.seg_lane = seg_lane
+        self.seg_start = local[start]
+        self.seg_vector = local[end] - local[start]
+        self.seg_length = np.hypot(self.seg_vector[:, 0], self.seg_vector[:, 1])
+
+        # station of every segment start and of every lane point (aligned with lane_points), and the length of every lane
+        cumulative = np.r_[0.0, np.cumsum(self.seg_length)]
+        self.seg_station = cumulative[:-1] - cumulative[self.lane_segments[seg_lane]]
+        self.lane_lengths = cumulative[self.lane_segments[1:]] - cumulative[self.lane_segments[:-1]]
+        self.lane_stations = np.zeros(len(points))
+        has_next = end > start
+        self.lane_stations[end[has_next]] = self.seg_station[has_next] + self.seg_length[has_next]
+        # segments sorted by lane then station, for the station lookups of from_frenet
+        self._lane_base = np.r_[0.0, np.cumsum(self.lane_lengths + 1.0)][:-1]
+        self._seg_key = self.seg_station + self._lane_base[seg_lane]
+        # packed per segment rows for to_frenet, gathered with a single take: start, vector, length, station and whether it
+        # is the first and the last segment of its lane
+        self._seg_table = np.column_stack([self.seg_start, self.seg_vector, self.seg_length, self.seg_station,
+                                           start == offsets[seg_lane], end == offsets[seg_lane + 1] - 1])
+
+        self._successors = map_object.lane_adjacency(map_object.suc_edges())
+        self._predecessors = map_object.lane_adjacency(map_object.pre_edges())
+
+    def to_local(self, x, y):
+        # map coordinates to the metric frame of the converter as an (n, 2) array, x east and y north for latitude/longitude
+        if self.latlon:
+            north, east = latlon_to_local(x, y, *self.origin)
+            return np.stack([np.atleast_1d(east), np.atleast_1d(north)], axis=1)
+        return np.stack([np.atleast_1d(np.asarray(x, dtype=np.float64)), np.atleast_1d(np.asarray(y, dtype=np.float64))], axis=1)
+
+    def from_local(self, local):
+        if self.latlon:
+            return local_to_latlon(local[:, 1], local[:, 0], *self.origin)
+        return local[:, 0].copy(), local[:, 1].copy()
+
+    def _ends(self, lanes):
+        # whether the first and the last segment of every lane may be extended, i.e. it has no predecessor or successor
+        has_successor = self._successors[0][lanes + 1] > self._successors[0][lanes]
+        has_predecessor = self._predecessors[0][lanes + 1] > self._predecessors[0][lanes]
+        return ~has_predecessor, ~has_successor
+
+    def _candidates(self, points, lanes):
+        # the lanes the points are projected onto: their own lane, its successors starting at its length and its
+        # predecessors ending at station 0, grouped by point with the own lane first
+        extend_start, extend_end = self._ends(lanes)
+        owners, cand_lanes, bases = [points], [lanes], [np.zeros(len(lanes))]
+        open_start, open_end = [extend_start], [extend_end]
+        for (offsets, neighbors), after in ((self._successors, True), (self._predecessors, False)):
+            items, owner = expand_ranges(offsets[lanes], offsets[lanes + 1])
+            neighbors = neighbors[items]
+            owners.append(points[owner])
+            cand_lanes.append(neighbors)
+            bases.append(self.lane_lengths[lanes[owner]] if after else -self.lane_lengths[neighbors])
+            open_start.append(np.full(len(items), not after))
+            open_end.append(np.full(len(items), after))
+        order = np.argsort(np.concatenate(owners), kind='stable')
+        return tuple(np.concatenate(values).take(order) for values in (owners, cand_lanes, bases, open_start, open_end))
+
+    def _project(self, local, owners, cand_lanes, bases, open_start, open_end):
+        """
+        Project the points local[owners[i]] onto the segments of the candidate lanes cand_lanes[i], grouped by point, and
+        keep the nearest segment of every point. Returns s (bases[i] plus the station along the lane), d and whether the
+        projection is clamped at an end of a lane which may not be extended, for every point of local (NaN and False
+        for the points without candidates).
+        """
+        n = len(local)
+        s = np.full(n, np.nan)
+        d = np.full(n, np.nan)
+        clamped = np.zeros(n, dtype=bool)
+        segments, cand = expand_ranges(self.lane_segments[cand_lanes], self.lane_segments[cand_lanes + 1])
+        if len(segments) == 0:
+            return s, d, clamped
+        pair_point = owners.take(cand)
+        rows = self._seg_table.take(segments, axis=0)
+        vx = rows[:, 2]
+        vy = rows[:, 3]
+        length = rows[:, 4]
+        dx = local[:, 0].take(pair_point) - rows[:, 0]
+        dy = local[:, 1].take(pair_point) - rows[:, 1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(length > 0, (dx * vx + dy * vy) / (length * length), 0.0)
+        before = (t < 0) & (rows[:, 6] > 0)
+        after = (t > 1) & (rows[:, 7] > 0)
+        extend_start = open_start.take(cand)
+        extend_end = open_end.take(cand)
+        t = np.clip(t, np.where(before & extend_start, -np.inf, 0.0), np.where(after & extend_end, np.inf, 1.0))
+        ex = dx - t * vx
+        ey = dy - t * vy
+        distance = np.sqrt(ex * ex + ey * ey)
+
+        # first pair with the smallest distance of every point
+        starts = np.flatnonzero(np.r_[True, pair_point[1:] != pair_point[:-1]])
+        nearest = np.minimum.reduceat(np.where(np.isnan(distance), np.inf, distance), starts)
+        hits = np.flatnonzero(distance == np.repeat(nearest, np.diff(np.r_[starts, len(pair_point)])))
+        hits = hits[np.r_[True, pair_point[hits[1:]] != pair_point[hits[:-1]]]] if len(hits) else hits
+        found = pair_point.take(hits)
+        s[found] = bases.take(cand.take(hits)) + rows[hits, 5] + t.take(hits) * length.take(hits)
+        d[found] = np.copysign(distance.take(hits), vx.take(hits) * dy.take(hits) - vy.take(hits) * dx.take(hits))
+        clamped[found] = (before.take(hits) & ~extend_start.take(hits)) | (after.take(hits) & ~extend_end.take(hits))
+        return s, d, clamped
+
+    def to_frenet(self, ids, x, y):
+        """
+        Station and lateral offset of arrays of points along the lanelets ids (one per point), as two arrays. The point is
+        projected onto the nearest segment of its lanelet, and when it lies beyond one of its ends onto its successors
+        and predecessors as well, so s is continuous when an object crosses into the next lanelet. Points without
+        coordinates get NaN.
+        """
+        lanes = self.map_object.lane_indices(ids)
+        local = self.to_local(np.asarray(x, dtype=np.float64).ravel(), np.asarray(y, dtype=np.float64).ravel())
+        if len(lanes) != len(local):
+            raise ValueError(f"Got {len(lanes)} lanelet ids for {len(local)} points")
+        # most points lie along their own lanelet, projecting every point onto the neighbors would triple the work
+        s, d, clamped = self._project(local, np.arange(len(lanes)), lanes, np.zeros(len(lanes)), *self._ends(lanes))
+        beyond = np.flatnonzero(clamped)
+        if len(beyond):
+            s_beyond, d_beyond, _ = self._project(local, *self._candidates(beyond, lanes[beyond]))
+            s[beyond] = s_beyond[beyond]
+            d[beyond] = d_beyond[beyond]
+        return s, d
+
+    def _walk(self, lanes, s):
+        # move stations past the end of their lane onto the first successor and negative ones onto the first predecessor,
+        # as long as there is one, in at most as many steps as there are lanes so cycles of zero length lanes end
+        lanes = lanes.copy()
+        s = s.copy()
+        for _ in range(len(self.lane_lengths)):
+            offsets, neighbors = self._successors
+            ahead = np.flatnonzero((s > self.lane_lengths[lanes]) & (offsets[lanes + 1] > offsets[lanes]))
+            s[ahead] -= self.lane_lengths[lanes[ahead]]
+            lanes[ahead] = neighbors[offsets[lanes[ahead]]]
+            offsets, neighbors = self._predecessors
+            behind = np.flatnonzero((s < 0) & (offsets[lanes + 1] > offsets[lanes]))
+            lanes[behind] = neighbors[offsets[lanes[behind]]]
+            s[behind] += self.lane_lengths[lanes[behind]]
+            if len(ahead) == 0 and len(behind) == 0:
+                break
+        return lanes, s
+
+    def from_frenet(self, ids, s, d):
+        """
+        Map coordinates (x, y) of arrays of stations and lateral offsets along the lanelets ids (one per point). Stations
+        beyond the lanelet continue along its first successor, negative ones along its first predecessor. Lanelets
+        without points give NaN.
+        """
+        lanes = self.map_object.lane_indices(ids)
+        s = np.broadcast_to(np.asarray(s, dtype=np.float64).ravel(), lanes.shape)
+        d = np.broadcast_to(np.asarray(d, dtype=np.float64).ravel(), lanes.shape)
+        local = np.full((len(lanes), 2), np.nan)
+        lanes, s = self._walk(lanes, s)
+        first = self.lane_segments.take(lanes)
+        last = self.lane_segments.take(lanes + 1) - 1
+        valid = np.flatnonzero(last >= first)
+        lanes, s, d, first, last = lanes[valid], s[valid], d[valid], first[valid], last[valid]
+        key = self._lane_base.take(lanes) + np.clip(s, 0.0, self.lane_lengths.take(lanes))
+        segments = np.clip(np.searchsorted(self._seg_key, key, side='right') - 1, first, last)
+        length = self.seg_length.take(segments)
+        vector = self.seg_vector.take(segments, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            along = np.where(length > 0, (s - self.seg_station.take(segments)) / length, 0.0)
+            normal = np.where(length[:, None] > 0, np.stack([-vector[:, 1], vector[:, 0]], axis=1) / length[:, None], 0.0)
+        local[valid] = self.seg_start.take(segments, axis=0) + along[:, None] * vector + d[:, None] * normal
+        return self.from_local(local)
+
+    def objects_to_frenet(self, objects):
+        # station and lateral offset of RoadUserPoints along the lanelet of their map_info, NaN for unmatched objects
+        objects = list(objects)
+        s = np.full(len(objects), np.nan)
+        d = np.full(len(objects), np.nan)
+        matched = [i for i, obj in enumerate(objects) if obj.map_info is not None and obj.map_info.lane_id is not None]
+        if matched:
+            ids = [objects[i].map_info.lane_id for i in matched]
+            x = [objects[i].x for i in matched]
+            y = [objects[i].y for i in matched]
+            s[matched], d[matched] = self.to_frenet(ids, np.array(x, dtype=np.float64), np.array(y, dtype=np.float64))
+        return s, d
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional
+from .detection import DetectionResultBase
+
+BACKPRESSURE_POLICIES = ('block', 'drop_oldest')
+
+logger = logging.getLogger(__name__)
+
+
+def detection_to_points(result: DetectionResultBase):
+    # default conversion, the object list of the message is expected to hold tracked RoadUserPoint objects
+    return [obj for obj in result.object_list if getattr(obj, 'traj_id', None) is not None]
+
+
+class AsyncIngestor:
+    """
+    asyncio ingestion stage in front of a TrajectoryManager.
+
+    Producers call `await put(result)` (or put_nowait) with DetectionResultBase messages. They go through a bounded queue
+    to one consumer task that owns the manager. When the queue is full, backpressure='block' makes put wait and
+    backpressure='drop_oldest' drops the oldest queued message. The consumer drains every queued message at once and merges
+    messages with the same timestamp into one frame, so bursts from many sensors turn into few add_frame calls.
+    Messages older than the last ingested frame are dropped. With an executor, the manager is updated in the executor so
+    the event loop is never blocked by ingestion. Without one (the default) every batch is ingested on the event loop
+    thread and blocks it meanwhile, which keeps the manager safe to read from other coroutines; pass an executor only when
+    nothing else touches the manager, or use a ConcurrentTrajectoryManager.
+
+    A batch that fails to merge or ingest is logged, counted in failed_batches and kept in last_error, and the consumer
+    moves on to the next batch. stop() re-raises the exception of a consumer task that died otherwise.
+    """
+    def __init__(self, tm, maxsize=1000, backpressure='block', to_points: Optional[Callable[[DetectionResultBase], List]] = None,
+                 max_batch=256, executor=None):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy {backpressure}, valid policies are {BACKPRESSURE_POLICIES}")
+        self.tm = tm
+        self.backpressure = backpressure
+        self.to_points = to_points if to_points is not None else detection_to_points
+        self.max_batch = max_batch
+        self.executor = executor
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+        self._last_timestamp = None
+
+        # metrics
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.dropped = 0
+        self.late = 0
+        self.ingested_messages = 0
+        self.ingested_frames = 0
+        self.failed_batches = 0
+        self.last_error = None
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def metrics(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+            'dropped': self.dropped,
+            'late': self.late,
+            'ingested_messages': self.ingested_messages,
+            'ingested_frames': self.ingested_frames,
+            'failed_batches': self.failed_batches,
+        }
+
+    def put_nowait(self, result: DetectionResultBase):
+        # returns False if the message was not queued, which only happens with backpressure='block' and a full queue
+        item = (time.monotonic(), result)
+        if self._queue.full():
+            if self.backpressure == 'block':
+                return False
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+        return True
+
+    async def put(self, result: DetectionResultBase):
+        if self.backpressure == 'block':
+            await self._queue.put((time.monotonic(), result))
+        else:
+            self.put_nowait(result)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def stop(self, drain=True):
+        task, self._task = self._task, None
+        if task is None:
+            return
+        if drain and not task.done():
+            # a consumer that died would never drain the queue
+            join = asyncio.ensure_future(self._queue.join())
+            await asyncio.wait([join, task], return_when=asyncio.FIRST_COMPLETED)
+            join.cancel()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def _merge(self, batch):
+        # group the messages of a batch into frames, a list of (timestamp, objects, enqueue time of the oldest message)
+        frames = []
+        for enqueued, result in sorted(batch, key=lambda item: item[1].timestamp):
+            if self._last_timestamp is not None and result.timestamp < self._last_timestamp:
+                self.late += 1
+                continue
+            if frames and frames[-1][0] == result.timestamp:
+                frame = frames[-1]
+                frame[2] = min(frame[2], enqueued)
+            else:
+                frame = [result.timestamp, {}, enqueued]
+                frames.append(frame)
+            # the latest object wins when several messages carry the same traj_id
+            for obj in self.to_points(result):
+                frame[1][obj.traj_id] = obj
+        return frames
+
+    def _ingest(self, frames):
+        tm = self.tm
+        for timestamp, objects, _ in frames:
+            if timestamp == self._last_timestamp and len(tm.frames) > 0:
+                # a late message of the frame that was ingested last
+                last = tm.last_frame
+                for traj_id, obj in objects.items():
+                    if traj_id not in last.traj_ids:
+                        tm.add_object(obj, traj_id, last.step, timestamp=timestamp)
+            else:
+                tm.add_frame(list(objects.values()), traj_ids=list(objects), timestamp=timestamp)
+                self.ingested_frames += 1
+            self._last_timestamp = timestamp
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                frames = self._merge(batch)
+                if self.executor is not None:
+                    await loop.run_in_executor(self.executor, self._ingest, frames)
+                else:
+                    self._ingest(frames)
+                now = time.monotonic()
+                self.lag = now - min(enqueued for enqueued, _ in batch)
+                self.max_lag = max(self.max_lag, self.lag)
+                self.ingested_messages += len(batch)
+            except Exception as e:
+                # one bad batch must not stop the consumer, the queue would fill up and stop() would never drain
+                self.failed_batches += 1
+                self.last_error = e
+                logger.exception("Failed to ingest a batch of %d messages", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            # give the producers a chance to run between batches
+            await asyncio.sleep(0)
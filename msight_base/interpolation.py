@@ -0,0 +1,129 @@
+import numpy as np
+from .columnar import COLUMN_FIELDS, points_to_arrays
+from .utils.timestamp import timestamp_to_seconds, seconds_to_timestamp
+
+
+def _as_seconds(timestamps):
+    timestamps = timestamps if hasattr(timestamps, '__len__') else [timestamps]
+    if isinstance(timestamps, np.ndarray) and timestamps.dtype.kind in 'fiu':
+        return timestamps.astype(np.float64)
+    return np.array([timestamp_to_seconds(timestamp) for timestamp in timestamps], dtype=np.float64)
+
+
+def interpolate_arrays(t, columns, lengths, query):
+    """
+    Linear interpolation of several concatenated trajectories at the same query timestamps in one vectorized pass.
+
+    t holds the timestamps in seconds of the concatenated trajectories, sorted inside every trajectory, lengths is the
+    number of samples of every trajectory and columns maps field name to values aligned with t. Returns (valid, index,
+    values) where every array is (num_trajectories, num_queries): valid is False outside the time span of a trajectory,
+    index is the row of the sample at or before the query and values maps field name to the interpolated values.
+    heading is interpolated along the shortest arc and wrapped to [-180, 180).
+    """
+    t = np.asarray(t, dtype=np.float64)
+    query = np.asarray(query, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    num = len(lengths)
+    shape = (num, len(query))
+    if len(t) == 0 or len(query) == 0:
+        return np.zeros(shape, dtype=bool), np.zeros(shape, dtype=np.int64), {name: np.full(shape, np.nan) for name in columns}
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    ends = starts + lengths - 1
+    segments = np.repeat(np.arange(num), lengths)
+
+    # make the concatenated timestamps globally sorted by offsetting every trajectory by more than the whole time span,
+    # so a single searchsorted finds the bracketing samples of every (trajectory, query) pair
+    base = min(t.min(), query.min())
+    offset = max(t.max(), query.max()) - base + 1.0
+    keys = segments * offset + (t - base)
+    query_keys = np.arange(num)[:, None] * offset + (query - base)[None, :]
+    i0 = np.searchsorted(keys, query_keys, side='right') - 1
+    seg_start = starts[:, None]
+    seg_end = ends[:, None]
+    valid = (lengths[:, None] > 0) & (i0 >= seg_start) & (query[None, :] <= t[np.maximum(seg_end, 0)])
+    i0 = np.clip(i0, seg_start, np.maximum(seg_end, seg_start))
+    i0 = np.clip(i0, 0, len(t) - 1)
+    i1 = np.minimum(i0 + 1, np.maximum(seg_end, 0))
+    span = t[i1] - t[i0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(span > 0, (query[None, :] - t[i0]) / span, 0.0)
+
+    values = {}
+    for name, column in columns.items():
+        column = np.asarray(column, dtype=np.float64)
+        v0, v1 = column[i0], column[i1]
+        if name == 'heading':
+            delta = (v1 - v0 + 180) % 360 - 180
+            result = (v0 + weight * delta + 180) % 360 - 180
+        else:
+            result = v0 + weight * (v1 - v0)
+        result[~valid] = np.nan
+        values[name] = result
+    return valid, i0, values
+
+
+def interpolate_trajectories(trajectories, timestamps, fields=COLUMN_FIELDS):
+    """
+    Interpolated states of every trajectory at the query timestamps (datetimes or seconds).
+    Returns (traj_ids, valid, values) with valid and every values[field] shaped (num_trajectories, num_queries).
+    """
+    trajectories = list(trajectories)
+    query = _as_seconds(timestamps)
+    per_traj = [traj.as_arrays() for traj in trajectories]
+    if per_traj:
+        t = np.concatenate([arrays['timestamp'] for arrays in per_traj])
+        columns = {field: np.concatenate([arrays[field] for arrays in per_traj]) for field in fields}
+    else:
+        t, columns = np.empty(0), {field: np.empty(0) for field in fields}
+    valid, _, values = interpolate_arrays(t, columns, [len(arrays['timestamp']) for arrays in per_traj], query)
+    return [traj.id for traj in trajectories], valid, values
+
+
+def interpolate_trajectory(traj, timestamps, fields=COLUMN_FIELDS):
+    # interpolated states of one trajectory, every values[field] and valid is shaped (num_queries,)
+    _, valid, values = interpolate_trajectories([traj], timestamps, fields=fields)
+    return valid[0], {field: value[0] for field, value in values.items()}
+
+
+def resample_manager(tm, dt, start=None, end=None, max_frames=None):
+    """
+    A new TrajectoryManager with frames every dt seconds between start and end (defaulting to the first and last frame),
+    every trajectory gets a new point at every frame inside its time span. Numeric attributes are interpolated,
+    category is taken from the sample at or before the frame. The grid stays uniform: frame k has step k and the time
+    start + k * dt, grid times where no trajectory is valid give empty frames.
+    """
+    from .trajectory import TrajectoryManager
+    trajectories = tm.trajectories
+    timestamps = [timestamp for timestamp in tm.timestamps if timestamp is not None]
+    resampled = TrajectoryManager(max_frames=max_frames)
+    if not timestamps or dt <= 0:
+        return resampled
+    like = timestamps[0]
+    start = timestamp_to_seconds(timestamps[0] if start is None else start)
+    end = timestamp_to_seconds(timestamps[-1] if end is None else end)
+    # a small tolerance so that end is included when it falls on the grid
+    query = start + dt * np.arange(int(np.floor((end - start) / dt + 1e-9)) + 1)
+
+    per_traj = [points_to_arrays(traj.objects) for traj in trajectories]
+    objects = [obj for traj in trajectories for obj in traj.objects]
+    if not objects:
+        for step, seconds in enumerate(query.tolist()):
+            resampled.add_frame([], timestamp=seconds_to_timestamp(seconds, like), step=step)
+        return resampled
+    t = np.concatenate([arrays['timestamp'] for arrays in per_traj])
+    columns = {field: np.concatenate([arrays[field] for arrays in per_traj]) for field in COLUMN_FIELDS}
+    valid, index, values = interpolate_arrays(t, columns, [len(traj) for traj in trajectories], query)
+
+    traj_ids = [traj.id for traj in trajectories]
+    lists = {field: value.T.tolist() for field, value in values.items()}
+    for q, seconds in enumerate(query.tolist()):
+        rows = np.flatnonzero(valid[:, q]).tolist()
+        frame_columns = {}
+        for field in COLUMN_FIELDS:
+            column = lists[field][q]
+            # NaN marks a missing value
+            frame_columns[field] = [None if column[k] != column[k] else column[k] for k in rows]
+        frame_columns['category'] = [objects[index[k, q]].category for k in rows]
+        resampled.add_frame_arrays([traj_ids[k] for k in rows], timestamp=seconds_to_timestamp(seconds, like), step=q,
+                                   **frame_columns)
+    return resampled
@@ -0,0 +1,281 @@
+import numpy as np
+from .columnar import points_to_arrays
+from .utils.geo import latlon_to_local
+from .utils.timestamp import timestamp_to_seconds
+
+# speed is in meters per second, acceleration in meters per second squared and yaw_rate in heading units (degrees) per second
+KINEMATIC_FIELDS = ('speed', 'acceleration', 'yaw_rate')
+
+
+def _segment_bounds(segments):
+    # for concatenated trajectories, the first and last row index of the segment of every row
+    n = len(segments)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = segments[1:] != segments[:-1]
+    start_rows = np.flatnonzero(starts)
+    lengths = np.diff(np.append(start_rows, n))
+    lo = np.repeat(start_rows, lengths)
+    hi = np.repeat(start_rows + lengths - 1, lengths)
+    return lo, hi
+
+
+def _unwrap_segments(heading, lo):
+    # unwrap headings in degrees inside every segment, so that crossing +-180 degrees does not show up as a spin
+    increments = (np.diff(heading, prepend=np.nan) + 180) % 360 - 180
+    increments[lo == np.arange(len(heading))] = 0
+    cumulative = np.cumsum(np.nan_to_num(increments))
+    unwrapped = heading[lo] + cumulative - cumulative[lo]
+    unwrapped[np.isnan(heading)] = np.nan
+    return unwrapped
+
+
+def _segment_gradient(f, t, lo, hi, period=None):
+    # np.gradient over non uniform t that does not cross segment boundaries,
+    # second order central differences inside a segment and one sided differences at its ends.
+    # The result only depends on the neighbors of every row, with a period the differences are wrapped into +-period/2
+    n = len(f)
+    out = np.full(n, np.nan)
+    if n == 0:
+        return out
+    i = np.arange(n)
+    prev = np.maximum(i - 1, 0)
+    nxt = np.minimum(i + 1, n - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        forward_diff = f[nxt] - f
+        backward_diff = f - f[prev]
+        if period is not None:
+            forward_diff = (forward_diff + period / 2) % period - period / 2
+            backward_diff = (backward_diff + period / 2) % period - period / 2
+        h1 = t - t[prev]
+        h2 = t[nxt] - t
+        central = (h1 ** 2 * forward_diff + h2 ** 2 * backward_diff) / (h1 * h2 * (h1 + h2))
+        forward = forward_diff / h2
+        backward = backward_diff / h1
+    interior = (i > lo) & (i < hi)
+    out[interior] = central[interior]
+    first = (i == lo) & (hi > lo)
+    out[first] = forward[first]
+    last = (i == hi) & (hi > lo)
+    out[last] = backward[last]
+    return out
+
+
+def _local_polynomial(values, t, lo, hi, window, polyorder, periodic=None, chunk_size=65536):
+    # Savitzky-Golay style smoothing on the real timestamps: a polynomial of order polyorder is fitted by least squares
+    # to the window samples around every row, the window is shifted at the segment ends so it stays inside the segment.
+    # Channels flagged in periodic are headings in degrees, unwrapped inside every window around the value of its row.
+    # returns the value, first and second derivative of the fit at every row, values is (n, channels)
+    n, channels = values.shape
+    out = np.full((3, n, channels), np.nan)
+    half = window // 2
+    offsets = np.arange(window)
+    periodic = np.zeros(channels, dtype=bool) if periodic is None else np.asarray(periodic, dtype=bool)
+    for chunk in range(0, n, chunk_size):
+        rows = np.arange(chunk, min(n, chunk + chunk_size))
+        start = np.clip(rows - half, lo[rows], np.maximum(lo[rows], hi[rows] - window + 1))
+        idx = np.minimum(start[:, None] + offsets[None, :], hi[rows][:, None])
+        dt = t[idx] - t[rows][:, None]
+        window_values = values[idx]
+        if periodic.any():
+            angles = window_values[:, :, periodic]
+            increments = np.nan_to_num((np.diff(angles, axis=1) + 180) % 360 - 180)
+            cumulative = np.concatenate([np.zeros_like(angles[:, :1]), np.cumsum(increments, axis=1)], axis=1)
+            center = (rows - start)[:, None, None]
+            unwrapped = cumulative - np.take_along_axis(cumulative, center, axis=1) + values[rows][:, None, periodic]
+            unwrapped[np.isnan(angles)] = np.nan
+            window_values[:, :, periodic] = unwrapped
+        vander = dt[:, :, None] ** np.arange(polyorder + 1)[None, None, :]
+        # the pseudo inverse copes with segments that are shorter than polyorder + 1
+        coefs = np.linalg.pinv(vander) @ window_values
+        out[0, rows] = coefs[:, 0]
+        if polyorder >= 1:
+            out[1, rows] = coefs[:, 1]
+        out[2, rows] = 2 * coefs[:, 2] if polyorder >= 2 else 0.0
+    return out
+
+
+def _constant_acceleration_filter(values, t, starts, lengths, process_noise, measurement_noise):
+    # Kalman filter with a constant acceleration model run forward over every segment at once: step k predicts and updates
+    # the k-th row of all the segments longer than k in one batch. values is (n, channels), segment i covers the rows
+    # starts[i]:starts[i] + lengths[i]. Returns the filtered value, first and second derivative of every channel
+    n, channels = values.shape
+    out = np.full((3, n, channels), np.nan)
+    if n == 0:
+        return out
+    # longest segments first, so the segments still running at step k are a prefix
+    order = np.argsort(-lengths, kind='stable')
+    starts = starts[order]
+    lengths = lengths[order]
+    num = len(starts)
+    x = np.zeros((num, channels, 3))
+    x[:, :, 0] = values[starts]
+    p = np.tile(np.diag([measurement_noise, 1e2, 1e2]), (num, channels, 1, 1))
+    out[:, starts] = x.transpose(2, 0, 1)
+    active = num
+    for k in range(1, int(lengths[0])):
+        while lengths[active - 1] <= k:
+            active -= 1
+        rows = starts[:active] + k
+        dt = t[rows] - t[rows - 1]
+        f = np.zeros((active, 1, 3, 3))
+        f[:, 0, 0, 0] = f[:, 0, 1, 1] = f[:, 0, 2, 2] = 1.0
+        f[:, 0, 0, 1] = f[:, 0, 1, 2] = dt
+        f[:, 0, 0, 2] = 0.5 * dt * dt
+        g = np.stack([dt ** 3 / 6, dt ** 2 / 2, dt], axis=1)
+        q = process_noise * (g[:, :, None] * g[:, None, :])[:, None]
+        xa = (f @ x[:active, :, :, None])[..., 0]
+        pa = f @ p[:active] @ f.transpose(0, 1, 3, 2) + q
+        innovation = values[rows] - xa[:, :, 0]
+        s = pa[:, :, 0, 0] + measurement_noise
+        gain = pa[:, :, :, 0] / s[:, :, None]
+        # rows without a measurement keep the prediction
+        valid = ~np.isnan(innovation)
+        gain[~valid] = 0.0
+        xa += gain * np.where(valid, innovation, 0.0)[:, :, None]
+        pa -= gain[:, :, :, None] * pa[:, :, None, 0, :]
+        x[:active] = xa
+        p[:active] = pa
+        out[:, rows] = xa.transpose(2, 0, 1)
+    return out
+
+
+def derive_kinematics(timestamps, x, y, heading=None, segments=None, method='gradient', latlon=True,
+                      window=7, polyorder=2, process_noise=1.0, measurement_noise=0.25, origin=None):
+    """
+    Derive speed, acceleration and yaw_rate from positions and headings sampled at timestamps (in seconds).
+
+    segments labels the trajectory of every row when several trajectories are concatenated, rows of a trajectory have to be
+    contiguous and sorted by time. method is 'gradient' (finite differences), 'savgol' (local polynomial fit over the real
+    timestamps) or 'kalman' (constant acceleration Kalman filter). With latlon=True x/y are latitude/longitude, projected
+    around origin (a latitude/longitude pair, the mean position by default).
+    """
+    t = np.asarray(timestamps, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(t)
+    heading = np.full(n, np.nan) if heading is None else np.asarray(heading, dtype=np.float64)
+    segments = np.zeros(n, dtype=np.int64) if segments is None else np.asarray(segments)
+    result = {field: np.full(n, np.nan) for field in KINEMATIC_FIELDS}
+    if n == 0:
+        return result
+    if latlon:
+        if origin is None:
+            valid = ~np.isnan(x)
+            origin = (x[valid].mean(), y[valid].mean()) if valid.any() else (0.0, 0.0)
+        x, y = latlon_to_local(x, y, *origin)
+    lo, hi = _segment_bounds(segments)
+
+    if method == 'gradient':
+        vx = _segment_gradient(x, t, lo, hi)
+        vy = _segment_gradient(y, t, lo, hi)
+        speed = np.hypot(vx, vy)
+        acceleration = _segment_gradient(speed, t, lo, hi)
+        yaw_rate = _segment_gradient(heading, t, lo, hi, period=360)
+    elif method in ('savgol', 'kalman'):
+        if method == 'savgol':
+            values = np.stack([x, y, heading], axis=1)
+            fit = _local_polynomial(values, t, lo, hi, window, polyorder, periodic=(False, False, True))
+        else:
+            values = np.stack([x, y, _unwrap_segments(heading, lo)], axis=1)
+            starts = np.flatnonzero(lo == np.arange(n))
+            fit = _constant_acceleration_filter(values, t, starts, hi[starts] - starts + 1, process_noise, measurement_noise)
+        vx, vy, yaw_rate = fit[1, :, 0], fit[1, :, 1], fit[1, :, 2]
+        ax, ay = fit[2, :, 0], fit[2, :, 1]
+        speed = np.hypot(vx, vy)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # acceleration along the direction of travel
+            acceleration = np.where(speed > 1e-6, (vx * ax + vy * ay) / speed, np.hypot(ax, ay))
+        single = lo == hi
+        speed[single] = acceleration[single] = yaw_rate[single] = np.nan
+    else:
+        raise ValueError(f"Unknown method {method}, valid methods are 'gradient', 'savgol' and 'kalman'")
+    result['speed'] = speed
+    result['acceleration'] = acceleration
+    result['yaw_rate'] = yaw_rate
+    return result
+
+
+def _write_back(objects, result):
+    columns = {field: result[field].tolist() for field in KINEMATIC_FIELDS}
+    for i, obj in enumerate(objects):
+        for field, column in columns.items():
+            value = column[i]
+            setattr(obj, field, None if value != value else value)
+
+
+def compute_trajectory_kinematics(traj, method='gradient', latlon=True, write=True, **kwargs):
+    # kinematics of one Trajectory or trajectory of a ColumnarTrajectoryManager, written back to its points (or columns)
+    # when write is True
+    arrays = traj.as_arrays()
+    result = derive_kinematics(arrays['timestamp'], arrays['x'], arrays['y'], arrays['heading'],
+                               method=method, latlon=latlon, **kwargs)
+    if write:
+        if hasattr(traj, 'objects'):
+            _write_back(traj.objects, result)
+        else:
+            traj.write_columns({field: result[field] for field in KINEMATIC_FIELDS})
+    return result
+
+
+def compute_manager_kinematics(tm, method='gradient', latlon=True, write=True, **kwargs):
+    """
+    Kinematics of every trajectory of a TrajectoryManager or ColumnarTrajectoryManager in one vectorized pass,
+    returns a map from traj_id to the arrays of the trajectory.
+    """
+    trajectories = tm.trajectories
+    if hasattr(tm, 'frame_arrays') and not hasattr(tm, 'frames'):
+        # columnar store, the frame-major rows sorted by trajectory so every trajectory is a contiguous segment
+        arrays = tm.as_arrays()
+        order, _ = tm.trajectory_rows()
+        columns = {name: column.take(order) for name, column in arrays.items()}
+        segments = columns['traj_index']
+    else:
+        per_traj = [points_to_arrays(traj.objects, fields=('x', 'y', 'heading')) for traj in trajectories]
+        columns = {name: np.concatenate([a[name] for a in per_traj]) if per_traj else np.empty(0)
+                   for name in ('timestamp', 'x', 'y', 'heading')}
+        segments = np.repeat(np.arange(len(trajectories)), [len(traj) for traj in trajectories])
+    result = derive_kinematics(columns['timestamp'], columns['x'], columns['y'], columns['heading'],
+                               segments=segments, method=method, latlon=latlon, **kwargs)
+
+    by_traj = {}
+    start = 0
+    for traj in trajectories:
+        end = start + len(traj)
+        by_traj[traj.id] = {field: result[field][start:end] for field in KINEMATIC_FIELDS}
+        if write and hasattr(traj, 'objects'):
+            _write_back(traj.objects, by_traj[traj.id])
+        start = end
+    if write and not hasattr(tm, 'frames'):
+        # the trajectories of a columnar store are rows of its frame-major columns
+        frame_major = tm.as_arrays()
+        for field in KINEMATIC_FIELDS:
+            frame_major[field][order] = result[field]
+    return by_traj
+
+
+def update_frame_kinematics(frame, latlon=True):
+    """
+    Incremental mode for live ingestion: computes speed, acceleration and yaw_rate of the objects of a newly pushed frame
+    from their previous points with backward differences, the previous points are not touched.
+    """
+    objects = [obj for obj in frame.objects if obj.prev is not None]
+    if not objects:
+        return
+    prevs = [obj.prev for obj in objects]
+    current = points_to_arrays(objects, fields=('x', 'y', 'heading'))
+    previous = points_to_arrays(prevs, fields=('x', 'y', 'heading', 'speed'))
+    t = np.full(len(objects), timestamp_to_seconds(frame.timestamp)) if frame.timestamp is not None else current['timestamp']
+    dt = t - previous['timestamp']
+    if latlon:
+        origin = (np.nanmean(current['x']), np.nanmean(current['y']))
+        x1, y1 = latlon_to_local(current['x'], current['y'], *origin)
+        x0, y0 = latlon_to_local(previous['x'], previous['y'], *origin)
+    else:
+        x1, y1, x0, y0 = current['x'], current['y'], previous['x'], previous['y']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = np.hypot(x1 - x0, y1 - y0) / dt
+        acceleration = (speed - previous['speed']) / dt
+        yaw_rate = ((current['heading'] - previous['heading'] + 180) % 360 - 180) / dt
+    bad = ~(dt > 0)
+    speed[bad] = acceleration[bad] = yaw_rate[bad] = np.nan
+    _write_back(objects, {'speed': speed, 'acceleration': acceleration, 'yaw_rate': yaw_rate})
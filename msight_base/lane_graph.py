@@ -0,0 +1,172 @@
+import heapq
+from functools import lru_cache
+import numpy as np
+from .utils.ragged import expand_ranges
+
+
+def _csr(num_lanes, sources):
+    # offsets of the compressed sparse rows of the edges leaving every lane, and the order sorting the edges by source
+    offsets = np.zeros(num_lanes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_lanes), out=offsets[1:])
+    return offsets, np.argsort(sources, kind='stable')
+
+
+class LaneGraph:
+    """
+    Lanelet topology of a MapObject compiled into CSR adjacency arrays over lane indices (positions in
+    map_polylines_ids). The edges go from a lanelet to its successors and weigh the length of the lanelet they leave, the
+    sum of its lane_seg_length (one per lanelet when the map has no segment lengths). With a lane_change_cost the
+    neighbors to the left and right driving the same direction are connected as well, with that weight, shortest_route
+    takes these lane changes and reachable only with lane_changes=True.
+
+    Routes are tuples of lanelet ids. shortest_route, reachable and routes_through are memoized in LRU caches of cache_size
+    entries keyed by their arguments, e.g. (from_id, to_id), the graph never changes once compiled.
+    """
+    def __init__(self, map_object, lane_change_cost=None, cache_size=4096):
+        self.map_object = map_object
+        self.lane_ids = np.asarray(map_object.map_polylines_ids, dtype=np.int64)
+        num_lanes = len(self.lane_ids)
+        seg_offsets = map_object.lane_seg_length_offsets
+        if len(map_object.lane_seg_lengths) and len(seg_offsets) == num_lanes + 1:
+            sums = np.r_[0.0, np.cumsum(map_object.lane_seg_lengths)]
+            self.lane_lengths = sums[seg_offsets[1:]] - sums[seg_offsets[:-1]]
+        else:
+            self.lane_lengths = np.ones(num_lanes)
+
+        self.suc_offsets, self.suc_lanes = map_object.lane_adjacency(map_object.suc_edges())
+        sources = np.repeat(np.arange(num_lanes), np.diff(self.suc_offsets))
+        targets = self.suc_lanes
+        self.pre_offsets, order = _csr(num_lanes, targets)
+        self.pre_lanes = sources[order]
+        weights = self.lane_lengths[sources]
+
+        self.lane_change_cost = lane_change_cost
+        if lane_change_cost is not None:
+            change_sources, change_targets = [], []
+            for edges, directions in ((map_object.left_edges(), map_object.left_edge_directions()),
+                                      (map_object.right_edges(), map_object.right_edge_directions())):
+                for i, (lane_id, same_direction) in enumerate(zip(edges, directions)):
+                    if lane_id is not None and same_direction and map_object.has_lane(lane_id):
+                        change_sources.append(i)
+                        change_targets.append(map_object.lane_index(lane_id))
+            sources = np.r_[sources, np.array(change_sources, dtype=np.int64)]
+            targets = np.r_[targets, np.array(change_targets, dtype=np.int64)]
+            weights = np.r_[weights, np.full(len(change_sources), float(lane_change_cost))]
+        self.offsets, order = _csr(num_lanes, sources)
+        self.targets = targets[order]
+        self.weights = weights[order]
+        # plain lists for the Python loops of the searches
+        self._adjacency = [list(zip(self.targets[start:end].tolist(), self.weights[start:end].tolist()))
+                           for start, end in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist())]
+
+        intersection = np.zeros(num_lanes, dtype=bool)
+        intersection[[map_object.lane_index(lane_id) for lane_id in map_object.intersection_lane_id_list
+                      if map_object.has_lane(lane_id)]] = True
+        self.is_intersection = intersection
+
+        self.cache_size = cache_size
+        self.shortest_route = lru_cache(maxsize=cache_size)(self._shortest_route)
+        self.reachable = lru_cache(maxsize=cache_size)(self._reachable)
+        self.routes_through = lru_cache(maxsize=cache_size)(self._routes_through)
+
+    def _index(self, lane_id):
+        return self.map_object.lane_index(lane_id)
+
+    def successors(self, lane_id):
+        i = self._index(lane_id)
+        return self.lane_ids[self.suc_lanes[self.suc_offsets[i]:self.suc_offsets[i + 1]]]
+
+    def predecessors(self, lane_id):
+        i = self._index(lane_id)
+        return self.lane_ids[self.pre_lanes[self.pre_offsets[i]:self.pre_offsets[i + 1]]]
+
+    def route_length(self, route):
+        # length of a route from the start of its first lanelet to the end of its last one
+        return float(self.lane_lengths[self.map_object.lane_indices(list(route))].sum()) if route else 0.0
+
+    def _shortest_route(self, from_id, to_id):
+        """
+        Lanelet ids of the shortest route from from_id to to_id, both included, None when to_id cannot be reached.
+        Dijkstra over the CSR graph, stopping as soon as to_id is settled.
+        """
+        source = self._index(from_id)
+        target = self._index(to_id)
+        adjacency = self._adjacency
+        distances = {source: 0.0}
+        parents = {source: -1}
+        heap = [(0.0, source)]
+        settled = set()
+        while heap:
+            distance, lane = heapq.heappop(heap)
+            if lane in settled:
+                continue
+            if lane == target:
+                route = []
+                while lane != -1:
+                    route.append(lane)
+                    lane = parents[lane]
+                return tuple(self.lane_ids[route[::-1]].tolist())
+            settled.add(lane)
+            for neighbor, weight in adjacency[lane]:
+                candidate = distance + weight
+                if candidate < distances.get(neighbor, np.inf):
+                    distances[neighbor] = candidate
+                    parents[neighbor] = lane
+                    heapq.heappush(heap, (candidate, neighbor))
+        return None
+
+    def _reachable(self, from_id, k, lane_changes=False):
+        """
+        Lanelet ids within k hops of from_id (itself included), as a sorted tuple, with a vectorized breadth first search.
+        The hops follow successors only, with lane_changes=True they also change to the neighbors connected by
+        lane_change_cost.
+        """
+        offsets, lanes = (self.offsets, self.targets) if lane_changes else (self.suc_offsets, self.suc_lanes)
+        visited = np.zeros(len(self.lane_ids), dtype=bool)
+        frontier = np.array([self._index(from_id)], dtype=np.int64)
+        visited[frontier] = True
+        for _ in range(k):
+            items = expand_ranges(offsets[frontier], offsets[frontier + 1])[0]
+            frontier = np.unique(lanes[items])
+            frontier = frontier[~visited[frontier]]
+            if len(frontier) == 0:
+                break
+            visited[frontier] = True
+        return tuple(np.sort(self.lane_ids[visited]).tolist())
+
+    def _paths(self, lane, step):
+        # paths of lane indices from lane through consecutive intersection lanelets, each ending with the first lanelet
+        # that is not part of the intersection (or a dead end), step is the CSR of successors or predecessors
+        offsets, lanes = step
+        paths = []
+        stack = [(lane, (lane,))]
+        while stack:
+            current, path = stack.pop()
+            following = lanes[offsets[current]:offsets[current + 1]].tolist()
+            following = [nxt for nxt in following if nxt not in path]
+            if not following:
+                paths.append(path)
+            for nxt in following:
+                if self.is_intersection[nxt]:
+                    stack.append((nxt, path + (nxt,)))
+                else:
+                    paths.append(path + (nxt,))
+        return paths
+
+    def _routes_through(self, lane_id):
+        """
+        Every route through a lanelet, usually an intersection lanelet of intersection_lane_id_list: the chains of
+        intersection lanelets containing it, from the lanelet entering the intersection to the lanelet leaving it.
+        """
+        lane = self._index(lane_id)
+        backward = self._paths(lane, (self.pre_offsets, self.pre_lanes))
+        forward = self._paths(lane, (self.suc_offsets, self.suc_lanes))
+        lane_ids = self.lane_ids.tolist()
+        return tuple(tuple(lane_ids[i] for i in before[::-1] + after[1:]) for before in backward for after in forward)
+
+    def cache_info(self):
+        return {name: getattr(self, name).cache_info() for name in ('shortest_route', 'reachable', 'routes_through')}
+
+    def cache_clear(self):
+        for name in ('shortest_route', 'reachable', 'routes_through'):
+            getattr(self, name).cache_clear()
@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import List
-from commonroad.scenario.lanelet import LaneletType, LaneletNetwork
-import matplotlib.pyplot as plt
+from typing import List, TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    from commonroad.scenario.lanelet import LaneletNetwork
 
 
 class LaneShape(Enum):
@@ -25,6 +27,12 @@ class LaneSide(Enum):
 
     @classmethod
     def from_name(cls, name: str):
+        if not isinstance(name, str):
+            # MapInfo.to_dict stores the value of the side
+            try:
+                return cls(name)
+            except ValueError:
+                return cls.UNKNOWN
         try:
             return cls[name.upper()]
         except KeyError:
@@ -69,8 +77,20 @@ class MapInfo:
         }
 
 
+def _ragged(lists, point_dim=None):
+    # concatenate a list of sequences into one float64 array and the offsets of every sequence in it
+    lists = lists if lists is not None else []
+    lengths = [len(values) for values in lists]
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    shape = (-1,) if point_dim is None else (-1, point_dim)
+    parts = [np.asarray(values, dtype=np.float64)[..., :point_dim].reshape(shape) for values in lists if len(values) > 0]
+    values = np.concatenate(parts) if parts else np.zeros((0,) if point_dim is None else (0, point_dim))
+    return values, offsets
+
+
 class MapObject:
-    def __init__(self, commonroadObj: LaneletNetwork, center_point, map_lanes, lane_heading, lane_shape: List[LaneShape], lane_seg_length, background_img, corner_coords):
+    def __init__(self, commonroadObj: 'LaneletNetwork', center_point, map_lanes, lane_heading, lane_shape: List[LaneShape], lane_seg_length, background_img, corner_coords):
         self.center_point = center_point
         self._map_lanes = map_lanes
         self._lane_heading = lane_heading
@@ -79,7 +99,10 @@ class MapObject:
         self.background_img = background_img
         self.corner_coords = corner_coords
 
-        if isinstance(commonroadObj, LaneletNetwork):
+        # commonroad is only imported to read a LaneletNetwork, a MapObject loaded from a compiled cache does not need it
+        if commonroadObj is not None:
+            from commonroad.scenario.lanelet import LaneletType, LaneletNetwork
+        if commonroadObj is not None and isinstance(commonroadObj, LaneletNetwork):
             self.map_polylines_ids = [lanelet.lanelet_id for lanelet in commonroadObj.lanelets]
             self._suc_edges = [lanelet.successor for lanelet in commonroadObj.lanelets]
             self._pre_edges = [lanelet.predecessor for lanelet in commonroadObj.lanelets]
@@ -99,101 +122,225 @@ class MapObject:
             self._right_edge_directions = []
             self.intersection_lane_id_list = []
             self.straight_lane_id_list = []
+        self._lane_graph = None
+        self._frenet = {}
+        self._build_index()
+
+    def lane_graph(self, lane_change_cost=None, cache_size=4096):
+        # compiled LaneGraph of the lanelet topology, built on first use and kept while the arguments do not change
+        graph = self._lane_graph
+        if graph is None or graph.lane_change_cost != lane_change_cost or graph.cache_size != cache_size:
+            from .lane_graph import LaneGraph
+            graph = LaneGraph(self, lane_change_cost=lane_change_cost, cache_size=cache_size)
+            self._lane_graph = graph
+        return graph
+
+    def frenet(self, latlon=True):
+        # FrenetConverter of the lanes, built on first use for each coordinate convention
+        converter = self._frenet.get(latlon)
+        if converter is None:
+            from .frenet import FrenetConverter
+            converter = FrenetConverter(self, latlon=latlon)
+            self._frenet[latlon] = converter
+        return converter
+
+    def to_frenet(self, ids, x, y, latlon=True):
+        # station along the lanelets ids and signed lateral offset (positive to the left) of arrays of points, see
+        # msight_base.frenet
+        return self.frenet(latlon).to_frenet(ids, x, y)
+
+    def from_frenet(self, ids, s, d, latlon=True):
+        # map coordinates (x, y) of arrays of stations and lateral offsets along the lanelets ids
+        return self.frenet(latlon).from_frenet(ids, s, d)
+
+    def save(self, path, source_hash=None):
+        # compiled binary form that loads without commonroad, see msight_base.map_cache
+        from .map_cache import save_map_object
+        save_map_object(self, path, source_hash=source_hash)
+
+    @staticmethod
+    def load(path, source_hash=None, mmap=True):
+        from .map_cache import load_map_object
+        return load_map_object(path, source_hash=source_hash, mmap=mmap)
+
+    def _build_index(self, lane_arrays=None):
+        # lanelet id to its position i in the per-lanelet lists
+        self._id_to_index = {lane_id: i for i, lane_id in enumerate(self.map_polylines_ids)}
+        # lanelet ids are integers, the batch lookups use a dense table when the ids are compact enough (they usually are)
+        # and a binary search over the sorted ids otherwise
+        ids = np.asarray(self.map_polylines_ids, dtype=np.int64)
+        self._id_order = np.argsort(ids, kind='stable')
+        self._sorted_ids = ids[self._id_order]
+        self._id_table = None
+        if len(ids) and self._sorted_ids[-1] - self._sorted_ids[0] < 16 * len(ids) + 1024:
+            self._id_table = np.full(self._sorted_ids[-1] - self._sorted_ids[0] + 1, -1, dtype=np.int64)
+            self._id_table[ids - self._sorted_ids[0]] = np.arange(len(ids))
+        # lane polylines, headings and segment lengths concatenated into contiguous arrays, the values of lanelet i are
+        # values[offsets[i]:offsets[i + 1]], lane_arrays gives them directly when they were loaded from a compiled cache
+        if lane_arrays is None:
+            self.lane_points, self.lane_point_offsets = _ragged(self._map_lanes, point_dim=2)
+            self.lane_headings, self.lane_heading_offsets = _ragged(self._lane_heading)
+            self.lane_seg_lengths, self.lane_seg_length_offsets = _ragged(self._lane_seg_length)
+        else:
+            for name, value in lane_arrays.items():
+                setattr(self, name, value)
+
+    def lane_index(self, id):
+        # position of the lanelet id in map_polylines_ids and in the per-lanelet lists
+        index = self._id_to_index.get(id)
+        if index is None:
+            raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
+        return index
+
+    def has_lane(self, id):
+        return id in self._id_to_index
+
+    def has_lanes(self, ids):
+        # boolean mask of the lanelet ids of an array that are in the map
+        ids = np.asarray(ids).ravel().astype(np.int64, copy=False)
+        sorted_ids = self._sorted_ids
+        if len(sorted_ids) == 0:
+            return np.zeros(len(ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        return sorted_ids[positions] == ids
+
+    def lane_adjacency(self, edges):
+        # CSR adjacency over lane indices from per-lane lists of lanelet ids (or a single id or None) such as suc_edges(),
+        # the neighbors of lane i are lanes[offsets[i]:offsets[i + 1]], ids that are not in the map are skipped
+        id_to_index = self._id_to_index
+        neighbors = []
+        for lane_edges in edges:
+            if lane_edges is None:
+                lane_edges = []
+            elif not isinstance(lane_edges, (list, tuple, set)):
+                lane_edges = [lane_edges]
+            neighbors.append([id_to_index[lane_id] for lane_id in lane_edges if lane_id in id_to_index])
+        offsets = np.zeros(len(neighbors) + 1, dtype=np.int64)
+        np.cumsum([len(lanes) for lanes in neighbors], out=offsets[1:])
+        lanes = np.array([lane for lanes in neighbors for lane in lanes], dtype=np.int64)
+        return offsets, lanes
+
+    def lane_indices(self, ids):
+        # positions of an array of lanelet ids in map_polylines_ids
+        ids = np.asarray(ids).ravel().astype(np.int64, copy=False)
+        table = self._id_table
+        if table is not None:
+            offsets = ids - self._sorted_ids[0]
+            valid = (offsets >= 0) & (offsets < len(table))
+            index = table[np.where(valid, offsets, 0)]
+            missing = ~valid | (index < 0)
+            if missing.any():
+                raise ValueError(f"Lanelet id {ids[np.flatnonzero(missing)[0]]} not found in map_polylines_ids")
+            return index
+        sorted_ids = self._sorted_ids
+        positions = np.searchsorted(sorted_ids, ids)
+        np.minimum(positions, len(sorted_ids) - 1, out=positions)
+        missing = sorted_ids[positions] != ids if len(sorted_ids) else np.ones(len(ids), dtype=bool)
+        if missing.any():
+            raise ValueError(f"Lanelet id {ids[np.flatnonzero(missing)[0]]} not found in map_polylines_ids")
+        return self._id_order[positions]
 
     def suc_edges(self, id=-1):
         if id == -1:
             return self._suc_edges
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
-            return self._suc_edges[self.map_polylines_ids.index(id)]
+            return self._suc_edges[self.lane_index(id)]
 
     def pre_edges(self, id=-1):
         if id == -1:
             return self._pre_edges
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
-            return self._pre_edges[self.map_polylines_ids.index(id)]
+            return self._pre_edges[self.lane_index(id)]
 
     def left_edges(self, id=-1):
         if id == -1:
             return self._left_edges
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
-            return self._left_edges[self.map_polylines_ids.index(id)]
+            return self._left_edges[self.lane_index(id)]
 
     def right_edges(self, id=-1):
         if id == -1:
             return self._right_edges
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
-            return self._right_edges[self.map_polylines_ids.index(id)]
+            return self._right_edges[self.lane_index(id)]
 
     def left_edge_directions(self, id=-1):
         if id == -1:
             return self._left_edge_directions
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
-            return self._left_edge_directions[self.map_polylines_ids.index(id)]
+            return self._left_edge_directions[self.lane_index(id)]
 
     def right_edge_directions(self, id=-1):
         if id == -1:
             return self._right_edge_directions
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
-            return self._right_edge_directions[self.map_polylines_ids.index(id)]
+            return self._right_edge_directions[self.lane_index(id)]
 
     def lane_shape(self, id=-1):
         if id == -1:
             return self._lane_shape
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
-            return self._lane_shape[self.map_polylines_ids.index(id)]
+            return self._lane_shape[self.lane_index(id)]
 
     def map_lanes(self, id=-1, idx=-1):
         if id == -1:
             return self._map_lanes
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
+            values = self._map_lanes[self.lane_index(id)]
             if idx == -1:
-                return self._map_lanes[self.map_polylines_ids.index(id)]
+                return values
             else:
-                if idx >= len(self._map_lanes[self.map_polylines_ids.index(id)]):
+                if idx >= len(values):
                     raise ValueError(f"Index {idx} out of range for lane with id {id}")
-                return self._map_lanes[self.map_polylines_ids.index(id)][idx]
+                return values[idx]
 
     def lane_heading(self, id=-1, idx=-1):
         if id == -1:
             return self._lane_heading
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
+            values = self._lane_heading[self.lane_index(id)]
             if idx == -1:
-                return self._lane_heading[self.map_polylines_ids.index(id)]
+                return values
             else:
-                if idx >= len(self._lane_heading[self.map_polylines_ids.index(id)]):
+                if idx >= len(values):
                     raise ValueError(f"Index {idx} out of range for lane with id {id}")
-                return self._lane_heading[self.map_polylines_ids.index(id)][idx]
+                return values[idx]
     
     def lane_seg_length(self, id=-1, idx=-1):
         if id == -1:
             return self._lane_seg_length
         else:
-            if id not in self.map_polylines_ids:
-                raise ValueError(f"Lanelet id {id} not found in map_polylines_ids")
+            values = self._lane_seg_length[self.lane_index(id)]
             if idx == -1:
-                return self._lane_seg_length[self.map_polylines_ids.index(id)]
+                return values
             else:
-                if idx >= len(self._lane_seg_length[self.map_polylines_ids.index(id)]):
+                if idx >= len(values):
                     raise ValueError(f"Index {idx} out of range for lane with id {id}")
-                return self._lane_seg_length[self.map_polylines_ids.index(id)][idx]
+                return values[idx]
+
+    def _gather(self, values, offsets, ids, idx):
+        index = self.lane_indices(ids)
+        idx = np.broadcast_to(np.asarray(idx, dtype=np.int64), index.shape)
+        lengths = offsets[index + 1] - offsets[index]
+        if np.any((idx < 0) | (idx >= lengths)):
+            bad = int(np.flatnonzero((idx < 0) | (idx >= lengths))[0])
+            raise ValueError(f"Index {idx[bad]} out of range for lane with id {np.asarray(ids).ravel()[bad]}")
+        return values[offsets[index] + idx]
+
+    def lane_sizes(self, ids):
+        # number of polyline points of every lanelet in ids
+        index = self.lane_indices(ids)
+        return self.lane_point_offsets[index + 1] - self.lane_point_offsets[index]
+
+    def lane_points_at(self, ids, idx):
+        # the idx-th polyline point of every lanelet in ids as an (n, 2) array, idx is an array or a single index
+        return self._gather(self.lane_points, self.lane_point_offsets, ids, idx)
+
+    def lane_headings_at(self, ids, idx):
+        return self._gather(self.lane_headings, self.lane_heading_offsets, ids, idx)
+
+    def lane_seg_lengths_at(self, ids, idx):
+        return self._gather(self.lane_seg_lengths, self.lane_seg_length_offsets, ids, idx)
 
     def to_dict(self):
         return {
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+import numpy as np
+from .map import MapObject, LaneShape
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = 'msight_base.map_object'
+FORMAT_VERSION = 2
+
+# arrays of MapObject._build_index stored as they are
+_LANE_ARRAYS = ('lane_points', 'lane_point_offsets', 'lane_headings', 'lane_heading_offsets', 'lane_seg_lengths',
+                'lane_seg_length_offsets')
+# left/right neighbors are stored as int64 with this value for None, directions as int8 (1 same, 0 opposite, -1 None)
+_NO_LANE = np.iinfo(np.int64).min
+# arrays every compiled map has besides _LANE_ARRAYS, background_img is optional
+_REQUIRED_ARRAYS = ('map_lanes', 'lanelet_ids', 'suc_edges', 'suc_edges_offsets', 'pre_edges', 'pre_edges_offsets',
+                    'left_edges', 'left_edge_directions', 'right_edges', 'right_edge_directions')
+
+
+def map_source_hash(source):
+    # sha256 of a source map file (e.g. the commonroad XML the MapObject is built from), or of bytes
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_meta(path):
+    # meta.json of a compiled map directory, None when there is none
+    try:
+        with open(Path(path) / 'meta.json') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _check_meta(path, meta):
+    if meta.get('format') != FORMAT_NAME:
+        raise ValueError(f"{path} is not a compiled map")
+    if meta['version'] > FORMAT_VERSION:
+        raise ValueError(f"Compiled map version {meta['version']} is newer than the supported version {FORMAT_VERSION}")
+
+
+def _array_names(path, meta):
+    # version 1 compiled maps have no list of arrays
+    return meta['arrays'] if 'arrays' in meta else [file.stem for file in Path(path).glob('*.npy')]
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    return value
+
+
+def _edge_lists(edges):
+    # per lanelet lists of ids as CSR values and offsets
+    edges = [list(lane_edges) if lane_edges is not None else [] for lane_edges in edges]
+    offsets = np.concatenate(([0], np.cumsum([len(lane_edges) for lane_edges in edges]))).astype(np.int64)
+    values = np.array([lane_id for lane_edges in edges for lane_id in lane_edges], dtype=np.int64)
+    return values, offsets
+
+
+def _views(values, offsets):
+    return [values[start:end] for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def _split(values, offsets):
+    return [values[start:end].tolist() for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def _map_lane_values(map_object):
+    # the polylines with every coordinate of the source when all lanes have the same dimension, lane_points keeps x/y only
+    lanes = [np.asarray(lane, dtype=np.float64) for lane in map_object.map_lanes()]
+    dims = {lane.shape[-1] for lane in lanes if lane.size}
+    if len(dims) != 1 or any(lane.ndim != 2 for lane in lanes if lane.size):
+        return map_object.lane_points
+    dim = dims.pop()
+    return np.concatenate([lane for lane in lanes if lane.size]) if lanes else np.zeros((0, dim))
+
+
+def save_map_object(map_object, path, source_hash=None):
+    """
+    Save a MapObject to a directory in a compiled binary form: the lane polylines, headings and segment lengths and the
+    topology as .npy files which can be memory-mapped, the rest in meta.json. source_hash (see map_source_hash) is stored
+    so the cache can be checked against the source map when it is loaded. meta.json is written last, a directory without
+    it is not a complete cache. meta.json lists the arrays, arrays of an earlier cache in the directory that are not
+    written again are removed.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    meta_file = path / 'meta.json'
+    previous = _read_meta(path)
+    if previous is not None:
+        meta_file.unlink()
+    arrays = {name: getattr(map_object, name) for name in _LANE_ARRAYS}
+    arrays['map_lanes'] = _map_lane_values(map_object)
+    arrays['lanelet_ids'] = np.asarray(map_object.map_polylines_ids, dtype=np.int64)
+    for name in ('suc_edges', 'pre_edges'):
+        arrays[name], arrays[name + '_offsets'] = _edge_lists(getattr(map_object, name)())
+    for name in ('left_edges', 'right_edges'):
+        arrays[name] = np.array([_NO_LANE if lane_id is None else lane_id for lane_id in getattr(map_object, name)()],
+                                dtype=np.int64)
+        arrays[name[:-1] + '_directions'] = np.array(
+            [-1 if same is None else int(bool(same)) for same in getattr(map_object, name[:-1] + '_directions')()],
+            dtype=np.int8)
+    if map_object.background_img is not None:
+        arrays['background_img'] = np.asarray(map_object.background_img)
+    for name, array in arrays.items():
+        np.save(path / f"{name}.npy", np.ascontiguousarray(array))
+    if previous is not None and previous.get('format') == FORMAT_NAME:
+        for name in set(_array_names(path, previous)) - set(arrays):
+            (path / f"{name}.npy").unlink(missing_ok=True)
+
+    meta = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'source_hash': source_hash,
+        'center_point': _jsonable(map_object.center_point),
+        'corner_coords': _jsonable(map_object.corner_coords),
+        'lane_shape': [None if shape is None else LaneShape(shape).value for shape in map_object.lane_shape()],
+        'intersection_lane_id_list': _jsonable(map_object.intersection_lane_id_list),
+        'straight_lane_id_list': _jsonable(map_object.straight_lane_id_list),
+        'arrays': list(arrays),
+    }
+    with open(meta_file, 'w') as f:
+        json.dump(meta, f)
+
+
+def load_map_object(path, source_hash=None, mmap=True):
+    """
+    Load a MapObject saved by save_map_object, without commonroad. The arrays are memory-mapped with mmap=True, the
+    lanes returned by map_lanes, lane_heading and lane_seg_length are views of them. With a source_hash the cache must
+    have been saved from the same source map, a ValueError is raised otherwise.
+    """
+    path = Path(path)
+    meta = _read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"No compiled map in {path}")
+    _check_meta(path, meta)
+    if source_hash is not None and meta['source_hash'] != source_hash:
+        raise ValueError(f"Compiled map {path} was built from a different source map")
+    mmap_mode = 'r' if mmap else None
+    arrays = {}
+    for name in _array_names(path, meta):
+        file = path / f"{name}.npy"
+        if not file.exists():
+            raise ValueError(f"Compiled map {path} is incomplete, {file.name} is missing")
+        arrays[name] = np.load(file, mmap_mode=mmap_mode)
+    missing = [name for name in _LANE_ARRAYS + _REQUIRED_ARRAYS if name not in arrays]
+    if missing:
+        raise ValueError(f"Compiled map {path} is incomplete, {', '.join(missing)} missing")
+
+    lane_arrays = {name: arrays[name] for name in _LANE_ARRAYS}
+    map_object = MapObject(None, meta['center_point'], [], [],
+                           [None if shape is None else LaneShape(shape) for shape in meta['lane_shape']], [],
+                           arrays.get('background_img'), meta['corner_coords'])
+    map_object._map_lanes = _views(arrays['map_lanes'], lane_arrays['lane_point_offsets'])
+    map_object._lane_heading = _views(lane_arrays['lane_headings'], lane_arrays['lane_heading_offsets'])
+    map_object._lane_seg_length = _views(lane_arrays['lane_seg_lengths'], lane_arrays['lane_seg_length_offsets'])
+    map_object.map_polylines_ids = arrays['lanelet_ids'].tolist()
+    map_object._suc_edges = _split(arrays['suc_edges'], arrays['suc_edges_offsets'])
+    map_object._pre_edges = _split(arrays['pre_edges'], arrays['pre_edges_offsets'])
+    for name in ('left', 'right'):
+        setattr(map_object, f'_{name}_edges', [None if lane_id == _NO_LANE else lane_id
+                                                for lane_id in arrays[f'{name}_edges'].tolist()])
+        setattr(map_object, f'_{name}_edge_directions', [None if same == -1 else bool(same)
+                                                          for same in arrays[f'{name}_edge_directions'].tolist()])
+    map_object.intersection_lane_id_list = meta['intersection_lane_id_list']
+    map_object.straight_lane_id_list = meta['straight_lane_id_list']
+    map_object._build_index(lane_arrays=lane_arrays)
+    return map_object
+
+
+def load_or_compile_map(cache_path, source_path, build):
+    """
+    MapObject of the source map at source_path, from the compiled cache at cache_path when it was built from the same
+    source (same sha256), otherwise build(source_path) is called, e.g. a function parsing the commonroad file, and its
+    result is saved to cache_path for the next start. Only a missing cache or one built from another source is rebuilt,
+    a cache that cannot be read (e.g. incomplete or of a newer format) raises a ValueError.
+    """
+    source_hash = map_source_hash(source_path)
+    meta = _read_meta(Path(cache_path))
+    if meta is not None:
+        _check_meta(cache_path, meta)
+        if meta['source_hash'] == source_hash:
+            return load_map_object(cache_path, source_hash=source_hash)
+        logger.info("Compiled map %s was built from a different source map, rebuilding it from %s", cache_path,
+                    source_path)
+    map_object = build(source_path)
+    save_map_object(map_object, cache_path, source_hash=source_hash)
+    return map_object
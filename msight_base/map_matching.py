@@ -0,0 +1,384 @@
+import math
+import numpy as np
+from .map import MapInfo, LaneSide
+from .utils.geo import latlon_to_local
+from .utils.ragged import expand_ranges
+
+_SIDES = {1: LaneSide.LEFT, -1: LaneSide.RIGHT, 0: LaneSide.ONLANE}
+
+
+def _heading_difference(a, b):
+    # absolute difference of two headings in degrees, in [0, 180], NaN when either is missing
+    return np.abs((a - b + 180.0) % 360.0 - 180.0)
+
+
+class MapMatcher:
+    """
+    Matches points to the nearest lane of a MapObject, in batches.
+
+    The segments between consecutive polyline points of every lane are indexed once in a uniform grid of cell_size. A
+    batch of points gathers the segments of the cells around every point and projects each point onto its candidate
+    segments in one vectorized pass. The lane with the lowest cost wins, the cost is the distance to the lane center
+    plus heading_weight times the heading difference to the lane over 180 degrees, so among overlapping lanes (e.g.
+    inside an intersection) the one going the way the object heads is chosen. Points farther than max_distance from every
+    lane are not matched. With latlon=True the points and the map polylines are latitude/longitude and distances are in
+    meters, otherwise both are in the same metric coordinates. Headings are in degrees, in the convention of the map's
+    lane_heading.
+
+    The MapInfo of a match fills lane_id, lane_point_idx, nearest_next_lane_point_idx, dis_to_lane_center and side.
+    related_lane_id and related_route describe the route a road user follows, which a single point does not tell, so
+    they are left None: derive them from the matched lanes of a whole trajectory, e.g. with LaneGraph.
+    """
+    def __init__(self, map_object, latlon=True, max_distance=5.0, cell_size=None, heading_weight=2.0, lane_half_width=None):
+        if max_distance <= 0:
+            raise ValueError(f"max_distance must be positive, got {max_distance}")
+        self.map_object = map_object
+        self.latlon = latlon
+        self.max_distance = float(max_distance)
+        self.cell_size = float(cell_size if cell_size is not None else max(max_distance, 1.0))
+        self.heading_weight = float(heading_weight)
+        # points within lane_half_width of the center are ONLANE, otherwise the side is LEFT or RIGHT of the center
+        self.lane_half_width = lane_half_width
+
+        points = map_object.lane_points
+        if latlon and len(points) > 0:
+            self.origin = (float(points[:, 0].mean()), float(points[:, 1].mean()))
+        else:
+            self.origin = (0.0, 0.0)
+        local = self.to_local(points[:, 0], points[:, 1])
+        self._build_segments(local)
+        self._build_grid()
+
+    def to_local(self, x, y):
+        # map coordinates to the metric frame of the matcher as an (n, 2) array, x east and y north for latitude/longitude
+        if self.latlon:
+            north, east = latlon_to_local(x, y, *self.origin)
+            return np.stack([np.atleast_1d(east), np.atleast_1d(north)], axis=1)
+        return np.stack([np.atleast_1d(np.asarray(x, dtype=np.float64)), np.atleast_1d(np.asarray(y, dtype=np.float64))], axis=1)
+
+    def _build_segments(self, local):
+        # segment k goes from lane point seg_point[k] to seg_point[k] + 1 of lane seg_lane[k], a lane with a single point
+        # is a segment of length zero
+        map_object = self.map_object
+        offsets = map_object.lane_point_offsets
+        sizes = np.diff(offsets)
+        num_segments = np.maximum(sizes - 1, np.minimum(sizes, 1))
+        seg_lane = np.repeat(np.arange(len(sizes)), num_segments)
+        seg_point = np.arange(len(seg_lane)) - np.repeat(np.cumsum(num_segments) - num_segments, num_segments)
+        start = offsets[seg_lane] + seg_point
+        end = np.minimum(start + 1, offsets[seg_lane + 1] - 1)
+        self.lane_sizes = sizes
+        self.seg_lane = seg_lane
+        self.seg_point = seg_point
+        self.seg_start = local[start]
+        self.seg_vector = local[end] - local[start]
+        self.seg_length2 = np.einsum('ij,ij->i', self.seg_vector, self.seg_vector)
+        # heading of the lane at the start point of the segment, NaN where the map has no heading for that point
+        heading_offsets = map_object.lane_heading_offsets
+        heading_index = heading_offsets[seg_lane] + seg_point
+        has_heading = heading_index < heading_offsets[seg_lane + 1]
+        self.seg_heading = np.full(len(seg_lane), np.nan)
+        self.seg_heading[has_heading] = map_object.lane_headings[heading_index[has_heading]]
+        self._seg_table = np.column_stack([self.seg_start, self.seg_vector, self.seg_length2, self.seg_heading])
+
+    def _build_grid(self):
+        # every segment is registered in the cells its bounding box overlaps, the cells are stored as sorted keys with
+        # the segments of cell i at cell_segments[cell_offsets[i]:cell_offsets[i + 1]]
+        self._ring = int(math.ceil(self.max_distance / self.cell_size))
+        a = self.seg_start
+        b = self.seg_start + self.seg_vector
+        lo = np.floor(np.minimum(a, b) / self.cell_size).astype(np.int64)
+        hi = np.floor(np.maximum(a, b) / self.cell_size).astype(np.int64)
+        if len(lo) == 0:
+            self._cell_min = np.zeros(2, dtype=np.int64)
+            self._cell_max = np.full(2, -1, dtype=np.int64)
+            self._cell_keys = np.empty(0, dtype=np.int64)
+            self._cell_offsets = np.zeros(1, dtype=np.int64)
+            self._cell_segments = np.empty(0, dtype=np.int64)
+            return
+        self._cell_min = lo.min(axis=0)
+        self._cell_max = hi.max(axis=0)
+        nx = hi[:, 0] - lo[:, 0] + 1
+        ny = hi[:, 1] - lo[:, 1] + 1
+        k, segments = expand_ranges(np.zeros(len(nx), dtype=np.int64), nx * ny)
+        keys = self._cell_key(lo[segments, 0] + k // ny[segments], lo[segments, 1] + k % ny[segments])
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        self._cell_segments = segments[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        self._cell_keys = keys[starts]
+        self._cell_offsets = np.r_[starts, len(keys)]
+
+    def _cell_key(self, cx, cy):
+        height = self._cell_max[1] - self._cell_min[1] + 1
+        return (cx - self._cell_min[0]) * height + (cy - self._cell_min[1])
+
+    def _grid_candidates(self, local):
+        # (point, segment) pairs of the segments registered in the cells within max_distance of every point
+        # points without coordinates have no candidates
+        valid = np.isfinite(local).all(axis=1)
+        cells = np.floor(np.where(valid[:, None], local, 0.0) / self.cell_size).astype(np.int64)
+        ring = range(-self._ring, self._ring + 1)
+        neighbors = np.array([(dx, dy) for dx in ring for dy in ring], dtype=np.int64)
+        cx = (cells[:, None, 0] + neighbors[None, :, 0]).ravel()
+        cy = (cells[:, None, 1] + neighbors[None, :, 1]).ravel()
+        owners = np.repeat(np.arange(len(local)), len(neighbors))
+        inside = (np.repeat(valid, len(neighbors)) & (cx >= self._cell_min[0]) & (cx <= self._cell_max[0]) &
+                  (cy >= self._cell_min[1]) & (cy <= self._cell_max[1]))
+        keys = self._cell_key(cx[inside], cy[inside])
+        owners = owners[inside]
+        found = np.searchsorted(self._cell_keys, keys)
+        found = np.minimum(found, len(self._cell_keys) - 1)
+        occupied = self._cell_keys[found] == keys if len(self._cell_keys) else np.zeros(len(keys), dtype=bool)
+        found = found[occupied]
+        items, ranges = expand_ranges(self._cell_offsets[found], self._cell_offsets[found + 1])
+        return owners[occupied][ranges], self._cell_segments[items]
+
+    def _select(self, local, heading, pair_point, pair_seg, max_distance):
+        # project every point onto its candidate segments and keep the one with the lowest cost per point, returns the
+        # segment, the projection parameter along it and the signed distance (positive to the left) of every point.
+        # The pairs are gathered with take from the packed segment table, much cheaper than fancy indexing per column.
+        n = len(local)
+        rows = self._seg_table.take(pair_seg, axis=0)
+        points = local.take(pair_point, axis=0)
+        dx = points[:, 0] - rows[:, 0]
+        dy = points[:, 1] - rows[:, 1]
+        vx = rows[:, 2]
+        vy = rows[:, 3]
+        length2 = rows[:, 4]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(length2 > 0, (dx * vx + dy * vy) / length2, 0.0)
+        np.clip(t, 0.0, 1.0, out=t)
+        distance = np.hypot(dx - t * vx, dy - t * vy)
+        close = np.flatnonzero(distance <= max_distance)
+        pair_point, pair_seg, t, distance = pair_point[close], pair_seg[close], t[close], distance[close]
+        cross = vx[close] * dy[close] - vy[close] * dx[close]
+        cost = distance
+        if heading is not None and self.heading_weight:
+            difference = _heading_difference(heading.take(pair_point), rows[close, 5])
+            cost = distance + self.heading_weight * np.nan_to_num(difference, nan=0.0) / 180.0
+        segment = np.full(n, -1, dtype=np.int64)
+        best_t = np.full(n, np.nan)
+        signed = np.full(n, np.nan)
+        if len(pair_point):
+            # sort by point then cost with a single key, the cost is below max_distance + heading_weight
+            order = np.argsort(pair_point * (max_distance + self.heading_weight + 1.0) + cost, kind='stable')
+            first = order[np.r_[True, pair_point[order[1:]] != pair_point[order[:-1]]]]
+            points = pair_point[first]
+            segment[points] = pair_seg[first]
+            best_t[points] = t[first]
+            signed[points] = np.copysign(distance[first], cross[first])
+        return segment, best_t, signed
+
+    def _result(self, segment, t, signed):
+        matched = segment >= 0
+        seg = np.where(matched, segment, 0)
+        lane = np.where(matched, self.seg_lane[seg] if len(self.seg_lane) else 0, -1)
+        point = self.seg_point[seg] if len(self.seg_point) else np.zeros(len(segment), dtype=np.int64)
+        last = np.maximum(self.lane_sizes[np.maximum(lane, 0)] - 1, 0) if len(self.lane_sizes) else point
+        ids = np.asarray(self.map_object.map_polylines_ids, dtype=np.int64)
+        distance = np.abs(signed)
+        side = np.sign(np.nan_to_num(signed)).astype(np.int64)
+        if self.lane_half_width is not None:
+            side[distance <= self.lane_half_width] = 0
+        return {
+            'lane_index': lane,
+            'lane_id': np.where(matched, ids[np.maximum(lane, 0)] if len(ids) else -1, -1),
+            'lane_point_idx': np.where(matched, point + (t >= 0.5), -1),
+            'nearest_next_lane_point_idx': np.where(matched, np.minimum(point + 1, last), -1),
+            'dis_to_lane_center': distance,
+            'side': np.where(matched, side, 0),
+            'segment': segment,
+            't': t,
+        }
+
+    def match_points(self, x, y, heading=None):
+        """
+        Match arrays of point coordinates (and optionally headings, NaN for unknown), returns a dict of arrays with the
+        MapInfo fields lane_id, lane_point_idx, nearest_next_lane_point_idx, dis_to_lane_center and side (1 left, -1
+        right, 0 on the lane), plus lane_index in map_polylines_ids, the matched segment and the position t in [0, 1]
+        of the projection along it. Unmatched points have lane_id, lane_index and segment -1 and a NaN distance.
+        """
+        local = self.to_local(np.asarray(x, dtype=np.float64).ravel(), np.asarray(y, dtype=np.float64).ravel())
+        heading = None if heading is None else np.asarray(heading, dtype=np.float64).ravel()
+        pair_point, pair_seg = self._grid_candidates(local)
+        return self._result(*self._select(local, heading, pair_point, pair_seg, self.max_distance))
+
+    def _object_arrays(self, objects):
+        x = np.array([obj.x for obj in objects], dtype=np.float64)
+        y = np.array([obj.y for obj in objects], dtype=np.float64)
+        heading = np.array([obj.heading for obj in objects], dtype=np.float64)
+        return x, y, heading
+
+    def _map_infos(self, result):
+        infos = []
+        for segment, lane_id, point_idx, next_idx, distance, side in zip(
+                result['segment'].tolist(), result['lane_id'].tolist(), result['lane_point_idx'].tolist(),
+                result['nearest_next_lane_point_idx'].tolist(), result['dis_to_lane_center'].tolist(), result['side'].tolist()):
+            if segment < 0:
+                infos.append(None)
+            else:
+                infos.append(MapInfo(lane_id, point_idx, distance, _SIDES[side], None, None,
+                                     nearest_next_lane_point_idx=next_idx))
+        return infos
+
+    def match(self, objects):
+        # MapInfo of every RoadUserPoint, None for the ones farther than max_distance from every lane
+        objects = list(objects)
+        return self._map_infos(self.match_points(*self._object_arrays(objects)))
+
+    def match_frame(self, frame, write=True):
+        # match every object of a Frame, with write=True the MapInfo is stored in obj.map_info
+        infos = self.match(frame.objects)
+        if write:
+            for obj, info in zip(frame.objects, infos):
+                obj.map_info = info
+        return infos
+
+
+class IncrementalMapMatcher(MapMatcher):
+    """
+    MapMatcher that follows tracks from frame to frame. A point whose previous point (obj.prev) is matched first walks
+    along the previous lane from the previous match, at most search_ahead segments forward or search_back back, which
+    takes one or two steps for a road user that stays on its lane. The walk is kept when it ends within max_residual
+    of the lane. Otherwise the point is projected onto the stretch of the lane and of its left and right neighbors and
+    the first search_ahead segments of its successors, and matched to the best of them within max_distance, so a point
+    halfway between two lanes during a lane change stays local. Only points without any local segment within
+    max_distance fall back to the global grid search, as do points without a matched previous point. local_matches
+    and global_matches count both outcomes.
+    """
+    def __init__(self, map_object, latlon=True, max_distance=5.0, cell_size=None, heading_weight=2.0, lane_half_width=None,
+                 search_back=2, search_ahead=5, max_residual=1.0):
+        super().__init__(map_object, latlon=latlon, max_distance=max_distance, cell_size=cell_size,
+                         heading_weight=heading_weight, lane_half_width=lane_half_width)
+        self.search_back = search_back
+        self.search_ahead = search_ahead
+        self.max_residual = min(float(max_residual), self.max_distance)
+        self.local_matches = 0
+        self.global_matches = 0
+        # first segment of every lane, segments of lane i are lane_segments[i]:lane_segments[i + 1]
+        self.lane_segments = np.searchsorted(self.seg_lane, np.arange(len(self.lane_sizes) + 1))
+        self._successors = map_object.lane_adjacency(map_object.suc_edges())
+        self._sideways = map_object.lane_adjacency([
+            [lane_id for lane_id in (left, right) if lane_id is not None]
+            for left, right in zip(map_object.left_edges(), map_object.right_edges())])
+
+    def _follow_lane(self, local, points, lanes, lane_point_idx):
+        # walk from the previous match of every point of points along its lane, one segment per step while the
+        # projection is clamped at the end the walk heads to, at most search_ahead steps forward or search_back steps
+        # back. Returns the segment, t and the signed distance per point of points, the segment is -1 where the walk
+        # ran out of steps, ran off the lane or ended farther than max_residual.
+        first = self.lane_segments[lanes]
+        last = self.lane_segments[lanes + 1] - 1
+        segment = np.minimum(first + lane_point_idx, last)
+        p = local[points]
+        n = len(points)
+        direction = np.zeros(n, dtype=np.int64)
+        steps = np.zeros(n, dtype=np.int64)
+        active = np.arange(n)
+        while len(active):
+            rows = self._seg_table[segment[active]]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                t = ((p[active, 0] - rows[:, 0]) * rows[:, 2] + (p[active, 1] - rows[:, 1]) * rows[:, 3]) / rows[:, 4]
+            # a segment of length zero has no direction, leave such points to the candidate search
+            heading_to = direction[active]
+            step = np.where((t >= 1.0) & (heading_to >= 0), 1, np.where((t <= 0.0) & (heading_to <= 0), -1, 0))
+            step[~np.isfinite(t)] = 0
+            moving = step != 0
+            active, step = active[moving], step[moving]
+            direction[active] = step
+            steps[active] += 1
+            segment[active] += step
+            limit = np.where(step > 0, self.search_ahead, self.search_back)
+            stop = (segment[active] < first[active]) | (segment[active] > last[active]) | (steps[active] > limit)
+            segment[active[stop]] = -1
+            active = active[~stop]
+        found = segment >= 0
+        rows = self._seg_table[np.where(found, segment, 0)]
+        dx = p[:, 0] - rows[:, 0]
+        dy = p[:, 1] - rows[:, 1]
+        vx = rows[:, 2]
+        vy = rows[:, 3]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.clip((dx * vx + dy * vy) / rows[:, 4], 0.0, 1.0)
+        distance = np.hypot(dx - t * vx, dy - t * vy)
+        segment[~found | ~(distance <= self.max_residual)] = -1
+        return segment, t, np.copysign(distance, vx * dy - vy * dx)
+
+    def _local_candidates(self, points, lanes, lane_point_idx):
+        # (point, segment) pairs around the previous matches, points[i] was matched to lane index lanes[i]
+        owners = [points]
+        starts = [lane_point_idx - self.search_back]
+        ends = [lane_point_idx + self.search_ahead]
+        range_lanes = [lanes]
+        for (offsets, neighbors), along in ((self._sideways, False), (self._successors, True)):
+            items, owner = expand_ranges(offsets[lanes], offsets[lanes + 1])
+            owners.append(points[owner])
+            range_lanes.append(neighbors[items])
+            if along:
+                starts.append(np.zeros(len(items), dtype=np.int64))
+                ends.append(np.full(len(items), self.search_ahead, dtype=np.int64))
+            else:
+                starts.append(lane_point_idx[owner] - self.search_back)
+                ends.append(lane_point_idx[owner] + self.search_ahead)
+        owners = np.concatenate(owners)
+        range_lanes = np.concatenate(range_lanes)
+        first = self.lane_segments[range_lanes]
+        last = self.lane_segments[range_lanes + 1]
+        starts = np.clip(first + np.concatenate(starts), first, last)
+        ends = np.clip(first + np.concatenate(ends), starts, last)
+        segments, owner = expand_ranges(starts, ends)
+        return owners[owner], segments
+
+    def match_points(self, x, y, heading=None, prev_lane_id=None, prev_lane_point_idx=None):
+        """
+        Like MapMatcher.match_points, prev_lane_id and prev_lane_point_idx are arrays with the match of the previous
+        point of every point, -1 where there is none.
+        """
+        local = self.to_local(np.asarray(x, dtype=np.float64).ravel(), np.asarray(y, dtype=np.float64).ravel())
+        heading = None if heading is None else np.asarray(heading, dtype=np.float64).ravel()
+        n = len(local)
+        segment = np.full(n, -1, dtype=np.int64)
+        t = np.full(n, np.nan)
+        signed = np.full(n, np.nan)
+        if prev_lane_id is not None and len(self.seg_lane):
+            prev_lane_id = np.asarray(prev_lane_id, dtype=np.int64).ravel()
+            known = prev_lane_id != -1
+            known[known] = self.map_object.has_lanes(prev_lane_id[known])
+            points = np.flatnonzero(known)
+            if len(points):
+                lanes = self.map_object.lane_indices(prev_lane_id[points])
+                lane_point_idx = np.maximum(np.asarray(prev_lane_point_idx, dtype=np.int64).ravel()[points], 0)
+                found = self._follow_lane(local, points, lanes, lane_point_idx)
+                segment[points], t[points], signed[points] = found
+                # the stretch of the previous lane, its neighbors and successors for the points the walk missed
+                missed = np.flatnonzero(found[0] < 0)
+                if len(missed):
+                    pair_point, pair_seg = self._local_candidates(points[missed], lanes[missed], lane_point_idx[missed])
+                    found = self._select(local, heading, pair_point, pair_seg, self.max_distance)
+                    rows = points[missed]
+                    segment[rows], t[rows], signed[rows] = (column[rows] for column in found)
+        remaining = np.flatnonzero(segment < 0)
+        self.local_matches += n - len(remaining)
+        self.global_matches += len(remaining)
+        if len(remaining):
+            pair_point, pair_seg = self._grid_candidates(local[remaining])
+            sub_heading = heading[remaining] if heading is not None else None
+            found = self._select(local[remaining], sub_heading, pair_point, pair_seg, self.max_distance)
+            segment[remaining], t[remaining], signed[remaining] = found
+        return self._result(segment, t, signed)
+
+    def match(self, objects):
+        # MapInfo of every RoadUserPoint, searched around the MapInfo of obj.prev when it has one
+        objects = list(objects)
+        prev_lane_id = np.full(len(objects), -1, dtype=np.int64)
+        prev_lane_point_idx = np.full(len(objects), -1, dtype=np.int64)
+        for i, obj in enumerate(objects):
+            prev = obj.prev
+            info = prev.map_info if prev is not None else None
+            if info is not None and info.lane_id is not None:
+                prev_lane_id[i] = info.lane_id
+                point_idx = info.lane_point_idx if info.lane_point_idx is not None else info.nearest_next_lane_point_idx
+                prev_lane_point_idx[i] = point_idx if point_idx is not None else 0
+        return self._map_infos(self.match_points(*self._object_arrays(objects), prev_lane_id=prev_lane_id,
+                                                 prev_lane_point_idx=prev_lane_point_idx))
@@ -0,0 +1,43 @@
+import numpy as np
+from .behavior import BehaviorType
+from .map import MapInfo
+
+# column layout of RoadUserPoint attributes shared by the recording format (storage) and the message codec (codec)
+
+# numeric attributes of RoadUserPoint stored as fixed width float64 columns, NaN marks a missing value
+FLOAT_COLUMNS = ('x', 'y', 'speed', 'acceleration', 'heading', 'width', 'length', 'height', 'confidence',
+                 'heading_confidence', 'yaw_rate')
+# attributes that are rarely set, stored in sparse side tables keyed by row
+SIDE_COLUMNS = ('map_info', 'behaviors', 'sensor_data', 'poly_box', 'turning_signal', 'conf_int_2sigma', 'conf_int_vel_2sigma')
+# category is stored as int16, this value marks a missing category
+MISSING_CATEGORY = -32768
+
+
+def encode_side(name, value):
+    # JSON compatible value of the side attribute name
+    if name == 'map_info':
+        return value.to_dict()
+    if name == 'behaviors':
+        return [str(behavior) for behavior in value]
+    return value
+
+
+def decode_side(name, value):
+    # inverse of encode_side
+    if name == 'map_info':
+        return MapInfo.from_dict(value)
+    if name == 'behaviors':
+        return [BehaviorType.from_name(behavior) for behavior in value]
+    return value
+
+
+def encode_traj_id(traj_id):
+    # JSON compatible traj_id, numpy scalars are not JSON serializable
+    if isinstance(traj_id, tuple):
+        return [encode_traj_id(part) for part in traj_id]
+    return traj_id.item() if isinstance(traj_id, np.generic) else traj_id
+
+
+def decode_traj_id(traj_id):
+    # JSON turns tuple ids into lists, which are not hashable
+    return tuple(decode_traj_id(part) for part in traj_id) if isinstance(traj_id, list) else traj_id
@@ -0,0 +1,95 @@
+import queue
+import threading
+from .trajectory import TrajectoryManager
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class _Prefetcher:
+    """
+    Pulls items from an iterable on a background thread into a bounded queue, so producing the next frames (reading and
+    parsing files) overlaps with consuming the current one.
+    """
+    def __init__(self, iterable, size):
+        self._queue = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(iter(iterable),), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, iterator):
+        try:
+            for item in iterator:
+                if not self._put(item):
+                    return
+        except BaseException as e:
+            self._put(_Failure(e))
+            return
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+        self._put(_DONE)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def replay_frames(frames, max_frames=100, prefetch=0, tm=None):
+    """
+    Push frames one by one into a TrajectoryManager window and yield the manager after every frame. frames is an iterable
+    of Frame objects or (timestamp, objects) pairs whose objects carry their traj_id. Only the last max_frames frames are
+    kept, so memory is bounded by the window and not by the length of the recording. With prefetch > 0 up to prefetch
+    upcoming frames are produced on a background thread. The same manager is yielded every time, it is updated in place.
+    """
+    tm = TrajectoryManager(max_frames=max_frames) if tm is None else tm
+    prefetcher = _Prefetcher(frames, prefetch) if prefetch > 0 else None
+    try:
+        for item in (prefetcher if prefetcher is not None else frames):
+            if hasattr(item, 'objects'):
+                tm.add_frame(list(item.objects), timestamp=item.timestamp, step=item.step)
+            else:
+                timestamp, objects = item
+                tm.add_frame(objects, timestamp=timestamp)
+            yield tm
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+
+
+def replay_msight_json(file_path, max_frames=100, prefetch=0, workers=None, read_ahead=64, processes=False, tm=None):
+    # windowed replay of an MSight JSON frame directory, see utils.data.iter_msight_json_frames
+    from .utils.data import iter_msight_json_frames
+    frames = iter_msight_json_frames(file_path, workers=workers, read_ahead=read_ahead, processes=processes)
+    return replay_frames(frames, max_frames=max_frames, prefetch=prefetch, tm=tm)
+
+
+def replay_recording(recording, max_frames=100, prefetch=0, start=0, end=None, tm=None):
+    # windowed replay of a recording written by TrajectoryManager.save, recording is a TrajectoryRecording or its path
+    from .storage import TrajectoryRecording
+    if not isinstance(recording, TrajectoryRecording):
+        recording = TrajectoryRecording(recording)
+    return replay_frames(recording.iter_frames(start, end), max_frames=max_frames, prefetch=prefetch, tm=tm)
@@ -1,9 +1,11 @@
 from enum import IntEnum
-from msight_base.map import MapInfo
 from msight_base.behavior import BehaviorType
 
 
-class RoadUserPoint:
+class RoadUserPointBase:
+    # behavior shared by RoadUserPoint and CompactRoadUserPoint, it declares no instance storage itself
+    __slots__ = ()
+
     def __init__(self,
                  x=None,
                  y=None,
@@ -21,8 +23,8 @@ class RoadUserPoint:
                  timestamp=None,
                  frame_step=None,
                  traj_id=None,
-                 sensor_data={},
-                 behaviors=[],
+                 sensor_data=None,
+                 behaviors=None,
                  conf_int_2sigma=None,
                  conf_int_vel_2sigma=None,
                  heading_confidence=None,
@@ -43,11 +45,12 @@ class RoadUserPoint:
         self.frame = None
         self.prev = None
         self.next = None
-        self.sensor_data = sensor_data # sensor id to sensor data map
+        # sensor id to sensor data map, like behaviors it is created on first access so every point has its own container
+        self._sensor_data = sensor_data
         self.confidence = confidence
         self.turning_signal = turning_signal
         self.map_info = map_info
-        self.behaviors = behaviors
+        self._behaviors = behaviors
         self.pred_trajectory = None
         self.conf_int_2sigma = conf_int_2sigma
         self.conf_int_vel_2sigma = conf_int_vel_2sigma
@@ -61,6 +64,26 @@ class RoadUserPoint:
         ## for some use cases, we need a uuid instead of a trajectory id (that increments from 0)
         self._traj_uuid = None
 
+    @property
+    def sensor_data(self):
+        if self._sensor_data is None:
+            self._sensor_data = {}
+        return self._sensor_data
+
+    @sensor_data.setter
+    def sensor_data(self, value):
+        self._sensor_data = value
+
+    @property
+    def behaviors(self):
+        if self._behaviors is None:
+            self._behaviors = []
+        return self._behaviors
+
+    @behaviors.setter
+    def behaviors(self, value):
+        self._behaviors = value
+
     @property
     def traj_id(self):
         if self.traj is not None:
@@ -76,7 +99,7 @@ class RoadUserPoint:
     @property
     def frame_step(self):
         if self.frame is None:
-            return None
+            return self._frame_step
         return self.frame.step
     
     @frame_step.setter
@@ -97,9 +120,11 @@ class RoadUserPoint:
             raise AttributeError("Cannot set timestamp directly when frame is assigned.")
         self._timestamp = value
 
-    @staticmethod
-    def from_dict(object_dict):
-        return RoadUserPoint(
+    @classmethod
+    def from_dict(cls, object_dict):
+        # map (and NumPy with it) is only imported once a point has map_info
+        from msight_base.map import MapInfo
+        return cls(
             timestamp=object_dict.get('timestamp', None),
             frame_step=object_dict.get('frame_step', None),
             traj_id=object_dict.get('traj_id', None),
@@ -116,7 +141,7 @@ class RoadUserPoint:
             confidence=object_dict.get('confidence', None),
             turning_signal=object_dict.get('turning_signal', None),
             map_info=MapInfo.from_dict(object_dict['map_info']) if object_dict.get('map_info') else None,
-            sensor_data=object_dict.get('sensor_data', {}),
+            sensor_data=object_dict.get('sensor_data', None),
             behaviors=[BehaviorType.from_name(behavior) for behavior in object_dict.get('behaviors', [])],
             conf_int_2sigma=object_dict.get('conf_int_2sigma', None),
             conf_int_vel_2sigma=object_dict.get('conf_int_vel_2sigma', None),
@@ -142,8 +167,8 @@ class RoadUserPoint:
             'turning_signal': self.turning_signal,
             'poly_box': self.poly_box,
             'map_info': self.map_info.to_dict() if self.map_info else None,
-            'behaviors': [str(behavior) for behavior in self.behaviors],
-            'sensor_data': self.sensor_data,
+            'behaviors': [str(behavior) for behavior in self._behaviors] if self._behaviors else [],
+            'sensor_data': self._sensor_data if self._sensor_data is not None else {},
             'conf_int_2sigma': self.conf_int_2sigma,
             'conf_int_vel_2sigma': self.conf_int_vel_2sigma,
             'heading_confidence': self.heading_confidence,
@@ -151,7 +176,61 @@ class RoadUserPoint:
         }
 
     def __repr__(self):
-        return f"RoadUserPoint(x={self.x}, y={self.y}, heading={self.heading}, width={self.width}, length={self.length}, category={self.category})"
+        return f"{type(self).__name__}(x={self.x}, y={self.y}, heading={self.heading}, width={self.width}, length={self.length}, category={self.category})"
+
+
+class RoadUserPoint(RoadUserPointBase):
+    # attributes are kept in a per-instance __dict__, so arbitrary attributes can be attached to a point
+    pass
+
+
+class _ExtraAttribute:
+    # attribute of a CompactRoadUserPoint that is usually None, it is only stored once it is set to something else
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        extra = obj._extra
+        return None if extra is None else extra.get(self.name)
+
+    def __set__(self, obj, value):
+        extra = obj._extra
+        if value is None:
+            if extra is not None:
+                extra.pop(self.name, None)
+            return
+        if extra is None:
+            extra = obj._extra = {}
+        extra[self.name] = value
+
+
+class CompactRoadUserPoint(RoadUserPointBase):
+    """
+    Memory compact RoadUserPoint. Attributes are stored in slots instead of a per-instance __dict__, and the
+    attributes that are None for most points only take space once they are set.
+    It behaves like RoadUserPoint except that no other attributes can be attached to it.
+    """
+    __slots__ = ('_timestamp', '_frame_step', '_traj_id', 'x', 'y', 'speed', 'acceleration', 'heading', 'width', 'length',
+                 'yaw_rate', 'category', 'traj', 'frame', 'prev', 'next', '_extra')
+
+    height = _ExtraAttribute('height')
+    poly_box = _ExtraAttribute('poly_box')
+    confidence = _ExtraAttribute('confidence')
+    turning_signal = _ExtraAttribute('turning_signal')
+    map_info = _ExtraAttribute('map_info')
+    pred_trajectory = _ExtraAttribute('pred_trajectory')
+    conf_int_2sigma = _ExtraAttribute('conf_int_2sigma')
+    conf_int_vel_2sigma = _ExtraAttribute('conf_int_vel_2sigma')
+    heading_confidence = _ExtraAttribute('heading_confidence')
+    _sensor_data = _ExtraAttribute('sensor_data')
+    _behaviors = _ExtraAttribute('behaviors')
+    _traj_uuid = _ExtraAttribute('traj_uuid')
+
+    def __init__(self, *args, **kwargs):
+        self._extra = None
+        super().__init__(*args, **kwargs)
 
 
 class RoadUserCategory(IntEnum):
@@ -0,0 +1,114 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import numpy as np
+from .road_user import RoadUserPoint
+from .storage import TrajectoryRecording
+
+
+def shard_ranges(num_frames, num_shards, overlap=0):
+    """
+    Split num_frames frames into num_shards contiguous shards, returns a list of (start, end, core_start, core_end) frame
+    index ranges. A shard owns the frames core_start to core_end and is loaded with overlap extra frames on both sides.
+    """
+    if num_shards < 1:
+        raise ValueError(f"num_shards must be at least 1, got {num_shards}")
+    if overlap < 0:
+        raise ValueError(f"overlap must not be negative, got {overlap}")
+    num_shards = max(1, min(num_shards, num_frames))
+    bounds = [num_frames * i // num_shards for i in range(num_shards + 1)]
+    return [(max(0, core_start - overlap), min(num_frames, core_end + overlap), core_start, core_end)
+            for core_start, core_end in zip(bounds, bounds[1:])]
+
+
+def _run_shard(path, point_cls, func, origin, start, end, core_start, core_end):
+    recording = TrajectoryRecording(path, point_cls=point_cls)
+    tm = recording.to_trajectory_manager(start, end)
+    first_step = int(recording.steps[core_start])
+    last_step = int(recording.steps[core_end - 1])
+    result = {}
+    for traj_id, values in (func(tm) if origin is None else func(tm, origin=origin)).items():
+        core = {step: value for step, value in values.items() if first_step <= step <= last_step}
+        if core:
+            result[traj_id] = core
+    return result
+
+
+def map_shards(recording, func, num_shards=None, overlap=10, workers=None, processes=True, point_cls=RoadUserPoint,
+               pass_origin=False, origin=None):
+    """
+    Run func over a recording split by time into shards and stitch the results by traj_id.
+
+    recording is the path of a recording written by TrajectoryManager.save, a TrajectoryRecording or a TrajectoryManager
+    (saved to a temporary directory first). Every shard is loaded as a TrajectoryManager in a worker process (a thread with
+    processes=False, inline with workers=0) and func(tm) returns {traj_id: {step: value}}. Only the values of the steps
+    owned by the shard are kept, the overlap frames on both sides of a shard only give context to func. The result is
+    {traj_id: {step: value}} in step order, identical to func on the whole recording as long as the value at a step only
+    depends on the frames within overlap of it. func has to be picklable with processes=True, e.g. a module level function
+    or a functools.partial of one.
+
+    With pass_origin=True func is called as func(tm, origin=origin) with one latitude/longitude origin for the whole
+    recording, the given pair or recording_origin(recording), so that projections do not depend on the shard (needed by
+    kinematics_by_step). A TrajectoryManager goes through the recording format, which keeps the timezone of datetime
+    timestamps and numpy traj_ids (as Python scalars).
+
+    Sharding only pays off with several cores: every shard is loaded again from the recording and computes its overlap
+    frames twice, and a worker process has to start and import numpy. On one core map_shards is slower than func on
+    the whole recording (2.8 to 4.3 times with 4 shards in benchmarks/sharding.py), with workers=0 it only bounds the
+    memory to one shard at a time.
+    """
+    if hasattr(recording, 'frames') and hasattr(recording, 'traj_id_to_traj_map'):
+        with tempfile.TemporaryDirectory() as path:
+            recording.save(path)
+            return map_shards(path, func, num_shards=num_shards, overlap=overlap, workers=workers,
+                              processes=processes, point_cls=point_cls, pass_origin=pass_origin, origin=origin)
+    path = str(recording.path) if isinstance(recording, TrajectoryRecording) else str(recording)
+    num_frames = len(recording) if isinstance(recording, TrajectoryRecording) else len(TrajectoryRecording(path))
+    if num_frames == 0:
+        return {}
+    if workers is None:
+        workers = os.cpu_count() or 1
+    num_shards = max(1, workers) if num_shards is None else num_shards
+    if not pass_origin:
+        origin = None
+    elif origin is None:
+        origin = recording_origin(recording if isinstance(recording, TrajectoryRecording) else path)
+    run = partial(_run_shard, path, point_cls, func, origin)
+    ranges = shard_ranges(num_frames, num_shards, overlap)
+
+    if workers == 0:
+        results = [run(*shard) for shard in ranges]
+    else:
+        executor_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with executor_cls(max_workers=workers) as executor:
+            results = list(executor.map(run, *zip(*ranges)))
+
+    stitched = {}
+    for result in results:
+        for traj_id, values in result.items():
+            stitched.setdefault(traj_id, {}).update(values)
+    return stitched
+
+
+def kinematics_by_step(tm, method='gradient', latlon=True, origin=None, **kwargs):
+    # per shard function for map_shards, {traj_id: {step: (speed, acceleration, yaw_rate)}}. Run with pass_origin=True,
+    # map_shards then passes the origin of the whole recording and with latlon=True the projection does not depend on
+    # the shard.
+    from .kinematics import compute_manager_kinematics
+    result = compute_manager_kinematics(tm, method=method, latlon=latlon, write=False, origin=origin, **kwargs)
+    by_step = {}
+    for traj_id, arrays in result.items():
+        steps = tm.traj_id_to_traj_map[traj_id].steps
+        by_step[traj_id] = dict(zip(steps, zip(arrays['speed'].tolist(), arrays['acceleration'].tolist(),
+                                               arrays['yaw_rate'].tolist())))
+    return by_step
+
+
+def recording_origin(recording):
+    # mean latitude/longitude of a recording, a projection origin shared by every shard
+    recording = recording if isinstance(recording, TrajectoryRecording) else TrajectoryRecording(recording)
+    x = recording.arrays['x']
+    y = recording.arrays['y']
+    valid = ~np.isnan(x)
+    return (float(x[valid].mean()), float(y[valid].mean())) if valid.any() else (0.0, 0.0)
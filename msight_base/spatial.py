@@ -0,0 +1,133 @@
+import numpy as np
+from .utils.geo import latlon_to_local
+
+
+class GridIndex:
+    """
+    Uniform grid over 2D metric coordinates for radius and k-nearest-neighbour queries.
+    """
+    def __init__(self, points, cell_size=10.0):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.cell_size = float(cell_size)
+        self._cells = {}
+        if len(self.points) == 0:
+            return
+        cells = np.floor(self.points / self.cell_size).astype(np.int64)
+        order = np.lexsort((cells[:, 1], cells[:, 0]))
+        sorted_cells = cells[order]
+        starts = np.flatnonzero(np.any(np.diff(sorted_cells, axis=0) != 0, axis=1)) + 1
+        bounds = np.concatenate(([0], starts, [len(order)]))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            cx, cy = sorted_cells[start]
+            self._cells[(int(cx), int(cy))] = order[start:end]
+        self._cell_min = cells.min(axis=0)
+        self._cell_max = cells.max(axis=0)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell_of(self, center):
+        return int(np.floor(center[0] / self.cell_size)), int(np.floor(center[1] / self.cell_size))
+
+    def _gather(self, cell_keys):
+        found = [self._cells[key] for key in cell_keys if key in self._cells]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)
+
+    def _sorted_by_distance(self, center, indices):
+        distances = np.hypot(self.points[indices, 0] - center[0], self.points[indices, 1] - center[1])
+        order = np.argsort(distances, kind='stable')
+        return indices[order], distances[order]
+
+    def _nearest(self, center, k):
+        distances = np.hypot(self.points[:, 0] - center[0], self.points[:, 1] - center[1])
+        nearest = np.argpartition(distances, k - 1)[:k] if k < len(distances) else np.arange(len(distances))
+        order = nearest[np.argsort(distances[nearest], kind='stable')]
+        return order, distances[order]
+
+    def query_radius(self, center, radius):
+        # indices of the points within radius of center and their distances, nearest first
+        if len(self.points) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        cx0, cy0 = self._cell_of((center[0] - radius, center[1] - radius))
+        cx1, cy1 = self._cell_of((center[0] + radius, center[1] + radius))
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            # the radius covers more cells than are occupied, walk the occupied cells instead
+            keys = [key for key in self._cells if cx0 <= key[0] <= cx1 and cy0 <= key[1] <= cy1]
+        else:
+            keys = [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+        indices, distances = self._sorted_by_distance(center, self._gather(keys))
+        inside = distances <= radius
+        return indices[inside], distances[inside]
+
+    def knn(self, center, k):
+        # indices of the k points nearest to center and their distances, nearest first
+        if len(self.points) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        k = min(k, len(self.points))
+        cx, cy = self._cell_of(center)
+        max_ring = int(max(abs(cx - self._cell_min[0]), abs(cx - self._cell_max[0]),
+                           abs(cy - self._cell_min[1]), abs(cy - self._cell_max[1])))
+        found = []
+        count = 0
+        for ring in range(max_ring + 1):
+            if (2 * ring + 1) ** 2 > len(self._cells):
+                # the rings cover more cells than are occupied, e.g. far from the points, rank every point instead
+                return self._nearest(center, k)
+            if ring == 0:
+                keys = [(cx, cy)]
+            else:
+                keys = [(cx + dx, cy + dy) for dx in range(-ring, ring + 1) for dy in (-ring, ring)]
+                keys += [(cx + dx, cy + dy) for dx in (-ring, ring) for dy in range(-ring + 1, ring)]
+            indices = self._gather(keys)
+            if len(indices) > 0:
+                found.append(indices)
+                count += len(indices)
+            if count >= k:
+                indices, distances = self._sorted_by_distance(center, np.concatenate(found))
+                # every point closer than ring * cell_size is inside the rings visited so far
+                if distances[k - 1] <= ring * self.cell_size or count == len(self.points):
+                    return indices[:k], distances[:k]
+        indices, distances = self._sorted_by_distance(center, np.concatenate(found))
+        return indices[:k], distances[:k]
+
+
+class FrameSpatialIndex:
+    """
+    Spatial index over the objects of a frame. With latlon=True the x/y attributes of the objects are
+    latitude/longitude and are projected to local meters around the centroid of the frame.
+    """
+    def __init__(self, objects, latlon=True, cell_size=10.0):
+        self.latlon = latlon
+        self.objects = [obj for obj in objects if obj.x is not None and obj.y is not None]
+        xy = np.array([(obj.x, obj.y) for obj in self.objects], dtype=np.float64).reshape(-1, 2)
+        if latlon and len(xy) > 0:
+            self.origin = (float(xy[:, 0].mean()), float(xy[:, 1].mean()))
+            xy = np.stack(latlon_to_local(xy[:, 0], xy[:, 1], *self.origin), axis=1)
+        else:
+            self.origin = (0.0, 0.0)
+        self.grid = GridIndex(xy, cell_size=cell_size)
+
+    def to_local(self, pt):
+        x, y = (pt.x, pt.y) if hasattr(pt, 'x') else pt
+        if self.latlon:
+            north, east = latlon_to_local(x, y, *self.origin)
+            return float(north), float(east)
+        return float(x), float(y)
+
+    def _result(self, pt, indices, distances, return_distance):
+        # the query object itself is never part of the result
+        pairs = [(self.objects[i], d) for i, d in zip(indices.tolist(), distances.tolist()) if self.objects[i] is not pt]
+        if return_distance:
+            return pairs
+        return [obj for obj, _ in pairs]
+
+    def query_radius(self, pt, radius, return_distance=False):
+        indices, distances = self.grid.query_radius(self.to_local(pt), radius)
+        return self._result(pt, indices, distances, return_distance)
+
+    def knn(self, pt, k, return_distance=False):
+        # ask for one more neighbour in case pt is an object of the frame
+        indices, distances = self.grid.knn(self.to_local(pt), k + 1)
+        return self._result(pt, indices, distances, return_distance)[:k]
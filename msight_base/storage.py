@@ -0,0 +1,294 @@
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import numpy as np
+from .point_columns import FLOAT_COLUMNS, SIDE_COLUMNS, MISSING_CATEGORY, encode_side, decode_side, encode_traj_id, \
+    decode_traj_id
+from .road_user import RoadUserPoint, RoadUserCategory
+from .trajectory import Frame, Trajectory, TrajectoryManager
+from .utils.timestamp import timestamp_to_seconds
+
+FORMAT_NAME = 'msight_base.trajectory_recording'
+FORMAT_VERSION = 3
+# bit i of the side_mask column tells whether a point has SIDE_COLUMNS[i]. The side table of an attribute is three
+# columns: side_<name>_rows, the sorted rows that have it, side_<name>_json, the JSON of their values concatenated as
+# bytes, and side_<name>_offsets, where the value of every row starts and ends, so a single row is read without
+# parsing the whole table
+
+
+def save_trajectory_manager(tm, path):
+    """
+    Save the frames of a TrajectoryManager to a directory in a columnar binary format: one .npy file per column, which can
+    be memory-mapped, including the side tables of the attributes that are not numeric, plus a JSON file of metadata.
+    Datetime timestamps are stored as POSIX seconds with the UTC offset of the first one, naive datetimes as local time.
+    The metadata lists the columns, so files left in the directory by an earlier recording are never read.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    frames = list(tm.frames)
+    objects = [obj for frame in frames for obj in frame.objects]
+    n = len(objects)
+
+    traj_ids = []
+    traj_id_to_index = {}
+    traj_index = np.empty(n, dtype=np.int64)
+    for i, obj in enumerate(objects):
+        index = traj_id_to_index.get(obj.traj_id)
+        if index is None:
+            index = traj_id_to_index[obj.traj_id] = len(traj_ids)
+            traj_ids.append(obj.traj_id)
+        traj_index[i] = index
+
+    frame_lengths = np.array([len(frame.objects) for frame in frames], dtype=np.int64)
+    columns = {
+        'step': np.repeat(np.array([frame.step for frame in frames], dtype=np.int64), frame_lengths),
+        'traj_index': traj_index,
+        'category': np.array([MISSING_CATEGORY if obj.category is None else int(obj.category) for obj in objects], dtype=np.int16),
+        'frame_step': np.array([frame.step for frame in frames], dtype=np.int64),
+        'frame_timestamp': np.array([timestamp_to_seconds(frame.timestamp) for frame in frames], dtype=np.float64),
+        'frame_offsets': np.concatenate(([0], np.cumsum(frame_lengths))).astype(np.int64),
+    }
+    for name in FLOAT_COLUMNS:
+        columns[name] = np.array([getattr(obj, name) for obj in objects], dtype=np.float64)
+    # rows of every trajectory, in step order since rows are in frame order and the sort is stable
+    traj_order = np.argsort(traj_index, kind='stable')
+    columns['traj_order'] = traj_order.astype(np.int64)
+    columns['traj_offsets'] = np.concatenate(([0], np.cumsum(np.bincount(traj_index, minlength=len(traj_ids))))).astype(np.int64)
+
+    side = {name: ([], []) for name in SIDE_COLUMNS}
+    side_mask = np.zeros(n, dtype=np.uint8)
+    for i, obj in enumerate(objects):
+        for bit, name in enumerate(SIDE_COLUMNS):
+            value = getattr(obj, '_' + name if name in ('behaviors', 'sensor_data') else name)
+            if value is not None and not (name in ('behaviors', 'sensor_data') and len(value) == 0):
+                rows, values = side[name]
+                rows.append(i)
+                values.append(json.dumps(encode_side(name, value)).encode())
+                side_mask[i] |= 1 << bit
+    columns['side_mask'] = side_mask
+    for name, (rows, values) in side.items():
+        columns[f'side_{name}_rows'] = np.array(rows, dtype=np.int64)
+        lengths = [len(value) for value in values]
+        columns[f'side_{name}_offsets'] = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        columns[f'side_{name}_json'] = np.frombuffer(b''.join(values), dtype=np.uint8)
+    for name, column in columns.items():
+        np.save(path / f"{name}.npy", column)
+
+    timestamps = [frame.timestamp for frame in frames if frame.timestamp is not None]
+    timestamp_type = None if not timestamps else ('datetime' if isinstance(timestamps[0], datetime) else 'number')
+    utc_offset = timestamps[0].utcoffset() if timestamp_type == 'datetime' else None
+    meta = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'num_points': n,
+        'num_frames': len(frames),
+        'traj_ids': [encode_traj_id(traj_id) for traj_id in traj_ids],
+        'timestamp_type': timestamp_type,
+        # None for naive datetimes
+        'utc_offset': None if utc_offset is None else utc_offset.total_seconds(),
+        'columns': list(columns),
+    }
+    with open(path / 'meta.json', 'w') as f:
+        json.dump(meta, f)
+
+
+class TrajectoryRecording:
+    """
+    Lazy reader of a recording written by save_trajectory_manager (or TrajectoryManager.save).
+
+    Opening a recording only reads the metadata and memory-maps the columns (with mmap=True), frames and trajectories are
+    built from the columns when they are accessed, reading only their rows, side table values included. The raw columns
+    are available through arrays for vectorized analysis, to_trajectory_manager builds an eager TrajectoryManager.
+    """
+    def __init__(self, path, mmap=True, point_cls=RoadUserPoint):
+        self.path = Path(path)
+        self.point_cls = point_cls
+        with open(self.path / 'meta.json') as f:
+            self.meta = json.load(f)
+        if self.meta.get('format') != FORMAT_NAME:
+            raise ValueError(f"{self.path} is not a trajectory recording")
+        if self.meta['version'] > FORMAT_VERSION:
+            raise ValueError(f"Recording version {self.meta['version']} is newer than the supported version {FORMAT_VERSION}")
+        self.traj_ids = [decode_traj_id(traj_id) for traj_id in self.meta['traj_ids']]
+        self.traj_id_to_index_map = {traj_id: i for i, traj_id in enumerate(self.traj_ids)}
+        mmap_mode = 'r' if mmap else None
+        # version 1 recordings have no list of columns
+        names = self.meta['columns'] if 'columns' in self.meta else [file.stem for file in self.path.glob('*.npy')]
+        self.arrays = {name: np.load(self.path / f"{name}.npy", mmap_mode=mmap_mode) for name in names}
+        utc_offset = self.meta.get('utc_offset')
+        self._tz = None if utc_offset is None else timezone(timedelta(seconds=utc_offset))
+        self._side = {}
+
+    def __len__(self):
+        return self.meta['num_frames']
+
+    @property
+    def steps(self):
+        return self.arrays['frame_step']
+
+    @property
+    def side(self):
+        # every side table, side_column reads only the one that is needed
+        return {name: self.side_column(name) for name in SIDE_COLUMNS}
+
+    def side_column(self, name):
+        # the whole side table of one attribute, row (as a string) to encoded value
+        values = self._side.get(name)
+        if values is None:
+            if f'side_{name}_rows' in self.arrays:
+                rows = self.arrays[f'side_{name}_rows']
+                values = dict(zip([str(row) for row in rows.tolist()], self._side_values(name, np.arange(len(rows)))))
+            elif 'side_mask' in self.arrays:
+                # version 2 recordings keep every side table in a JSON file
+                with open(self.path / f"side_{name}.json") as f:
+                    values = json.load(f)
+            else:
+                # version 1 recordings keep every side table in side.json
+                with open(self.path / 'side.json') as f:
+                    self._side.update(json.load(f))
+                values = self._side[name]
+            self._side[name] = values
+        return values
+
+    def _side_values(self, name, positions):
+        # encoded values at the given positions of the side table of name
+        offsets = self.arrays[f'side_{name}_offsets']
+        data = self.arrays[f'side_{name}_json']
+        return [json.loads(bytes(data[offsets[k]:offsets[k + 1]])) for k in positions.tolist()]
+
+    def _side_rows(self, name, rows):
+        # encoded values of name for the given rows, which all have it
+        if f'side_{name}_rows' in self.arrays:
+            return self._side_values(name, np.searchsorted(self.arrays[f'side_{name}_rows'], rows))
+        table = self.side_column(name)
+        return [table[str(row)] for row in rows.tolist()]
+
+    def _timestamp(self, seconds):
+        if seconds != seconds or self.meta['timestamp_type'] is None:
+            return None
+        if self.meta['timestamp_type'] == 'datetime':
+            # naive datetimes are restored in local time, like datetime.timestamp interprets them
+            return datetime.fromtimestamp(seconds, tz=self._tz)
+        return seconds
+
+    def timestamp_at(self, index):
+        return self._timestamp(float(self.arrays['frame_timestamp'][index]))
+
+    def _points(self, rows, timestamps=None, frame_steps=None):
+        # RoadUserPoint objects for the given rows, not linked to any trajectory or frame
+        arrays = self.arrays
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = {name: arrays[name][rows].tolist() for name in FLOAT_COLUMNS}
+        categories = arrays['category'][rows].tolist()
+        traj_index = arrays['traj_index'][rows].tolist()
+        # side values of the points that have them, as (name, point to encoded value)
+        side = []
+        if 'side_mask' in arrays:
+            mask = arrays['side_mask'][rows]
+            for bit, name in enumerate(SIDE_COLUMNS):
+                having = np.flatnonzero(mask >> bit & 1)
+                if len(having):
+                    side.append((name, dict(zip(having.tolist(), self._side_rows(name, rows[having])))))
+        else:
+            # version 1 recordings have no side_mask
+            for name in SIDE_COLUMNS:
+                table = self.side_column(name)
+                if table:
+                    values = {i: table[str(row)] for i, row in enumerate(rows.tolist()) if str(row) in table}
+                    side.append((name, values))
+        points = []
+        for i in range(len(rows)):
+            values = {name: (None if column[i] != column[i] else column[i]) for name, column in columns.items()}
+            if categories[i] != MISSING_CATEGORY:
+                values['category'] = RoadUserCategory(categories[i])
+            for name, side_values in side:
+                if i in side_values:
+                    values[name] = decode_side(name, side_values[i])
+            if timestamps is not None:
+                values['timestamp'] = timestamps[i]
+            if frame_steps is not None:
+                values['frame_step'] = frame_steps[i]
+            points.append(self.point_cls(traj_id=self.traj_ids[traj_index[i]], **values))
+        return points
+
+    def frame(self, index):
+        # the frame at the given position of the recording, rebuilt from the columns
+        offsets = self.arrays['frame_offsets']
+        frame = Frame(int(self.arrays['frame_step'][index]), self.timestamp_at(index))
+        for obj in self._points(np.arange(offsets[index], offsets[index + 1])):
+            frame.add_object(obj)
+        return frame
+
+    def get_frame_at_step(self, step):
+        index = int(np.searchsorted(self.steps, step))
+        if index < len(self) and self.steps[index] == step:
+            return self.frame(index)
+        return None
+
+    def iter_frames(self, start=0, end=None):
+        end = len(self) if end is None else min(end, len(self))
+        for index in range(start, end):
+            yield self.frame(index)
+
+    @property
+    def frames(self):
+        return _LazyFrames(self)
+
+    def trajectory(self, traj_id):
+        # the whole trajectory traj_id as a Trajectory with linked points, rebuilt from the columns
+        index = self.traj_id_to_index_map.get(traj_id)
+        if index is None:
+            return None
+        offsets = self.arrays['traj_offsets']
+        rows = self.arrays['traj_order'][offsets[index]:offsets[index + 1]]
+        steps = self.arrays['step'][rows].tolist()
+        frame_index = np.searchsorted(self.steps, steps)
+        timestamps = [self.timestamp_at(i) for i in frame_index.tolist()]
+        traj = Trajectory(traj_id)
+        # the points of a trajectory are in no frame, they keep their step and timestamp themselves
+        for obj, step in zip(self._points(rows, timestamps=timestamps, frame_steps=steps), steps):
+            traj.add_object(obj, step)
+        return traj
+
+    def iter_trajectories(self):
+        for traj_id in self.traj_ids:
+            yield self.trajectory(traj_id)
+
+    def to_trajectory_manager(self, start=0, end=None, max_frames=None):
+        # an eager TrajectoryManager holding the frames start to end of the recording
+        tm = TrajectoryManager(max_frames=max_frames)
+        end = len(self) if end is None else min(end, len(self))
+        offsets = self.arrays['frame_offsets']
+        if end <= start:
+            return tm
+        points = self._points(np.arange(offsets[start], offsets[end]))
+        for index in range(start, end):
+            frame_points = points[offsets[index] - offsets[start]:offsets[index + 1] - offsets[start]]
+            tm.add_frame(frame_points, timestamp=self.timestamp_at(index), step=int(self.arrays['frame_step'][index]))
+        return tm
+
+
+class _LazyFrames:
+    # read only sequence of the frames of a recording, every access rebuilds the frame
+    def __init__(self, recording):
+        self.recording = recording
+
+    def __len__(self):
+        return len(self.recording)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.recording.frame(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("frame index out of range")
+        return self.recording.frame(index)
+
+    def __iter__(self):
+        return self.recording.iter_frames()
+
+
+def load_trajectory_manager(path, max_frames=None, point_cls=RoadUserPoint):
+    # an eager TrajectoryManager of a whole recording, every point is built up front, TrajectoryRecording is the lazy view
+    return TrajectoryRecording(path, point_cls=point_cls).to_trajectory_manager(max_frames=max_frames)
@@ -1,7 +1,50 @@
 import bisect
+import sys
+from collections import OrderedDict
 from .road_user import RoadUserPoint
+from .utils.sliding import SlidingList
+from .utils.timestamp import timestamp_to_seconds
 from typing import List
 
+
+def _bisect_by(seq, value, key, right=False):
+    # bisect over a sorted sequence by key(item), like bisect.bisect_left/right with the key argument of python 3.10,
+    # items whose key is None (points without a timestamp) are skipped
+    lo, hi = 0, len(seq)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        probe = mid
+        item_key = key(seq[probe])
+        while item_key is None and probe + 1 < hi:
+            probe += 1
+            item_key = key(seq[probe])
+        if item_key is None:
+            hi = mid
+        elif item_key < value or (right and item_key == value):
+            lo = probe + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _nearest_index(seq, value, key=None, tolerance=None):
+    # index of the item of the sorted sequence nearest to value, ties go to the earlier item, items whose key is None are
+    # skipped
+    key = key if key is not None else (lambda item: item)
+    index = _bisect_by(seq, value, key)
+    before = index - 1
+    while before >= 0 and key(seq[before]) is None:
+        before -= 1
+    after = index
+    while after < len(seq) and key(seq[after]) is None:
+        after += 1
+    if after == len(seq) or (before >= 0 and abs(value - key(seq[before])) <= abs(key(seq[after]) - value)):
+        after = before
+    if after < 0 or (tolerance is not None and abs(key(seq[after]) - value) > tolerance):
+        return None
+    return after
+
+
 class Container:
     def __init__(self, id=None, objects = None):
         self.id = id
@@ -21,9 +64,13 @@ class Container:
 
 class Trajectory(Container):
     def __init__(self, id=None):
-        self.steps = []
+        # SlidingLists so that the sliding window of a TrajectoryManager can drop the earliest point in O(1) while
+        # indexing, slicing and the binary searches over the steps stay random access
+        self.steps = SlidingList()
         self.step_to_object_map = {}
-        super().__init__(id=id, objects=[])
+        super().__init__(id=id, objects=SlidingList())
+        # TrajectoryAggregates kept up to date by add_object and remove_object, see track_aggregates
+        self.aggregates = None
 
     def add_object(self, obj, step, insort=False):
         if insort:
@@ -39,6 +86,10 @@ class Trajectory(Container):
             if index < len(self.objects) - 1:
                 obj.next = self.objects[index + 1]
                 self.objects[index + 1].prev = obj
+            if self.aggregates is not None:
+                self.aggregates.on_add(obj, step, self.objects[index - 1] if index > 0 else None,
+                                       self.objects[index + 1] if index < len(self.objects) - 1 else None,
+                                       index == len(self.objects) - 1)
         else:
             if len(self.steps) > 0 and step < self.steps[-1]:
                 raise ValueError(f"Step {step} is less than the last step {self.steps[-1]}, if you want to insert in between use insort=True")
@@ -48,19 +99,66 @@ class Trajectory(Container):
             if len(self.objects) > 1:
                 self.objects[-2].next = obj
                 obj.prev = self.objects[-2]
+            if self.aggregates is not None:
+                self.aggregates.on_add(obj, step, self.objects[-2] if len(self.objects) > 1 else None, None, True)
         obj.traj = self
 
+    def track_aggregates(self, latlon=True):
+        # maintain a TrajectoryAggregates of the points from now on, see msight_base.aggregates
+        from .aggregates import TrajectoryAggregates
+        self.aggregates = TrajectoryAggregates(self, latlon=latlon)
+        self.aggregates.refresh()
+        return self.aggregates
+
     def get_object_at_step(self, step):
         return self.step_to_object_map.get(step, None)
+
+    def get_nearest_object(self, timestamp, tolerance=None):
+        # the timestamps of the objects are expected to increase with the steps, which holds for trajectories of a TrajectoryManager,
+        # objects without a timestamp are skipped
+        index = _nearest_index(self.objects, timestamp, key=lambda obj: obj.timestamp, tolerance=tolerance)
+        return None if index is None else self.objects[index]
+
+    def get_objects_between(self, start, end):
+        # objects with start <= timestamp <= end
+        lo = _bisect_by(self.objects, start, key=lambda obj: obj.timestamp)
+        hi = _bisect_by(self.objects, end, key=lambda obj: obj.timestamp, right=True)
+        return [obj for obj in self.objects[lo:hi] if obj.timestamp is not None]
+
+    def interpolate(self, timestamps):
+        # interpolated states at the query timestamps, returns (valid, values) with values mapping field to array
+        from .interpolation import interpolate_trajectory
+        return interpolate_trajectory(self, timestamps)
+
+    def as_arrays(self):
+        # copies the numeric attributes of the points into new NumPy arrays, writing to them does not change the points
+        from .columnar import points_to_arrays
+        return points_to_arrays(self.objects)
     
     def remove_object(self, step):
-        if step not in self.steps:
+        if step not in self.step_to_object_map:
             return
             # raise ValueError(f"Step {step} does not exist in the trajectory")
         obj = self.get_object_at_step(step)
-        self.objects.remove(obj)
-        self.steps.remove(step)
+        objects = self.objects
+        if self.steps[0] == step:
+            # fast path, this is always the case when the window of a trajectory manager slides
+            index = 0
+            self.steps.popleft()
+            objects.popleft()
+        elif self.steps[-1] == step:
+            index = len(objects) - 1
+            self.steps.pop()
+            objects.pop()
+        else:
+            index = bisect.bisect_left(self.steps, step)
+            del self.steps[index]
+            del objects[index]
         del self.step_to_object_map[step]
+        if self.aggregates is not None:
+            # the former neighbors of obj are now at index - 1 and index
+            self.aggregates.on_remove(obj, step, objects[index - 1] if index > 0 else None,
+                                      objects[index] if index < len(objects) else None, index == 0)
         obj.traj = None
         next_obj = obj.next
         prev_obj = obj.prev
@@ -76,6 +174,8 @@ class Frame(Container):
         self.timestamp = timestamp
         self.traj_ids = set()
         self.traj_id_to_obj_map = {}
+        # built lazily by spatial_index and dropped whenever the objects of the frame change
+        self._spatial_index = None
         super().__init__(None, objects=[])
 
     def add_object(self, obj):
@@ -85,6 +185,7 @@ class Frame(Container):
         self.traj_id_to_obj_map[obj.traj_id] = obj
         self.traj_ids.add(obj.traj_id)
         obj.frame = self
+        self._spatial_index = None
 
     def remove_object(self, obj):
         if obj.traj_id not in self.traj_ids:
@@ -93,19 +194,93 @@ class Frame(Container):
         del self.traj_id_to_obj_map[obj.traj_id]
         self.traj_ids.remove(obj.traj_id)
         obj.frame = None
+        self._spatial_index = None
+
+    def spatial_index(self, latlon=True, cell_size=10.0):
+        # with latlon=True the x/y of the objects are latitude/longitude, distances are always in meters
+        index = self._spatial_index
+        if index is None or index.latlon != latlon or index.grid.cell_size != cell_size:
+            from .spatial import FrameSpatialIndex
+            index = FrameSpatialIndex(self.objects, latlon=latlon, cell_size=cell_size)
+            self._spatial_index = index
+        return index
+
+    def query_radius(self, pt, r, latlon=True, return_distance=False):
+        # objects within r meters of pt (a RoadUserPoint or an (x, y) tuple), nearest first, pt itself excluded
+        return self.spatial_index(latlon=latlon).query_radius(pt, r, return_distance=return_distance)
+
+    def knn(self, pt, k, latlon=True, return_distance=False):
+        # the k objects nearest to pt (a RoadUserPoint or an (x, y) tuple), nearest first, pt itself excluded
+        return self.spatial_index(latlon=latlon).knn(pt, k, return_distance=return_distance)
+
+
+def _estimate_point_bytes(obj):
+    # rough memory of a point for the max_bytes budget: the object, its attribute dict, its float values and the references
+    # held by the trajectory and frame containers
+    size = sys.getsizeof(obj)
+    attributes = getattr(obj, '__dict__', None)
+    if attributes is not None:
+        size += sys.getsizeof(attributes)
+    floats = sum(isinstance(getattr(obj, name, None), float)
+                 for name in ('x', 'y', 'speed', 'acceleration', 'heading', 'width', 'length', 'yaw_rate'))
+    return size + 24 * floats + 72
 
 
 class TrajectoryManager:
-    def __init__(self, max_frames=None):
-        self.trajectories = []
+    """
+    Sliding window of frames and the trajectories running through them.
+
+    Memory is bounded by any combination of: max_frames, the number of frames in the window; max_points or max_bytes,
+    a budget for the whole window enforced by evicting the earliest frames (max_bytes uses an estimate of the size of a
+    point); max_traj_length, the number of points kept per trajectory, the earliest ones are dropped; max_idle_frames or
+    max_idle_seconds, trajectories without a new point for that long are removed. on_evict(traj, reason) is called when a
+    trajectory leaves the manager because of these policies: 'idle' before an idle trajectory is removed, with all its
+    points, 'window' or 'budget' once the last point of a trajectory was evicted with the earliest frame. Frames left empty
+    at the start of the window by idle expiry are dropped as well.
+
+    With frame_kinematics every frame pushed with add_frame gets the speed, acceleration and yaw_rate of its objects from
+    their previous points, see kinematics.update_frame_kinematics.
+    """
+    def __init__(self, max_frames=None, track_aggregates=False, aggregates_latlon=True, max_idle_frames=None,
+                 max_idle_seconds=None, max_points=None, max_bytes=None, max_traj_length=None, on_evict=None,
+                 frame_kinematics=False, kinematics_latlon=True):
+        if max_traj_length is not None and max_traj_length < 1:
+            raise ValueError(f"max_traj_length must be at least 1, got {max_traj_length}")
         self.traj_ids = set()
         self.traj_id_to_traj_map = {}
-        self.frames = []
-        self.steps = []
-        self.timestamps = []
+        # frames, steps and timestamps are SlidingLists so that the earliest frame can be evicted in O(1) when max_frames
+        # is set, they still support indexing, slicing and binary searches like lists
+        self.frames = SlidingList()
+        self.steps = SlidingList()
+        self.timestamps = SlidingList()
         self.step_to_frame_map = {}
         self.timestamp_to_frame_map = {}
         self.max_frames = max_frames
+        # with track_aggregates every trajectory keeps a TrajectoryAggregates, see aggregate_table and select_trajectories
+        self.track_aggregates = track_aggregates
+        self.aggregates_latlon = aggregates_latlon
+        self.max_idle_frames = max_idle_frames
+        self.max_idle_seconds = max_idle_seconds
+        self.max_points = max_points
+        self.max_bytes = max_bytes
+        self.max_traj_length = max_traj_length
+        self.on_evict = on_evict
+        self.frame_kinematics = frame_kinematics
+        self.kinematics_latlon = kinematics_latlon
+        # number of points in the window
+        self.num_points = 0
+        self._point_bytes = None
+        # traj_id to (step, seconds) of its latest point, ordered by update so idle trajectories are found at the front
+        self._last_update = OrderedDict() if max_idle_frames is not None or max_idle_seconds is not None else None
+        self._trajectories = ()
+
+    @property
+    def trajectories(self):
+        # trajectories are kept in the insertion ordered traj_id_to_traj_map so that removing one is O(1), this read-only
+        # tuple of them is rebuilt on the first access after a trajectory was added or removed
+        if self._trajectories is None:
+            self._trajectories = tuple(self.traj_id_to_traj_map.values())
+        return self._trajectories
 
     @property
     def last_step(self):
@@ -119,68 +294,555 @@ class TrajectoryManager:
     def last_frame(self):
         return self.frames[-1]
     
-    def delete_earliest_frame(self):
+    def delete_earliest_frame(self, reason='window'):
+        # the cost of this method is proportional to the number of objects in the earliest frame only
         if not self.frames:
             raise ValueError("No frames to delete")
-        step = self.frames[0].step
-        for obj in self.frames[0].objects:
-            # print(obj.traj, obj.traj_id)
-            if obj.traj is not None:
-                obj.traj.remove_object(step)
-        if self.frames[0].timestamp is not None:
-            del self.timestamp_to_frame_map[self.frames[0].timestamp]
-            self.timestamps.remove(self.frames[0].timestamp)
+        frame = self.frames.popleft()
+        step = frame.step
+        self.num_points -= len(frame.objects)
+        for obj in frame.objects:
+            self._evict_object(obj, step, reason)
+        if frame.timestamp is not None:
+            if self.timestamp_to_frame_map.get(frame.timestamp) is frame:
+                del self.timestamp_to_frame_map[frame.timestamp]
+            if self.timestamps and self.timestamps[0] == frame.timestamp:
+                self.timestamps.popleft()
+            else:
+                self.timestamps.remove(frame.timestamp)
         del self.step_to_frame_map[step]
-        self.steps.remove(step)
+        self.steps.popleft()
+        self._release_frame(frame)
+
+    def _release_frame(self, frame):
+        # break the links between an evicted frame and its points, which would otherwise keep both alive in reference
+        # cycles until the cyclic garbage collector runs. The points keep their timestamp and step as plain values, the
+        # frame is left empty
+        timestamp = frame.timestamp
+        step = frame.step
+        for obj in frame.objects:
+            if obj.frame is frame:
+                obj.frame = None
+                obj.prev = obj.next = None
+                obj.timestamp = timestamp
+                obj.frame_step = step
+        frame.objects = []
+        frame.traj_ids = set()
+        frame.traj_id_to_obj_map = {}
+        frame._spatial_index = None
+
+    def _release_trajectory(self, traj):
+        # break the links of a trajectory evicted from the manager and of its points, like _release_frame. The points stay
+        # in traj.objects and keep their traj_id, points shared with another manager are left alone
+        for obj in traj.objects:
+            if obj.traj is traj:
+                obj.traj = None
+                obj.traj_id = traj.id
+                obj.prev = obj.next = None
+        traj.aggregates = None
+
+    def _evict_object(self, obj, step, reason='window'):
+        # remove an object of the evicted frame at step from its trajectory, the object keeps its traj_id
+        traj = obj.traj
+        if traj is None:
+            return
+        traj.remove_object(step)
+        obj.traj_id = traj.id
+        if len(traj.objects) == 0 and self.traj_id_to_traj_map.get(traj.id) is traj:
+            # the trajectory has no objects left in any frame, so there is nothing to detach from the frames
+            self.traj_ids.remove(traj.id)
+            del self.traj_id_to_traj_map[traj.id]
+            self._trajectories = None
+            if self._last_update is not None:
+                self._last_update.pop(traj.id, None)
+            if self.on_evict is not None:
+                self.on_evict(traj, reason)
+            self._release_trajectory(traj)
+
+    def get_frame_at_step(self, step):
+        return self.step_to_frame_map.get(step, None)
+
+    def get_frame_at_timestamp(self, timestamp):
+        return self.timestamp_to_frame_map.get(timestamp, None)
+
+    def get_nearest_frame(self, timestamp, tolerance=None):
+        # self.timestamps is sorted as long as frames are pushed in time order, frames without a timestamp are not indexed
+        index = _nearest_index(self.timestamps, timestamp, tolerance=tolerance)
+        return None if index is None else self.timestamp_to_frame_map[self.timestamps[index]]
+
+    def get_frames_between(self, start, end):
+        # frames with start <= timestamp <= end
+        lo = bisect.bisect_left(self.timestamps, start)
+        hi = bisect.bisect_right(self.timestamps, end)
+        return [self.timestamp_to_frame_map[timestamp] for timestamp in self.timestamps[lo:hi]]
+
+    def get_object_at_time(self, traj_id, timestamp, tolerance=None):
+        # the object of trajectory traj_id nearest to timestamp
+        traj = self.traj_id_to_traj_map.get(traj_id, None)
+        if traj is None:
+            return None
+        return traj.get_nearest_object(timestamp, tolerance=tolerance)
+
+    def interpolate(self, timestamps):
+        # interpolated states of every trajectory at the query timestamps in one vectorized call,
+        # returns (traj_ids, valid, values) with valid and values[field] shaped (num_trajectories, num_timestamps)
+        from .interpolation import interpolate_trajectories
+        return interpolate_trajectories(self.trajectories, timestamps)
+
+    def resample(self, dt, start=None, end=None, max_frames=None):
+        # a new TrajectoryManager with frames every dt seconds
+        from .interpolation import resample_manager
+        return resample_manager(self, dt, start=start, end=end, max_frames=max_frames)
+
+    def aggregate_table(self, fields=None):
+        # aggregates of every trajectory as columns, requires track_aggregates=True
+        from .aggregates import aggregate_table, AGGREGATE_FIELDS
+        return aggregate_table(self, fields=AGGREGATE_FIELDS if fields is None else fields)
+
+    def select_trajectories(self, where=None, sort_by=None, descending=False, limit=None, **ranges):
+        # traj_ids filtered and sorted by their aggregates, e.g. select_trajectories(max_speed=(10, None), sort_by='path_length')
+        from .aggregates import select_trajectories
+        return select_trajectories(self, where=where, sort_by=sort_by, descending=descending, limit=limit, **ranges)
+
+    def fork(self, max_frames=None):
+        # copy-on-write branch of the manager for what-if rollouts, see TrajectoryFork
+        return TrajectoryFork(self, max_frames=max_frames)
+
+    def save(self, path):
+        # columnar binary format, see msight_base.storage
+        from .storage import save_trajectory_manager
+        save_trajectory_manager(self, path)
+
+    @staticmethod
+    def load(path, mmap=True):
+        # a lazy msight_base.storage.TrajectoryRecording of the memory-mapped columns, frames and trajectories are built
+        # when they are accessed, its to_trajectory_manager (or storage.load_trajectory_manager) loads every frame
+        from .storage import TrajectoryRecording
+        return TrajectoryRecording(path, mmap=mmap)
+
+    def frame_arrays(self, step):
+        # copies the numeric attributes of the objects of the frame at step into new NumPy arrays, with their traj_ids
+        from .columnar import points_to_arrays
+        if step not in self.step_to_frame_map:
+            raise ValueError(f"Step {step} does not exist")
+        frame = self.step_to_frame_map[step]
+        arrays = points_to_arrays(frame.objects)
+        arrays['traj_id'] = [obj.traj_id for obj in frame.objects]
+        return arrays
+
+    def _new_trajectory(self, traj_id):
+        traj = Trajectory(traj_id)
+        if self.track_aggregates:
+            traj.track_aggregates(latlon=self.aggregates_latlon)
+        self.traj_ids.add(traj_id)
+        self.traj_id_to_traj_map[traj_id] = traj
+        self._trajectories = None
+        return traj
+
+    def _new_frame(self, step, timestamp):
+        frame = Frame(step, timestamp)
+        self.frames.append(frame)
+        self.steps.append(step)
+        self.step_to_frame_map[step] = frame
+        if timestamp is not None:
+            self.timestamps.append(timestamp)
+            self.timestamp_to_frame_map[timestamp] = frame
+        return frame
+
+    def _evict(self):
+        while self.max_frames is not None and len(self.frames) > self.max_frames:
+            self.delete_earliest_frame()
+        budget = self._point_budget()
+        if budget is not None:
+            # the latest frame is always kept
+            while self.num_points > budget and len(self.frames) > 1:
+                self.delete_earliest_frame(reason='budget')
+        if self._last_update:
+            self._expire_idle()
+
+    def _point_budget(self):
+        budget = self.max_points
+        if self.max_bytes is not None:
+            if self._point_bytes is None:
+                sample = next((frame.objects[0] for frame in reversed(self.frames) if frame.objects), None)
+                if sample is None:
+                    return budget
+                self._point_bytes = _estimate_point_bytes(sample)
+            byte_budget = self.max_bytes // self._point_bytes
+            budget = byte_budget if budget is None else min(budget, byte_budget)
+        return budget
+
+    def _touch(self, traj_id, step, timestamp):
+        # record the latest update of a trajectory for idle expiry
+        last_update = self._last_update
+        last_update[traj_id] = (step, timestamp_to_seconds(timestamp))
+        last_update.move_to_end(traj_id)
 
-        for traj in self.trajectories:
-            if len(traj.objects) == 0:
-                self.remove_traj(traj)
-        self.frames.pop(0)
+    def _expire_idle(self):
+        last_step = self.last_step
+        now = timestamp_to_seconds(self.timestamps[-1]) if self.timestamps else float('nan')
+        expired = []
+        for traj_id, (step, seconds) in self._last_update.items():
+            if (self.max_idle_frames is not None and last_step - step > self.max_idle_frames) or \
+                    (self.max_idle_seconds is not None and now - seconds > self.max_idle_seconds):
+                expired.append(traj_id)
+            else:
+                break
+        for traj_id in expired:
+            traj = self.traj_id_to_traj_map[traj_id]
+            if self.on_evict is not None:
+                self.on_evict(traj, 'idle')
+            self.remove_traj(traj)
+            self._release_trajectory(traj)
+        # frames left empty by the expired trajectories at the start of the window are dropped, the latest one is kept
+        while expired and len(self.frames) > 1 and not self.frames[0].objects:
+            self.delete_earliest_frame(reason='idle')
+
+    def _trim(self, trajectories):
+        # drop the earliest points of trajectories longer than max_traj_length, every frame is rebuilt once
+        removed = {}
+        for traj in trajectories:
+            while len(traj.objects) > self.max_traj_length:
+                step = traj.steps[0]
+                removed.setdefault(step, []).append((traj.id, traj.objects[0]))
+                traj.remove_object(step)
+                self.num_points -= 1
+        for step, objects in removed.items():
+            self._remove_from_frame(self.step_to_frame_map[step], objects)
+
+    def _remove_from_frame(self, frame, objects):
+        # objects is a list of (traj_id, object)
+        ids = set(id(obj) for _, obj in objects)
+        frame.objects[:] = [obj for obj in frame.objects if id(obj) not in ids]
+        for traj_id, obj in objects:
+            del frame.traj_id_to_obj_map[traj_id]
+            frame.traj_ids.discard(traj_id)
+            obj.frame = None
+        frame._spatial_index = None
 
     def add_object(self, obj, traj_id, step, timestamp=None, insort=False):
         if traj_id not in self.traj_ids:
-            traj = Trajectory(traj_id)
-            self.trajectories.append(traj)
-            self.traj_ids.add(traj_id)
-            self.traj_id_to_traj_map[traj_id] = traj
+            traj = self._new_trajectory(traj_id)
         else:
             traj = self.traj_id_to_traj_map[traj_id]
 
         if step >= self.last_step + 1:
-            frame = Frame(step, timestamp)
-            self.frames.append(frame)
-            self.steps.append(step)
-            self.step_to_frame_map[step] = frame
-            if timestamp is not None:
-                self.timestamps.append(timestamp)
-                self.timestamp_to_frame_map[timestamp] = frame
-            
+            frame = self._new_frame(step, timestamp)
         elif step <= self.last_step and step >= self.earliest_step:
             frame = self.step_to_frame_map[step]
         else:
             raise ValueError(f"Step {step} is not a valid step, valid steps are from 0 to {self.last_step+1}")
 
+        # the frame is assigned first so that the trajectory sees the timestamp of the object
+        obj.frame = frame
         traj.add_object(obj, step, insort=insort)
         frame.add_object(obj)
-        while self.max_frames is not None and len(self.frames) > self.max_frames:
-            # print(len(self.frames), self.max_frames)
-            self.delete_earliest_frame()
+        self.num_points += 1
+        if self._last_update is not None and step == traj.steps[-1]:
+            self._touch(traj_id, step, frame.timestamp)
+        if self.max_traj_length is not None and len(traj.objects) > self.max_traj_length:
+            self._trim([traj])
+        self._evict()
+
+    def add_frame(self, object_list: List[RoadUserPoint], traj_ids=None, timestamp=None, step=None):
+        # push a whole frame at once: the frame is created once, every trajectory is linked in one pass and the window is evicted once
+        # traj_ids defaults to the traj_id of each object, step defaults to the step after the last one
+        step = self.last_step + 1 if step is None else step
+        if step <= self.last_step:
+            raise ValueError(f"Step {step} is not a new step, the last step is {self.last_step}")
+        if traj_ids is None:
+            traj_ids = [obj.traj_id for obj in object_list]
+        elif len(traj_ids) != len(object_list):
+            raise ValueError(f"Got {len(traj_ids)} traj_ids for {len(object_list)} objects")
+        if None in traj_ids:
+            raise ValueError("Object must have a traj_id to be added to a trajectory manager")
+        if len(set(traj_ids)) != len(traj_ids):
+            raise ValueError("Objects in a frame must have unique traj_ids")
+
+        frame = self._new_frame(step, timestamp)
+        traj_id_to_traj_map = self.traj_id_to_traj_map
+        max_traj_length = self.max_traj_length
+        too_long = []
+        for obj, traj_id in zip(object_list, traj_ids):
+            traj = traj_id_to_traj_map.get(traj_id)
+            if traj is None:
+                traj = self._new_trajectory(traj_id)
+            # the frame is assigned first so that the trajectory sees the timestamp of the object
+            obj.frame = frame
+            # step is after every step of the manager, so the object is always appended at the end of its trajectory
+            traj.add_object(obj, step)
+            frame.objects.append(obj)
+            frame.traj_id_to_obj_map[traj_id] = obj
+            if max_traj_length is not None and len(traj.objects) > max_traj_length:
+                too_long.append(traj)
+        frame.traj_ids.update(traj_ids)
+        self.num_points += len(object_list)
+        if self._last_update is not None:
+            for traj_id in traj_ids:
+                self._touch(traj_id, step, timestamp)
+        if self.frame_kinematics:
+            # before trimming, which may drop the previous points
+            from .kinematics import update_frame_kinematics
+            update_frame_kinematics(frame, latlon=self.kinematics_latlon)
+        if too_long:
+            self._trim(too_long)
+        self._evict()
+        return frame
+
+    def add_frame_arrays(self, traj_ids, timestamp=None, step=None, point_cls=RoadUserPoint, **columns):
+        # push a frame given as parallel arrays, e.g. add_frame_arrays(ids, x=xs, y=ys, heading=headings), the columns are RoadUserPoint arguments
+        columns = {name: column.tolist() if hasattr(column, 'tolist') else list(column) for name, column in columns.items()}
+        traj_ids = traj_ids.tolist() if hasattr(traj_ids, 'tolist') else list(traj_ids)
+        for name, column in columns.items():
+            if len(column) != len(traj_ids):
+                raise ValueError(f"Column {name} has {len(column)} values, expected {len(traj_ids)}")
+        names = list(columns)
+        object_list = [point_cls(**dict(zip(names, values))) for values in zip(*columns.values())] \
+            if names else [point_cls() for _ in traj_ids]
+        return self.add_frame(object_list, traj_ids=traj_ids, timestamp=timestamp, step=step)
 
     def add_list_as_new_frame(self, object_list: List[RoadUserPoint], timestamp=None):
         # use this method to push a list of objects as the last frame, this is very useful when you have a list of objects that are already tracked with id assigned
-        step = self.last_step + 1
-        for obj in object_list:
-            if obj.traj_id is None:
-                raise ValueError("Object must have a traj_id to be added to a trajectory manager")
-            self.add_object(obj, obj.traj_id, step, timestamp=obj.timestamp)
+        # without a timestamp the frame takes the timestamp of its first object, an empty list adds nothing and returns None
+        if len(object_list) == 0:
+            return None
+        if timestamp is None:
+            timestamp = object_list[0].timestamp
+        return self.add_frame(object_list, timestamp=timestamp)
 
 
     def remove_traj(self, traj: Trajectory):
         # print(f"Removing trajectory with id {traj.id}")
         tid = traj.id
-        self.trajectories.remove(traj)
         self.traj_ids.remove(tid)
         del self.traj_id_to_traj_map[tid]
+        self._trajectories = None
+        self.num_points -= len(traj.objects)
+        if self._last_update is not None:
+            self._last_update.pop(tid, None)
         for obj in traj:
             obj.frame.remove_object(obj)
+
+
+class _BranchTrajectory(Trajectory):
+    # trajectory of a TrajectoryFork, its first shared_len objects belong to the history shared with the parent and the
+    # fork never changes their links: the first branch object links back to the history but not the other way around.
+    # steps and objects are copy-on-write views of the containers of the parent trajectory and step_to_object_map is
+    # only copied once it changes, so evicting the earliest points moves the start of the views without copying
+    def __init__(self, traj):
+        super().__init__(traj.id)
+        self.steps = traj.steps.share()
+        self.objects = traj.objects.share()
+        self._parent_map = traj.step_to_object_map
+        self._step_map = None
+        self.shared_len = len(self.objects)
+        if traj.aggregates is not None:
+            self.aggregates = traj.aggregates.copy(self)
+
+    @property
+    def step_to_object_map(self):
+        if self._step_map is None:
+            first = self.steps[0] if self.steps else None
+            self._step_map = {step: obj for step, obj in self._parent_map.items() if first is not None and step >= first}
+        return self._step_map
+
+    @step_to_object_map.setter
+    def step_to_object_map(self, value):
+        self._step_map = value
+
+    def get_object_at_step(self, step):
+        if self._step_map is None:
+            # the parent map may still hold the points evicted from the start of the views
+            return self._parent_map.get(step) if self.steps and step >= self.steps[0] else None
+        return self._step_map.get(step)
+
+    def add_object(self, obj, step, insort=False):
+        shared = self.shared_len
+        if shared > 0 and step <= self.steps[shared - 1]:
+            raise ValueError(f"Step {step} is in the history shared with the parent, objects can only be added after step {self.steps[shared - 1]}")
+        anchor = self.objects[shared - 1] if shared > 0 else None
+        anchor_next = anchor.next if anchor is not None else None
+        super().add_object(obj, step, insort=insort)
+        if anchor is not None:
+            anchor.next = anchor_next
+
+    def remove_object(self, step):
+        if self.get_object_at_step(step) is None:
+            return
+        index = bisect.bisect_left(self.steps, step)
+        if index >= self.shared_len:
+            anchor = self.objects[self.shared_len - 1] if self.shared_len > 0 else None
+            anchor_next = anchor.next if anchor is not None else None
+            super().remove_object(step)
+            if anchor is not None:
+                anchor.next = anchor_next
+            return
+        # a shared object only leaves the containers of the branch, the earliest one without copying them
+        obj = self.objects[index]
+        del self.steps[index]
+        del self.objects[index]
+        if index > 0 or self._step_map is not None:
+            del self.step_to_object_map[step]
+        self.shared_len -= 1
+        if index == self.shared_len and index < len(self.objects):
+            self.objects[index].prev = self.objects[index - 1] if index > 0 else None
+        if self.aggregates is not None:
+            self.aggregates.on_remove(obj, step, self.objects[index - 1] if index > 0 else None,
+                                      self.objects[index] if index < len(self.objects) else None, index == 0)
+
+
+class TrajectoryFork(TrajectoryManager):
+    """
+    Copy-on-write branch of a TrajectoryManager, created by TrajectoryManager.fork().
+
+    Forking copies the frame and trajectory indexes of the parent but shares its Frame, Trajectory and RoadUserPoint
+    objects. A frame or trajectory is copied the first time the fork modifies it, so appending hypothetical future frames
+    only costs the trajectories they extend. The shared points are never modified by the fork: their next links keep
+    pointing into the parent, while the prev links of the branch points lead back into the shared history. Changes made to
+    the parent after forking are not isolated from the fork, forks are meant to be used and discarded before the parent
+    moves on. max_frames defaults to the window of the parent, the other policies (idle expiry, point budgets,
+    max_traj_length, on_evict, frame_kinematics) are inherited. Evicting shared points only moves the start of the
+    copy-on-write views of the trajectories, the parent and its points are left untouched.
+    """
+    def __init__(self, parent, max_frames=None):
+        super().__init__(max_frames=parent.max_frames if max_frames is None else max_frames,
+                         track_aggregates=parent.track_aggregates, aggregates_latlon=parent.aggregates_latlon,
+                         max_idle_frames=parent.max_idle_frames, max_idle_seconds=parent.max_idle_seconds,
+                         max_points=parent.max_points, max_bytes=parent.max_bytes, max_traj_length=parent.max_traj_length,
+                         on_evict=parent.on_evict, frame_kinematics=parent.frame_kinematics,
+                         kinematics_latlon=parent.kinematics_latlon)
+        self.parent = parent
+        self.traj_ids = set(parent.traj_ids)
+        self.traj_id_to_traj_map = dict(parent.traj_id_to_traj_map)
+        self._trajectories = None
+        self.frames = SlidingList(parent.frames)
+        self.steps = SlidingList(parent.steps)
+        self.timestamps = SlidingList(parent.timestamps)
+        self.step_to_frame_map = dict(parent.step_to_frame_map)
+        self.timestamp_to_frame_map = dict(parent.timestamp_to_frame_map)
+        self.num_points = parent.num_points
+        self._point_bytes = parent._point_bytes
+        if parent._last_update is not None:
+            self._last_update = OrderedDict(parent._last_update)
+        # frames and trajectories created or copied by this fork, which it may modify in place
+        self._owned = set()
+
+    def _writable_trajectory(self, traj_id):
+        traj = self.traj_id_to_traj_map[traj_id]
+        if traj not in self._owned:
+            traj = _BranchTrajectory(traj)
+            self.traj_id_to_traj_map[traj_id] = traj
+            self._trajectories = None
+            self._owned.add(traj)
+        return traj
+
+    def _writable_frame(self, step):
+        frame = self.step_to_frame_map[step]
+        if frame in self._owned:
+            return frame
+        copy = Frame(frame.step, frame.timestamp)
+        copy.objects = list(frame.objects)
+        copy.traj_ids = set(frame.traj_ids)
+        copy.traj_id_to_obj_map = dict(frame.traj_id_to_obj_map)
+        self.frames[bisect.bisect_left(self.steps, step)] = copy
+        self.step_to_frame_map[step] = copy
+        if frame.timestamp is not None and self.timestamp_to_frame_map.get(frame.timestamp) is frame:
+            self.timestamp_to_frame_map[frame.timestamp] = copy
+        self._owned.add(copy)
+        return copy
+
+    def _new_trajectory(self, traj_id):
+        traj = super()._new_trajectory(traj_id)
+        self._owned.add(traj)
+        return traj
+
+    def _new_frame(self, step, timestamp):
+        frame = super()._new_frame(step, timestamp)
+        self._owned.add(frame)
+        return frame
+
+    def _evict_object(self, obj, step, reason='window'):
+        # shared objects still point to the trajectories of the parent, so the trajectory is looked up by id, making it
+        # writable only wraps the parent trajectory in views
+        traj_id = obj.traj_id
+        if self.traj_id_to_traj_map.get(traj_id) is None:
+            return
+        traj = self._writable_trajectory(traj_id)
+        if traj.get_object_at_step(step) is not obj:
+            return
+        traj.remove_object(step)
+        if obj.traj is None:
+            # a point of the fork, the shared points still belong to the parent
+            obj.traj_id = traj_id
+        if len(traj.objects) == 0:
+            self.traj_ids.remove(traj_id)
+            del self.traj_id_to_traj_map[traj_id]
+            self._trajectories = None
+            if self._last_update is not None:
+                self._last_update.pop(traj_id, None)
+            if self.on_evict is not None:
+                self.on_evict(traj, reason)
+            self._release_trajectory(traj)
+
+    def _trim(self, trajectories):
+        super()._trim([self._writable_trajectory(traj.id) for traj in trajectories])
+
+    def _remove_from_frame(self, frame, objects):
+        # the points of the parent keep their frame
+        frame = self._writable_frame(frame.step)
+        ids = set(id(obj) for _, obj in objects)
+        frame.objects[:] = [obj for obj in frame.objects if id(obj) not in ids]
+        for traj_id, obj in objects:
+            del frame.traj_id_to_obj_map[traj_id]
+            frame.traj_ids.discard(traj_id)
+            if obj.frame is frame:
+                obj.frame = None
+        frame._spatial_index = None
+
+    def delete_earliest_frame(self, reason='window'):
+        frame = self.frames[0] if self.frames else None
+        super().delete_earliest_frame(reason=reason)
+        self._owned.discard(frame)
+
+    def _release_frame(self, frame):
+        # frames of the parent are left alone, copies only release the points of the fork
+        if frame in self._owned:
+            super()._release_frame(frame)
+
+    def _release_trajectory(self, traj):
+        # trajectories of the parent are left alone, a branch only releases the points of the fork since the shared
+        # points still belong to the parent trajectory
+        if traj in self._owned:
+            self._owned.discard(traj)
+            super()._release_trajectory(traj)
+
+    def add_object(self, obj, traj_id, step, timestamp=None, insort=False):
+        if traj_id in self.traj_id_to_traj_map:
+            self._writable_trajectory(traj_id)
+        if self.earliest_step <= step <= self.last_step:
+            self._writable_frame(step)
+        super().add_object(obj, traj_id, step, timestamp=timestamp, insort=insort)
+
+    def add_frame(self, object_list: List[RoadUserPoint], traj_ids=None, timestamp=None, step=None):
+        for traj_id in (traj_ids if traj_ids is not None else [obj.traj_id for obj in object_list]):
+            if traj_id in self.traj_id_to_traj_map:
+                self._writable_trajectory(traj_id)
+        return super().add_frame(object_list, traj_ids=traj_ids, timestamp=timestamp, step=step)
+
+    def remove_traj(self, traj: Trajectory):
+        tid = traj.id
+        traj = self.traj_id_to_traj_map[tid]
+        self.traj_ids.remove(tid)
+        del self.traj_id_to_traj_map[tid]
+        self._trajectories = None
+        self.num_points -= len(traj.objects)
+        if self._last_update is not None:
+            self._last_update.pop(tid, None)
+        for obj, step in zip(traj.objects, traj.steps):
+            frame = self._writable_frame(step)
+            frame.objects.remove(obj)
+            del frame.traj_id_to_obj_map[tid]
+            frame.traj_ids.remove(tid)
+            frame._spatial_index = None
+            if obj.frame is frame:
+                obj.frame = None
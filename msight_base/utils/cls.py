@@ -1,9 +1,21 @@
+# dotted class path to class, filled by import_class_from_path and register_class so every path is imported only once
+_CLASS_REGISTRY = {}
+
+
 def get_class_path(cls):
     module = cls.__module__
     class_name = cls.__name__
     return f"{module}.{class_name}"
 
+def register_class(cls, path=None):
+    # make cls resolvable by path (its own class path by default) without importing anything
+    _CLASS_REGISTRY[get_class_path(cls) if path is None else path] = cls
+    return cls
+
 def import_class_from_path(path: str):
-    module_path, class_name = path.rsplit('.', 1)
-    module = __import__(module_path, fromlist=[class_name])
-    return getattr(module, class_name)
\ No newline at end of file
+    cls = _CLASS_REGISTRY.get(path)
+    if cls is None:
+        module_path, class_name = path.rsplit('.', 1)
+        module = __import__(module_path, fromlist=[class_name])
+        cls = _CLASS_REGISTRY[path] = getattr(module, class_name)
+    return cls
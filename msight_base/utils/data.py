@@ -1,6 +1,9 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from msight_base import TrajectoryManager, RoadUserPoint
 import json
+import os
 from datetime import datetime
 from tqdm import tqdm
 
@@ -11,23 +14,75 @@ def get_timestamp_from_filename(file_name: str) -> datetime:
     return datetime.strptime(stem, "%Y-%m-%d %H-%M-%S-%f")
 
 
-def read_msight_json_data(file_path: Path) -> TrajectoryManager:
-    tm = TrajectoryManager()
-    step = 0
-    for frame_file in tqdm(list(file_path.iterdir())):
-        if frame_file.suffix != ".json":
-            continue
-        timestamp = get_timestamp_from_filename(frame_file.stem)
-        with open(frame_file, "r") as f:
-            frame_data = json.load(f)
-            for obj_data in frame_data['fusion']:
-                obj = RoadUserPoint(
-                    obj_data['lat'],
-                    obj_data['lon'],
-                    heading=obj_data['heading'],
-                    width=obj_data['width'],
-                    length=obj_data['length'],
-                )
-                tm.add_object(obj, obj_data['id'], step, timestamp=timestamp)
-        step += 1
+def list_msight_json_files(file_path: Path):
+    # (timestamp, path) of every frame file in the directory, sorted by the timestamp in the file name
+    frame_files = [(get_timestamp_from_filename(frame_file.stem), frame_file)
+                   for frame_file in Path(file_path).iterdir() if frame_file.suffix == ".json"]
+    frame_files.sort(key=lambda item: item[0])
+    return frame_files
+
+
+def parse_msight_json_file(frame_file: Path):
+    # the fused objects of a frame file as plain (id, lat, lon, heading, width, length) tuples, cheap to send between processes
+    with open(frame_file, "r") as f:
+        frame_data = json.load(f)
+    return [(obj_data['id'], obj_data['lat'], obj_data['lon'], obj_data['heading'], obj_data['width'], obj_data['length'])
+            for obj_data in frame_data['fusion']]
+
+
+def _default_workers():
+    # a pool of one worker only adds overhead, a single core parses in the calling thread
+    cores = os.cpu_count() or 1
+    return min(8, cores) if cores > 1 else 0
+
+
+def iter_msight_json_frames(file_path: Path, workers=None, read_ahead=64, processes=False, point_cls=RoadUserPoint, progress=False):
+    """
+    Stream the frames of an MSight JSON frame directory in timestamp order as (timestamp, objects) pairs, the objects
+    carry their traj_id. Files are parsed by a pool of workers and at most read_ahead files are parsed ahead of the
+    consumer. workers defaults to the number of cores (at most 8), workers=0 and a single core parse in the calling
+    thread. The workers are threads by default, which only help when reading the files is slower than parsing them (e.g.
+    on a network file system) since json.load holds the GIL. processes=True parses in processes instead, which scales
+    with the cores but, under the spawn start method, needs the caller to be guarded by if __name__ == '__main__'. See
+    benchmarks/json_loader.py.
+    """
+    frame_files = list_msight_json_files(file_path)
+    workers = _default_workers() if workers is None else workers
+    bar = tqdm(total=len(frame_files)) if progress else None
+
+    def to_frame(timestamp, parsed):
+        if bar is not None:
+            bar.update()
+        return timestamp, [point_cls(lat, lon, heading=heading, width=width, length=length, traj_id=traj_id)
+                           for traj_id, lat, lon, heading, width, length in parsed]
+
+    try:
+        if workers == 0:
+            for timestamp, frame_file in frame_files:
+                yield to_frame(timestamp, parse_msight_json_file(frame_file))
+            return
+        executor_cls = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with executor_cls(max_workers=workers) as executor:
+            pending = deque()
+            files = iter(frame_files)
+            for timestamp, frame_file in files:
+                pending.append((timestamp, executor.submit(parse_msight_json_file, frame_file)))
+                if len(pending) >= read_ahead:
+                    break
+            while pending:
+                timestamp, future = pending.popleft()
+                next_file = next(files, None)
+                if next_file is not None:
+                    pending.append((next_file[0], executor.submit(parse_msight_json_file, next_file[1])))
+                yield to_frame(timestamp, future.result())
+    finally:
+        if bar is not None:
+            bar.close()
+
+
+def read_msight_json_data(file_path: Path, workers=None, read_ahead=64, processes=False, max_frames=None, progress=True) -> TrajectoryManager:
+    tm = TrajectoryManager(max_frames=max_frames)
+    for timestamp, objects in iter_msight_json_frames(file_path, workers=workers, read_ahead=read_ahead,
+                                                      processes=processes, progress=progress):
+        tm.add_frame(objects, timestamp=timestamp)
     return tm
@@ -0,0 +1,28 @@
+import math
+import numpy as np
+
+EARTH_RADIUS = 6378137.0
+
+
+def latlon_to_local(lat, lon, lat0, lon0):
+    # equirectangular projection around (lat0, lon0) to meters north and east, accurate to centimeters within a few kilometers
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    north = np.radians(lat - lat0) * EARTH_RADIUS
+    east = np.radians(lon - lon0) * EARTH_RADIUS * np.cos(np.radians(lat0))
+    return north, east
+
+
+def local_to_latlon(north, east, lat0, lon0):
+    north = np.asarray(north, dtype=np.float64)
+    east = np.asarray(east, dtype=np.float64)
+    lat = lat0 + np.degrees(north / EARTH_RADIUS)
+    lon = lon0 + np.degrees(east / (EARTH_RADIUS * np.cos(np.radians(lat0))))
+    return lat, lon
+
+
+def latlon_distance(lat0, lon0, lat1, lon1):
+    # distance in meters between two nearby points with the same projection, scalar version for per point updates
+    north = math.radians(lat1 - lat0) * EARTH_RADIUS
+    east = math.radians(lon1 - lon0) * EARTH_RADIUS * math.cos(math.radians((lat0 + lat1) / 2))
+    return math.hypot(north, east)
@@ -0,0 +1,9 @@
+import numpy as np
+
+
+def expand_ranges(starts, ends):
+    # concatenation of the ranges starts[i]:ends[i] and the position i of the range of every item
+    lengths = ends - starts
+    owners = np.repeat(np.arange(len(starts)), lengths)
+    first = np.cumsum(lengths) - lengths
+    return starts[owners] + np.arange(len(owners)) - first[owners], owners
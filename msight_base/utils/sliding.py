@@ -0,0 +1,170 @@
+from itertools import islice
+
+
+class SlidingList:
+    """
+    List for sliding windows: popleft is O(1) amortized like a deque, indexing and slicing are O(1) and O(k) like a list,
+    so binary searches over it stay O(log n). The items live in a plain list from position head on, the dropped prefix
+    is deleted at once when it grows larger than the live part.
+
+    share() gives a copy-on-write view over the same list: popleft only moves the head of the view, any other change
+    copies the live items first.
+    """
+    __slots__ = ('_items', '_head', '_shared')
+
+    def __init__(self, items=()):
+        self._items = list(items)
+        self._head = 0
+        self._shared = False
+
+    def share(self):
+        # a view of the items that is copied on its first change other than popleft, this list must not change meanwhile
+        view = SlidingList.__new__(SlidingList)
+        view._items = self._items
+        view._head = self._head
+        view._shared = True
+        return view
+
+    def _own(self):
+        # copy the live items of a shared view before changing them
+        self._items = self._items[self._head:]
+        self._head = 0
+        self._shared = False
+
+    def _position(self, index):
+        size = len(self._items) - self._head
+        if index < 0:
+            index += size
+        if index < 0 or index >= size:
+            raise IndexError("SlidingList index out of range")
+        return self._head + index
+
+    def __len__(self):
+        return len(self._items) - self._head
+
+    def __bool__(self):
+        return len(self._items) > self._head
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if not self._head:
+                return self._items[index]
+            # shift the bounds by head and slice once, with head > 0 a stop of -1 (before the first item of a negative
+            # step) becomes head - 1 and does not wrap around
+            start, stop, step = index.indices(len(self))
+            return self._items[start + self._head:stop + self._head:step]
+        # the position is computed inline, indexing the ends is the hot path of the windows
+        items = self._items
+        if index >= 0:
+            index += self._head
+            if index >= len(items):
+                raise IndexError("SlidingList index out of range")
+        else:
+            index += len(items)
+            if index < self._head:
+                raise IndexError("SlidingList index out of range")
+        return items[index]
+
+    def __setitem__(self, index, value):
+        position = self._position(index)
+        if self._shared:
+            self._own()
+            position = index % len(self._items)
+        self._items[position] = value
+
+    def __delitem__(self, index):
+        position = self._position(index)
+        if position == self._head:
+            self.popleft()
+            return
+        if self._shared:
+            self._own()
+            position = index % len(self._items)
+        del self._items[position]
+
+    def __iter__(self):
+        return iter(self._items) if self._head == 0 else islice(self._items, self._head, None)
+
+    def __reversed__(self):
+        return map(self._items.__getitem__, range(len(self._items) - 1, self._head - 1, -1))
+
+    def __contains__(self, value):
+        try:
+            self.index(value)
+        except ValueError:
+            return False
+        return True
+
+    def __eq__(self, other):
+        if isinstance(other, SlidingList):
+            other = other[:]
+        return isinstance(other, list) and self[:] == other
+
+    def __repr__(self):
+        return f"SlidingList({self[:]!r})"
+
+    def index(self, value):
+        for i in range(self._head, len(self._items)):
+            if self._items[i] is value or self._items[i] == value:
+                return i - self._head
+        raise ValueError(f"{value!r} is not in SlidingList")
+
+    def append(self, value):
+        if self._shared:
+            self._own()
+        self._items.append(value)
+
+    def extend(self, values):
+        if self._shared:
+            self._own()
+        self._items.extend(values)
+
+    def insert(self, index, value):
+        if self._shared:
+            self._own()
+        size = len(self)
+        index = max(0, min(size, index + size if index < 0 else index))
+        self._items.insert(self._head + index, value)
+
+    def pop(self):
+        if not self:
+            raise IndexError("pop from an empty SlidingList")
+        if self._shared:
+            self._own()
+        return self._items.pop()
+
+    def popleft(self):
+        items = self._items
+        head = self._head
+        if head >= len(items):
+            raise IndexError("pop from an empty SlidingList")
+        value = items[head]
+        head += 1
+        if self._shared:
+            # the dropped items still belong to the shared list
+            self._head = head
+            return value
+        if head == len(items):
+            items.clear()
+            head = 0
+        elif head > 16 and 2 * head > len(items):
+            del items[:head]
+            head = 0
+        else:
+            items[head - 1] = None
+        self._head = head
+        return value
+
+    def remove(self, value):
+        del self[self.index(value)]
+
+    def clear(self):
+        if self._shared:
+            self._items = []
+            self._shared = False
+        else:
+            self._items.clear()
+        self._head = 0
+
+    def copy(self):
+        return SlidingList(self[:])
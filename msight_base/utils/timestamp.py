@@ -0,0 +1,17 @@
+from datetime import datetime
+
+
+def timestamp_to_seconds(timestamp):
+    # timestamps in this package are either datetime objects (see utils.data) or plain numbers
+    if timestamp is None:
+        return float('nan')
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return float(timestamp)
+
+
+def seconds_to_timestamp(seconds, like=None):
+    # inverse of timestamp_to_seconds, returns a datetime when like is a datetime and a float otherwise
+    if isinstance(like, datetime):
+        return datetime.fromtimestamp(seconds, tz=like.tzinfo)
+    return float(seconds)
@@ -1 +1,8 @@
-from .visualizer import Visualizer
+# Visualizer needs cv2, it is imported on first access so the helpers in .utils can be used without it
+
+
+def __getattr__(name):
+    if name == 'Visualizer':
+        from .visualizer import Visualizer
+        return Visualizer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
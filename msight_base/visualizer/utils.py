@@ -1,11 +1,11 @@
 import numpy as np
-import cv2
 import json
 
 
 class VideoWriter(object):
 
     def __init__(self, name, out_size_w=960, out_size_h=720):
+        import cv2
 
         self.video_writer = cv2.VideoWriter(
             name + '.mp4', cv2.VideoWriter_fourcc(*'MP4V'),
@@ -18,6 +18,7 @@ class VideoWriter(object):
         self.out_size_h = out_size_h
 
     def save_frame(self, vis_det, vis_loc):
+        import cv2
 
         vis_det = cv2.resize(vis_det, (self.out_size_w, self.out_size_h))
         vis_loc = cv2.resize(vis_loc, (self.out_size_h, self.out_size_h))
@@ -33,6 +34,7 @@ class VideoWriter(object):
 
 
 ############ some helper functions ##############
+# cv2 is imported by the functions drawing with it, coord_normalization and coord_unnormalization do not need it
 
 class Struct:
     def __init__(self, **entries):
@@ -49,6 +51,7 @@ def parse_config(path_to_json=r'./config.json'):
 ################ BB draw on 2D image... ####################
 
 def draw_bb_on_image(vehicle_list, img):
+    import cv2
 
     for i in range(len(vehicle_list)):
         v = vehicle_list[i]
@@ -76,6 +79,7 @@ def draw_bb_on_image(vehicle_list, img):
 # Instead of draw the square, we directly draw the rect predicted by YOLOX
 
 def draw_bb_on_image_yolox(vehicle_list, img):
+    import cv2
 
     for i in range(len(vehicle_list)):
         v = vehicle_list[i]
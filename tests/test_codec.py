@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+from msight_base import DetectionResultBase, RoadUserPoint, RoadUserCategory, CompactRoadUserPoint
+from msight_base.codec import encode_detections, decode_detections, encode_detection, decode_detection
+
+
+def make_points():
+    return [
+        RoadUserPoint(42.3, -83.7, speed=5.0, heading=90.0, width=1.8, length=4.5, category=RoadUserCategory.SEDAN,
+                      traj_id=7, sensor_data={'lidar': 1}, poly_box=[[0.0, 1.0], [2.0, 3.0]]),
+        RoadUserPoint(42.4, -83.8, category=RoadUserCategory.TRUCK, traj_id=(1, 'a')),
+        RoadUserPoint(42.5, -83.9, traj_id=np.int64(3)),
+    ]
+
+
+def as_dicts(results):
+    return [(result.timestamp, result.sensor_type, [(type(obj), obj.to_dict()) for obj in result.object_list])
+            for result in results]
+
+
+def test_round_trip():
+    results = [DetectionResultBase(make_points(), 1.5, sensor_type='fusion'), DetectionResultBase([], 2.0)]
+    assert as_dicts(decode_detections(encode_detections(results))) == as_dicts(results)
+
+
+def test_json_round_trip():
+    # the JSON encoding is DetectionResultBase.to_dict, which keeps traj_ids as they are
+    points = make_points()[:1] + [RoadUserPoint(42.4, -83.8, category=RoadUserCategory.TRUCK, traj_id=8)]
+    results = [DetectionResultBase(points, 1.5, sensor_type='fusion')]
+    assert as_dicts(decode_detections(encode_detections(results, binary=False))) == as_dicts(results)
+
+
+def test_round_trip_of_a_mixed_list():
+    objects = make_points() + [CompactRoadUserPoint(42.6, -84.0, speed=3.0, traj_id=9)]
+    result = DetectionResultBase(objects, 3.0, sensor_type='camera')
+    decoded = decode_detection(encode_detection(result))
+    assert as_dicts([decoded]) == as_dicts([result])
+
+
+def test_frame_fields_round_trip():
+    timestamp = datetime(2024, 5, 1, tzinfo=timezone.utc).timestamp()
+    obj = RoadUserPoint(42.3, -83.7, timestamp=timestamp, frame_step=4)
+    decoded = decode_detection(encode_detection(DetectionResultBase([obj], timestamp))).object_list[0]
+    assert decoded.timestamp == timestamp and decoded.frame_step == 4
+
+
+def test_newer_version_is_rejected():
+    data = bytearray(encode_detection(DetectionResultBase(make_points(), 1.0)))
+    data[4:6] = (99).to_bytes(2, 'little')
+    with pytest.raises(ValueError):
+        decode_detections(bytes(data))
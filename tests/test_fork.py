@@ -0,0 +1,63 @@
+from msight_base import TrajectoryManager, RoadUserPoint
+
+
+def make_manager(num_frames=3, **kwargs):
+    tm = TrajectoryManager(**kwargs)
+    for step in range(num_frames):
+        tm.add_frame([RoadUserPoint(float(step), 0.0), RoadUserPoint(float(step), 1.0)], traj_ids=[1, 2],
+                     timestamp=step * 0.1)
+    return tm
+
+
+def links(traj):
+    return [(obj.traj, obj.prev, obj.next, obj.frame, obj.traj_id) for obj in traj.objects]
+
+
+def test_fork_idle_expiry_leaves_parent_unchanged():
+    tm = make_manager(max_idle_frames=2, track_aggregates=True)
+    traj = tm.traj_id_to_traj_map[1]
+    before = links(traj)
+    aggregates = traj.aggregates
+    frames = [list(frame.objects) for frame in tm.frames]
+
+    fork = tm.fork()
+    for step in range(3, 8):
+        fork.add_frame([RoadUserPoint(float(step), 1.0)], traj_ids=[2], timestamp=step * 0.1)
+
+    assert 1 not in fork.traj_ids
+    assert tm.traj_id_to_traj_map[1] is traj
+    assert links(traj) == before
+    assert traj.aggregates is aggregates and aggregates.count == 3
+    assert [list(frame.objects) for frame in tm.frames] == frames
+    assert [obj.x for obj in tm.traj_id_to_traj_map[2]] == [0.0, 1.0, 2.0]
+
+
+def test_fork_idle_expiry_releases_branch_points_only():
+    tm = make_manager(max_idle_frames=2)
+    parent_objects = list(tm.traj_id_to_traj_map[1].objects)
+    fork = tm.fork()
+    branch_point = RoadUserPoint(3.0, 0.0)
+    fork.add_frame([branch_point, RoadUserPoint(3.0, 1.0)], traj_ids=[1, 2], timestamp=0.3)
+    assert branch_point.prev is parent_objects[-1]
+    for step in range(4, 7):
+        fork.add_frame([RoadUserPoint(float(step), 1.0)], traj_ids=[2], timestamp=step * 0.1)
+
+    assert 1 not in fork.traj_ids
+    # the point added by the fork is unlinked, the shared history still belongs to the parent
+    assert branch_point.traj is None and branch_point.prev is None and branch_point.traj_id == 1
+    assert all(obj.traj is tm.traj_id_to_traj_map[1] for obj in parent_objects)
+    assert parent_objects[-1].next is None
+    assert [obj.x for obj in tm.traj_id_to_traj_map[1]] == [0.0, 1.0, 2.0]
+
+
+def test_fork_window_eviction_leaves_parent_unchanged():
+    tm = make_manager(num_frames=5, max_frames=5)
+    before = {traj_id: links(traj) for traj_id, traj in tm.traj_id_to_traj_map.items()}
+    fork = tm.fork()
+    for step in range(5, 12):
+        fork.add_frame([RoadUserPoint(float(step), 1.0)], traj_ids=[2], timestamp=step * 0.1)
+
+    assert 1 not in fork.traj_ids
+    assert [obj.x for obj in fork.traj_id_to_traj_map[2]] == [7.0, 8.0, 9.0, 10.0, 11.0]
+    assert {traj_id: links(traj) for traj_id, traj in tm.traj_id_to_traj_map.items()} == before
+    assert tm.steps == [0, 1, 2, 3, 4]
@@ -0,0 +1,47 @@
+import itertools
+import pytest
+from msight_base.utils.sliding import SlidingList
+
+BOUNDS = (None, -12, -3, -1, 0, 1, 2, 5, 12)
+
+
+def sliding(n, dropped):
+    items = SlidingList(range(n))
+    for _ in range(dropped):
+        items.popleft()
+    return items
+
+
+@pytest.mark.parametrize('n, dropped', [(0, 0), (5, 0), (5, 2), (5, 5), (10, 3), (40, 20)])
+def test_slices_match_a_list(n, dropped):
+    items = sliding(n, dropped)
+    expected = list(range(dropped, n))
+    for view in (items, items.share()):
+        for start, stop, step in itertools.product(BOUNDS, BOUNDS, (None, 1, 2, -1, -2, -5)):
+            assert view[start:stop:step] == expected[start:stop:step]
+
+
+def test_popleft():
+    items = SlidingList(range(50))
+    assert [items.popleft() for _ in range(30)] == list(range(30))
+    assert len(items) == 20 and items[0] == 30 and items[-1] == 49
+    assert list(items) == list(range(30, 50)) and list(reversed(items)) == list(range(49, 29, -1))
+    items.append(50)
+    assert items == list(range(30, 51))
+    while items:
+        items.popleft()
+    with pytest.raises(IndexError):
+        items.popleft()
+    with pytest.raises(IndexError):
+        items[0]
+
+
+def test_shared_view_copies_on_write():
+    items = sliding(10, 2)
+    view = items.share()
+    assert view.popleft() == 2
+    view.append(10)
+    view[0] = -3
+    del view[1]
+    assert items == list(range(2, 10))
+    assert view == [-3] + list(range(5, 11))
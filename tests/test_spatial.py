@@ -0,0 +1,40 @@
+import time
+import numpy as np
+import pytest
+from msight_base import Frame, RoadUserPoint
+from msight_base.spatial import GridIndex
+
+
+def brute_force(points, center, k):
+    distances = np.hypot(points[:, 0] - center[0], points[:, 1] - center[1])
+    return np.sort(distances)[:k]
+
+
+@pytest.mark.parametrize('center', [(3.0, 4.0), (250.0, -40.0), (1e5, 1e5), (-7e6, 2e6)])
+@pytest.mark.parametrize('k', [1, 5, 200, 1000])
+def test_knn_matches_brute_force(center, k):
+    points = np.random.default_rng(0).uniform(-200, 200, (500, 2))
+    indices, distances = GridIndex(points, cell_size=10.0).knn(center, k)
+    expected = brute_force(points, center, k)
+    assert len(indices) == len(expected)
+    np.testing.assert_allclose(distances, expected)
+    np.testing.assert_allclose(np.hypot(*(points[indices] - center).T), distances)
+
+
+def test_far_knn_does_not_walk_empty_rings():
+    points = np.random.default_rng(1).uniform(0, 100, (1000, 2))
+    index = GridIndex(points, cell_size=1.0)
+    start = time.perf_counter()
+    indices, _ = index.knn((1e7, 1e7), 3)
+    assert time.perf_counter() - start < 1.0
+    assert len(indices) == 3
+
+
+def test_frame_knn_from_null_island():
+    # (0, 0) in latitude/longitude is thousands of kilometers from the objects of the frame
+    frame = Frame(0)
+    objects = [RoadUserPoint(42.3 + 1e-4 * i, -83.7, traj_id=i) for i in range(20)]
+    for obj in objects:
+        frame.add_object(obj)
+    assert frame.knn((0.0, 0.0), 2) == objects[:2]
+    assert frame.knn(objects[5], 2) in ([objects[4], objects[6]], [objects[6], objects[4]])
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from msight_base import TrajectoryManager, RoadUserPoint, RoadUserCategory
+from msight_base.behavior import BehaviorType
+from msight_base.storage import TrajectoryRecording, load_trajectory_manager
+
+START = datetime(2024, 5, 1, 8, tzinfo=timezone(timedelta(hours=-4)))
+
+
+def make_manager():
+    tm = TrajectoryManager()
+    for step in range(6):
+        objects = [RoadUserPoint(42.3, -83.7 + 1e-5 * step, speed=float(step), heading=90.0,
+                                 category=RoadUserCategory.SEDAN),
+                   RoadUserPoint(42.4, -83.7, behaviors=[BehaviorType.STOP] if step % 2 else None,
+                                 sensor_data={'step': step} if step == 3 else None)]
+        tm.add_frame(objects, traj_ids=[np.int64(1), (2, 'b')], timestamp=START + timedelta(seconds=0.1 * step))
+    return tm
+
+
+def frame_dicts(frames):
+    return [(frame.step, frame.timestamp, [obj.to_dict() for obj in frame.objects]) for frame in frames]
+
+
+def test_load_is_lazy_and_round_trips(tmp_path):
+    tm = make_manager()
+    tm.save(tmp_path)
+    recording = TrajectoryManager.load(tmp_path)
+    assert isinstance(recording, TrajectoryRecording)
+    assert isinstance(recording.arrays['x'], np.memmap)
+    assert len(recording) == 6 and recording.traj_ids == [1, (2, 'b')]
+    assert frame_dicts(recording.frames) == frame_dicts(tm.frames)
+    assert recording.frames[-1].timestamp.utcoffset() == timedelta(hours=-4)
+    assert [obj.to_dict() for obj in recording.trajectory((2, 'b'))] == \
+           [obj.to_dict() for obj in tm.traj_id_to_traj_map[(2, 'b')]]
+    assert recording.trajectory(3) is None
+
+
+def test_side_attributes_are_read_per_row(tmp_path):
+    make_manager().save(tmp_path)
+    recording = TrajectoryRecording(tmp_path)
+    assert set(recording.side_column('behaviors')) == {'3', '7', '11'}
+    obj = recording.frame(3).objects[1]
+    assert obj.behaviors == [BehaviorType.STOP] and obj.sensor_data == {'step': 3}
+    assert recording.frame(2).objects[1].behaviors == []
+
+
+def test_eager_manager(tmp_path):
+    tm = make_manager()
+    tm.save(tmp_path)
+    loaded = load_trajectory_manager(tmp_path, max_frames=4)
+    assert frame_dicts(loaded.frames) == frame_dicts(list(tm.frames)[2:])
+    part = TrajectoryRecording(tmp_path).to_trajectory_manager(1, 3)
+    assert part.steps == [1, 2] and [obj.x for obj in part.traj_id_to_traj_map[1]] == [42.3, 42.3]
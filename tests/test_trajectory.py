@@ -0,0 +1,19 @@
+from msight_base import TrajectoryManager, RoadUserPoint
+
+
+def test_evicted_points_keep_step_and_timestamp():
+    tm = TrajectoryManager(max_frames=2)
+    objects = [RoadUserPoint(float(step), 0.0) for step in range(4)]
+    for step, obj in enumerate(objects):
+        tm.add_frame([obj], traj_ids=[1], timestamp=step * 0.5)
+    evicted = objects[:2]
+    assert all(obj.frame is None and obj.traj is None for obj in evicted)
+    assert [obj.frame_step for obj in evicted] == [0, 1]
+    assert [obj.timestamp for obj in evicted] == [0.0, 0.5]
+    assert [obj.traj_id for obj in evicted] == [1, 1]
+    assert [obj.frame_step for obj in objects[2:]] == [2, 3]
+
+
+def test_frame_step_of_a_free_point():
+    assert RoadUserPoint(0.0, 0.0).frame_step is None
+    assert RoadUserPoint(0.0, 0.0, frame_step=5).frame_step == 5